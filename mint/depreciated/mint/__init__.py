@@ -1,5 +1,5 @@
 from .core import Anchors, AnchorPresets, AxisAnchor, Offsets, EventResponse, FrameFit, Mint, register_renderable, Tree, Renderable, BuiltInRenderable, Element, ElementData
-from .implementations.arcade_stylebox import StyleBoxRenderer, StyleBox
+from .implementations.arcade_stylebox import StyleBoxArena, StyleBoxRenderer, StyleBox
 
 __all__ = (
     "AnchorPresets",
@@ -14,6 +14,7 @@ __all__ = (
     "Offsets",
     "Renderable",
     "StyleBox",
+    "StyleBoxArena",
     "StyleBoxRenderer",
     "Tree",
     "register_renderable"
@@ -0,0 +1,307 @@
+from __future__ import annotations
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Callable
+from uuid import UUID
+import weakref
+
+import numpy as np
+from numpy.typing import NDArray
+
+if TYPE_CHECKING:
+    from .core import Element
+
+# Springs closer than this to their target (and slower than it) have settled.
+_SETTLE = 1e-3
+# The longest step a spring takes at once, longer frames are split so stiff springs stay stable.
+_SPRING_STEP = 1.0 / 120.0
+
+
+class Easing(IntEnum):
+    LINEAR = 0
+    IN_QUAD = 1
+    OUT_QUAD = 2
+    IN_OUT_QUAD = 3
+    IN_CUBIC = 4
+    OUT_CUBIC = 5
+    IN_OUT_CUBIC = 6
+    OUT_BACK = 7  # Overshoots then settles
+    OUT_ELASTIC = 8  # Wobbles around the target before settling
+
+
+def _in_out(t: NDArray[np.float64], power: int) -> NDArray[np.float64]:
+    return np.where(t < 0.5, 2.0 ** (power - 1) * t ** power, 1.0 - (-2.0 * t + 2.0) ** power / 2.0)
+
+
+def _out_back(t: NDArray[np.float64]) -> NDArray[np.float64]:
+    c = 1.70158
+    return 1.0 + (c + 1.0) * (t - 1.0) ** 3 + c * (t - 1.0) ** 2
+
+
+def _out_elastic(t: NDArray[np.float64]) -> NDArray[np.float64]:
+    eased = 2.0 ** (-10.0 * t) * np.sin((t * 10.0 - 0.75) * (2.0 * np.pi / 3.0)) + 1.0
+    return np.where(t >= 1.0, 1.0, eased)
+
+
+# Each easing maps progress (0.0 - 1.0) to the fraction of the way from start to target.
+_EASINGS: dict[Easing, Callable[[NDArray[np.float64]], NDArray[np.float64]]] = {
+    Easing.LINEAR: lambda t: t,
+    Easing.IN_QUAD: lambda t: t * t,
+    Easing.OUT_QUAD: lambda t: 1.0 - (1.0 - t) ** 2,
+    Easing.IN_OUT_QUAD: lambda t: _in_out(t, 2),
+    Easing.IN_CUBIC: lambda t: t ** 3,
+    Easing.OUT_CUBIC: lambda t: 1.0 - (1.0 - t) ** 3,
+    Easing.IN_OUT_CUBIC: lambda t: _in_out(t, 3),
+    Easing.OUT_BACK: _out_back,
+    Easing.OUT_ELASTIC: _out_elastic,
+}
+
+# (element, element uid, field name, component, integral) where the component is -1 for a plain number
+# field, and integral fields are written back rounded (the components of RGBA255 colors etc).
+type _Channel = tuple[weakref.ref[Element], UUID, str, int, bool]
+# An element's animated fields as (field name, columns, components, integral).
+type _Binding = tuple[weakref.ref[Element], list[tuple[str, list[int], list[int] | None, bool]]]
+
+
+class Animator:
+    """
+    Animates the number fields of element data, and each component of tuple
+    fields (colors, Offsets, etc).
+
+    Every animated number is a channel, and all channels are kept as columns
+    of numpy arrays so a step advances every tween and spring at once. Only
+    writing the new values back to the element data is done per channel.
+    Finished tweens and settled springs are dropped from the columns in the
+    step they finish.
+
+    Animating a channel which is already animating retargets it from its
+    current value (and speed for springs) rather than jumping.
+
+    Elements are held weakly, so an element which is collected mid animation
+    has its channels dropped at the next step rather than being kept alive.
+    """
+
+    # Every per channel array, so growing and compacting can treat them alike.
+    _COLUMNS: tuple[str, ...] = (
+        '_value', '_start', '_target', '_velocity', '_elapsed', '_delay',
+        '_duration', '_easing', '_is_spring', '_stiffness', '_damping'
+    )
+
+    def __init__(self, capacity: int = 64) -> None:
+        self._count: int = 0
+        self._channels: list[_Channel] = []
+        # Where each channel is in the columns.
+        self._index: dict[tuple[UUID, str, int], int] = {}
+        # The channels grouped by element and field for writing back, rebuilt when channels are added or removed.
+        self._bindings: list[_Binding] | None = None
+
+        # -- COLUMNS --
+        self._value: NDArray[np.float64] = np.zeros(capacity)
+        self._start: NDArray[np.float64] = np.zeros(capacity)
+        self._target: NDArray[np.float64] = np.zeros(capacity)
+        self._velocity: NDArray[np.float64] = np.zeros(capacity)
+        # Tweens
+        self._elapsed: NDArray[np.float64] = np.zeros(capacity)
+        self._delay: NDArray[np.float64] = np.zeros(capacity)
+        self._duration: NDArray[np.float64] = np.ones(capacity)
+        self._easing: NDArray[np.int8] = np.zeros(capacity, np.int8)
+        # Springs
+        self._is_spring: NDArray[np.bool_] = np.zeros(capacity, np.bool_)
+        self._stiffness: NDArray[np.float64] = np.zeros(capacity)
+        self._damping: NDArray[np.float64] = np.zeros(capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    # -- ANIMATING --
+
+    def tween(
+            self,
+            element: Element,
+            field: str,
+            target: Any,
+            duration: float,
+            easing: Easing = Easing.OUT_CUBIC,
+            delay: float = 0.0
+        ) -> None:
+        for idx, goal in self._channels_of(element, field, target):
+            self._start[idx] = self._value[idx]
+            self._target[idx] = goal
+            self._elapsed[idx] = 0.0
+            self._delay[idx] = delay
+            self._duration[idx] = max(duration, 1e-6)
+            self._easing[idx] = easing
+            self._is_spring[idx] = False
+
+    def spring(self, element: Element, field: str, target: Any, stiffness: float = 170.0, damping: float = 26.0) -> None:
+        # A critically damped spring has damping = 2 * sqrt(stiffness), lower values overshoot.
+        for idx, goal in self._channels_of(element, field, target):
+            self._target[idx] = goal
+            self._stiffness[idx] = stiffness
+            self._damping[idx] = damping
+            self._is_spring[idx] = True
+
+    def stop(self, element: Element, field: str | None = None) -> None:
+        # Leaves the fields at their current values.
+        keep = np.ones(self._count, np.bool_)
+        for idx, (_, uid, name, _, _) in enumerate(self._channels):
+            if uid == element.uid and (field is None or name == field):
+                keep[idx] = False
+        self._compact(keep)
+
+    def clear(self) -> None:
+        self._compact(np.zeros(self._count, np.bool_))
+
+    def is_animating(self, element: Element, field: str | None = None) -> bool:
+        return any(
+            uid == element.uid and (field is None or name == field)
+            for uid, name, _ in self._index
+        )
+
+    def _channels_of(self, element: Element, field: str, target: Any) -> list[tuple[int, float]]:
+        # The column of each channel the field animates paired with its target, adding any missing.
+        data = element._data
+        current = getattr(data, field)
+        if isinstance(current, tuple):
+            if len(target) != len(current):
+                raise ValueError(f"Can't animate {field} from {len(current)} to {len(target)} components")
+            parts = list(enumerate(zip(current, target)))
+            integral = all(isinstance(value, int) for value in current)
+        else:
+            parts = [(-1, (current, target))]
+            # Going by the field's default, so a float field set with an int still animates smoothly.
+            default = getattr(type(data), field, current)
+            integral = isinstance(default, int) and not isinstance(default, bool)
+
+        channels = []
+        for component, (value, goal) in parts:
+            key = (element.uid, field, component)
+            idx = self._index.get(key)
+            if idx is None:
+                idx = self._add((weakref.ref(element), element.uid, field, component, integral), float(value))
+                self._index[key] = idx
+            channels.append((idx, float(goal)))
+        return channels
+
+    def _add(self, channel: _Channel, value: float) -> int:
+        idx = self._count
+        if idx == len(self._value):
+            for name in Animator._COLUMNS:
+                column = getattr(self, name)
+                setattr(self, name, np.concatenate((column, np.zeros_like(column))))
+
+        self._channels.append(channel)
+        self._bindings = None
+        self._count += 1
+        self._value[idx] = value
+        self._velocity[idx] = 0.0
+        self._duration[idx] = 1.0
+        return idx
+
+    def _compact(self, keep: NDArray[np.bool_]) -> None:
+        kept = int(keep.sum())
+        if kept == self._count:
+            return
+
+        for name in Animator._COLUMNS:
+            column = getattr(self, name)
+            column[:kept] = column[:self._count][keep]
+
+        self._channels = [channel for channel, kept_channel in zip(self._channels, keep.tolist()) if kept_channel]
+        self._index = {(uid, field, component): idx for idx, (_, uid, field, component, _) in enumerate(self._channels)}
+        self._bindings = None
+        self._count = kept
+
+    # -- STEPPING --
+
+    def step(self, dt: float) -> int:
+        # Advances every animation and writes the results back. Returns how many channels were written.
+        count = self._count
+        if not count or dt <= 0.0:
+            return 0
+
+        value = self._value[:count]
+        target = self._target[:count]
+        spring = self._is_spring[:count]
+        tween = ~spring
+        finished = np.zeros(count, np.bool_)
+
+        if tween.any():
+            elapsed = self._elapsed[:count]
+            elapsed[tween] += dt
+            progress = np.clip((elapsed - self._delay[:count]) / self._duration[:count], 0.0, 1.0)
+            eased = np.empty(count)
+            easing = self._easing[:count]
+            for code in np.unique(easing[tween]).tolist():
+                mask = tween & (easing == code)
+                eased[mask] = _EASINGS[Easing(code)](progress[mask])
+            start = self._start[:count]
+            value[tween] = start[tween] + (target[tween] - start[tween]) * eased[tween]
+            finished |= tween & (progress >= 1.0)
+
+        if spring.any():
+            velocity = self._velocity[:count]
+            stiffness = self._stiffness[:count][spring]
+            damping = self._damping[:count][spring]
+            x = value[spring]
+            v = velocity[spring]
+            goal = target[spring]
+
+            steps = int(np.ceil(dt / _SPRING_STEP))
+            h = dt / steps
+            for _ in range(steps):
+                v += (stiffness * (goal - x) - damping * v) * h
+                x += v * h
+
+            settled = (np.abs(goal - x) < _SETTLE) & (np.abs(v) < _SETTLE)
+            x[settled] = goal[settled]
+            value[spring] = x
+            velocity[spring] = v
+            finished[spring] = settled
+
+        self._write(value, finished)
+        self._compact(~finished)
+        return count
+
+    def _bind(self) -> list[_Binding]:
+        refs: dict[UUID, weakref.ref[Element]] = {}
+        fields: dict[UUID, dict[str, tuple[str, list[int], list[int] | None, bool]]] = {}
+        for idx, (ref, uid, field, component, integral) in enumerate(self._channels):
+            element_fields = fields.get(uid)
+            if element_fields is None:
+                refs[uid] = ref
+                fields[uid] = element_fields = {}
+            binding = element_fields.get(field)
+            if binding is None:
+                element_fields[field] = binding = (field, [], None if component < 0 else [], integral)
+            binding[1].append(idx)
+            if component >= 0:
+                binding[2].append(component)
+        return [(refs[uid], list(element_fields.values())) for uid, element_fields in fields.items()]
+
+    def _write(self, values: NDArray[np.float64], finished: NDArray[np.bool_]) -> None:
+        # Channels of collected elements are marked finished so they're dropped.
+        if self._bindings is None:
+            self._bindings = self._bind()
+        floats = values.tolist()
+        ints = np.rint(values).astype(np.int64).tolist()
+
+        # Each element updates once however many of its fields changed, and only relays
+        # out if one of them affects layout.
+        for ref, bindings in self._bindings:
+            element = ref()
+            if element is None:
+                for _, columns, _, _ in bindings:
+                    finished[columns] = True
+                continue
+            changes: dict[str, Any] = {}
+            for field, columns, components, integral in bindings:
+                source = ints if integral else floats
+                if components is None:
+                    changes[field] = source[columns[0]]
+                    continue
+                original = getattr(element._data, field)
+                parts = list(original)
+                for column, component in zip(columns, components):
+                    parts[component] = source[column]
+                changes[field] = original._make(parts) if hasattr(original, '_make') else tuple(parts)
+            element.update_data(**changes)
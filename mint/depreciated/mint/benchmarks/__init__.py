@@ -0,0 +1,5 @@
+# Run each benchmark as a module from the package directory, python -m benchmarks.<name>
+import os
+
+# Has to be set before arcade is imported anywhere.
+os.environ.setdefault('ARCADE_HEADLESS', '1')
@@ -0,0 +1,64 @@
+"""
+Attach and teardown throughput of a 20k element tree, and the memory the
+tree spends tracking it.
+
+    python -m benchmarks.bench_churn
+"""
+import gc
+import tracemalloc
+from time import perf_counter
+
+from charm.lib.mint.core import ElementData
+
+from .common import make_tree
+
+
+def build(count: int, fan: int = 20):
+    root = ElementData().create()
+    level = [root]
+    made = 1
+    while made < count:
+        below = []
+        for parent in level:
+            children = [ElementData().create() for _ in range(min(fan, count - made))]
+            parent.add_children(children)
+            below.extend(children)
+            made += len(children)
+            if made >= count:
+                break
+        level = below
+    return root
+
+
+def main() -> None:
+    count = 20000
+    tree = make_tree()
+    gc.collect()
+
+    attach = teardown = float('inf')
+    for _ in range(5):
+        root = build(count)
+        start = perf_counter()
+        tree.set_root(root)
+        attach = min(attach, perf_counter() - start)
+
+        start = perf_counter()
+        tree.clear_root()
+        del root
+        gc.collect()
+        teardown = min(teardown, perf_counter() - start)
+
+    root = build(count)
+    tracemalloc.start()
+    tree.set_root(root)
+    tracked, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{count} elements")
+    print(f"  attach   {count / attach / 1000:8.0f}k elements/s")
+    print(f"  teardown {count / teardown / 1000:8.0f}k elements/s")
+    print(f"  tracking {tracked / 1024:8.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
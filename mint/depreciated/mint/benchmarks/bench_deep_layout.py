@@ -0,0 +1,42 @@
+"""
+Lays out a depth 30 tree and reports the time and how many elements each
+pass visited, which should be once each (the top isn't measured).
+
+    python -m benchmarks.bench_deep_layout
+"""
+from charm.lib.mint.core import AnchorElement, ArrayElement, ElementData
+
+from .common import make_tree, timed
+
+
+def build(depth: int, width: int):
+    # A chain of mixed layouts, each link with a few leaves beside the next.
+    data_types = (ElementData, ArrayElement, AnchorElement)
+    root = ElementData().create()
+    element = root
+    count = 1
+    for level in range(depth):
+        for _ in range(width):
+            ElementData(minimum_width=10, minimum_height=10).create(element)
+        element = data_types[level % len(data_types)](priority=1).create(element)
+        count += width + 1
+    return root, count
+
+
+def main() -> None:
+    root, count = build(30, 3)
+    tree = make_tree()
+    tree.set_root(root)
+    tree.count_layout_visits()
+
+    def layout():
+        tree._tree_stale = True
+        tree.layout()
+
+    print(f"depth 30, {count} elements: {timed(layout, 200):.3f} ms per layout")
+    for layout_pass, visits in tree.layout_visits.items():
+        print(f"  {layout_pass:<18} {visits:5d} visits")
+
+
+if __name__ == '__main__':
+    main()
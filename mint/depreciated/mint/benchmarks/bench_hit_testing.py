@@ -0,0 +1,47 @@
+"""
+One second of 1000 Hz mouse motion over a 10k element grid whose leaves
+all listen for the cursor entering them.
+
+    python -m benchmarks.bench_hit_testing
+"""
+import random
+from time import perf_counter
+
+from charm.lib.mint.core import ArrayElement, ElementData
+
+from .common import make_tree
+
+
+def build(rows: int, columns: int):
+    root = ElementData().create()
+    grid = ArrayElement(vertical=True, priority=1).create(root)
+    for _ in range(rows):
+        row = ArrayElement(priority=1).create(grid)
+        row.add_children([
+            ElementData(minimum_width=5, minimum_height=5, on_cursor_enter=lambda element, event: None).create()
+            for _ in range(columns)
+        ])
+    return root
+
+
+def main() -> None:
+    rng = random.Random(0)
+    tree = make_tree()
+    tree.set_root(build(100, 100))
+
+    start = perf_counter()
+    tree.layout()
+    layout = perf_counter() - start
+
+    points = [(rng.uniform(0.0, 1280.0), rng.uniform(0.0, 720.0)) for _ in range(1000)]
+    start = perf_counter()
+    for x, y in points:
+        tree.cursor_motion(x, y, 1.0, 1.0)
+    motion = perf_counter() - start
+
+    print(f"{len(tree._members)} elements, layout and index build {layout * 1000:.1f} ms")
+    print(f"  1000 motion events {motion * 1000:.1f} ms, {motion * 100:.1f}% of a second at 1000 Hz")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Full layout against relaying out only the dirty subtree after a single
+element's data changes, on a 10k element tree with fixed size panels.
+
+    python -m benchmarks.bench_incremental_layout
+"""
+import random
+
+from charm.lib.mint.core import ElementData
+
+from .common import make_tree, timed
+
+
+def build(rng: random.Random, count: int):
+    root = ElementData().create()
+    nodes = [root]
+    for _ in range(count):
+        if rng.random() < 0.2:
+            size = rng.uniform(50.0, 200.0)
+            data = ElementData(minimum_width=size, maximum_width=size, minimum_height=size, maximum_height=size)
+        else:
+            data = ElementData(minimum_width=rng.uniform(0.0, 50.0), minimum_height=rng.uniform(0.0, 50.0), priority=rng.choice((0, 1)))
+        child = data.create()
+        rng.choice(nodes).add_child(child)
+        nodes.append(child)
+    return root, nodes
+
+
+def main() -> None:
+    rng = random.Random(1)
+    root, nodes = build(rng, 10000)
+    tree = make_tree()
+    tree.set_root(root)
+    tree.layout()
+    leaves = [node for node in nodes if not node._children]
+
+    def full():
+        tree._tree_stale = True
+        tree.layout()
+
+    def incremental():
+        rng.choice(leaves).update_data(minimum_height=rng.uniform(0.0, 10.0))
+        tree.layout()
+
+    print(f"full layout        {timed(full, 10):8.3f} ms")
+    print(f"one element edited {timed(incremental, 200):8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+from time import perf_counter
+from typing import Callable
+
+import arcade
+
+from charm.lib.mint.core import Tree
+
+_window: arcade.Window | None = None
+
+
+def make_tree(width: int = 1280, height: int = 720) -> Tree:
+    # Trees need a window for their camera and context.
+    global _window
+    if _window is None:
+        _window = arcade.Window(width, height, visible=False)
+    tree = Tree()
+    tree.update_viewport(width, height)
+    return tree
+
+
+def timed(run: Callable[[], object], repeat: int = 1) -> float:
+    # The mean time of a run in milliseconds.
+    start = perf_counter()
+    for _ in range(repeat):
+        run()
+    return (perf_counter() - start) / repeat * 1000.0
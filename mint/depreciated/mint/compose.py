@@ -1,14 +1,27 @@
 from __future__ import annotations
 from uuid import UUID, uuid4
-from typing import Generator
+from typing import Generator, Hashable, NamedTuple
 from contextlib import contextmanager
 from weakref import WeakSet
 
+from . import trace
+
+
+class Recomposition(NamedTuple):
+    # What a recompose changed, so only these need tearing down or laying out again.
+    added: list[Composable]
+    removed: list[Composable]
+    moved: list[Composable]
+    updated: list[Composable]
+
 
 class Composable:
 
-    def __init__(self, parent: Composable | None = None, uid: UUID | None = None) -> None:
+    def __init__(self, parent: Composable | None = None, uid: UUID | None = None, key: Hashable | None = None) -> None:
         self.uid: UUID = uid or uuid4()
+        # What matches this composable with the one it replaces when its parent recomposes.
+        # Without a key a fresh composable never matches so it replaces the old one.
+        self.key: Hashable | None = key
         self._parent: Composable | None = None
         self._children: list[Composable] = []
         self._pending_children: list[Composable] = []
@@ -46,10 +59,27 @@ class Composable:
         else:
             Tree.get_tree()._composition_list[-1].append(composed)
 
+    @property
+    def reconcile_key(self) -> Hashable:
+        return self.uid if self.key is None else self.key
+
     def compose(self) -> Generator[Composable, None, None]:
         yield from ()
 
+    def update(self, other: Composable) -> bool:
+        # Take on the state of the composable replacing this one when recomposing,
+        # which is then dropped. Returns whether anything changed.
+        return False
+
     def _compose(self) -> None:
+        tracer = trace.get_tracer()
+        if tracer is None:
+            self._compose_children()
+            return
+        with tracer.span(str(self), "compose", uid=self.uid):
+            self._compose_children()
+
+    def _compose_children(self) -> None:
         children = [*self._pending_children, *compose(self)]
         self._pending_children.clear()
         if children:
@@ -104,6 +134,78 @@ class Tree:
         for child in composable._children:
             self._compose(child)
 
+    def recompose(self, composable: Composable | None = None) -> Recomposition:
+        """
+        Composes the composable (the root by default) again and diffs the new
+        children against the old by reconcile_key, recursing into matches.
+        Matching children of the same type are kept and updated from the new
+        one, moved if their position changed, and everything unmatched is added
+        or removed.
+        """
+        composable = composable or self._root
+        changes = Recomposition([], [], [], [])
+        if composable is None:
+            return changes
+
+        with self.context():
+            stack = [(composable, [*composable._pending_children, *compose(composable)])]
+            composable._pending_children.clear()
+            while stack:
+                parent, children = stack.pop()
+                for old, new in self._reconcile(parent, children, changes):
+                    grandchildren = [*new._pending_children, *compose(old)]
+                    new._pending_children.clear()
+                    stack.append((old, grandchildren))
+        return changes
+
+    def _reconcile(self, parent: Composable, children: list[Composable], changes: Recomposition) -> list[tuple[Composable, Composable]]:
+        # Returns the kept children paired with what replaced them.
+        previous = {child.reconcile_key: (idx, child) for idx, child in enumerate(parent._children)}
+        kept: list[tuple[Composable, Composable]] = []
+        result: list[Composable] = []
+        seen: set[Hashable] = set()
+
+        for idx, child in enumerate(children):
+            key = child.reconcile_key
+            if key in seen:
+                raise ValueError(f"Duplicate key {key!r} among the children of {parent}")
+            seen.add(key)
+
+            match = previous.pop(key, None)
+            if match is not None and type(match[1]) is type(child):
+                old_idx, old = match
+                if old.update(child):
+                    changes.updated.append(old)
+                if old_idx != idx:
+                    changes.moved.append(old)
+                result.append(old)
+                kept.append((old, child))
+                continue
+            if match is not None:
+                # Same key but a different type, so it has to be replaced.
+                previous[key] = match
+
+            result.append(child)
+            self._registry.add(child)
+            child._attach(parent)
+            self._compose(child)
+            changes.added.append(child)
+
+        for _, old in previous.values():
+            self._unregister(old)
+            changes.removed.append(old)
+
+        parent._children = result
+        return kept
+
+    def _unregister(self, composable: Composable) -> None:
+        stack = [composable]
+        while stack:
+            node = stack.pop()
+            self._registry.discard(node)
+            stack.extend(node._children)
+        composable._dettach()
+
     def _register(self, parent: Composable, *children: Composable) -> list[Composable]:
         if not children:
             return []
@@ -183,6 +285,7 @@ def compose(composable: Composable) -> list[Composable]:
 
     finally:
         Tree.get_tree()._composition_stacks.pop(-1)
+        Tree.get_tree()._composition_list.pop(-1)
         # Even if composing fails we have to clear the Tree so it can continue functioning
         # Todo
         pass
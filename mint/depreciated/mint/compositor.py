@@ -0,0 +1,374 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Hashable, Iterable, Callable, Any, Protocol
+from functools import partial
+from time import perf_counter_ns
+
+from . import trace
+
+if TYPE_CHECKING:
+    from .core import Renderable
+
+# Rects passed to offscreen backends as (left, bottom, width, height) in tree units
+type LayerArea = tuple[float, float, float, float]
+
+
+class LayerCompositor:
+    """
+    Groups a tree's draw work into runs of (depth bucket, renderable) so that
+    elements layer by depth rather than by the order renderables were created.
+
+    Runs are drawn bucket by bucket, and adjacent runs which share a state key
+    only bind their GL state once. A new run of the same renderable name as the
+    run drawn just before it shares that run's renderable, so a renderable used
+    at many depths with nothing else between them is still one draw. Runs of
+    another name landing between them split the shared renderable again.
+
+    The resolved draw commands of a frame are recorded into a flat list and
+    replayed every frame until a renderable or the tree invalidates them.
+    """
+
+    def __init__(self, bucket_size: int = 1, on_invalidate: Callable[[], None] | None = None) -> None:
+        # How many element depths share a single run of each renderable.
+        # Larger buckets mean fewer draw calls but coarser layering.
+        self._bucket_size: int = bucket_size
+        # Called whenever the recorded commands are invalidated, used by cached layers.
+        self._on_invalidate: Callable[[], None] | None = on_invalidate
+        # Every run mapped to the renderable that holds its draw work, adjacent runs may share one.
+        self._runs: dict[tuple[int, str], Renderable] = {}
+        # The order each run was created in, used to order runs within a bucket.
+        self._sequence: dict[tuple[int, str], int] = {}
+        self._next_sequence: int = 0
+        # The sorted draw order of the runs, None when it needs to be resorted.
+        self._order: list[Renderable] | None = None
+        # The recorded draw commands, None when they need to be recorded again.
+        self._commands: list[Callable[[], Any]] | None = None
+
+        # Counters for the recorded frame.
+        self.draw_calls: int = 0
+        self.state_changes: int = 0
+
+        # How many frames replayed the recorded commands, and how many had to record them.
+        self.replayed_frames: int = 0
+        self.rebuilt_frames: int = 0
+        # Running total of the bytes commands reported uploading (buffer updates return their size).
+        self.uploaded_bytes: int = 0
+
+    @property
+    def bucket_size(self) -> int:
+        return self._bucket_size
+
+    def bucket(self, depth: int) -> int:
+        return depth // self._bucket_size
+
+    def get(self, name: str, depth: int) -> Renderable | None:
+        return self._runs.get((depth // self._bucket_size, name))
+
+    def shared(self, name: str, depth: int) -> Renderable | None:
+        # The renderable a new run at this depth should draw with, if the run drawn just before it has the same name.
+        before, _ = self._neighbours(depth // self._bucket_size)
+        if before is None or before[1] != name:
+            return None
+        return self._runs[before]
+
+    def deeper(self, name: str, depth: int) -> list[int]:
+        # The later buckets sharing this run's renderable. A renderable draws its items in the
+        # order they were added, so these have to move out before anything is added at this depth.
+        bucket = depth // self._bucket_size
+        renderable = self._runs.get((bucket, name))
+        return sorted(key[0] for key, other in self._runs.items() if other is renderable and key[0] > bucket)
+
+    def add(self, name: str, depth: int, renderable: Renderable) -> tuple[str, list[int]]:
+        """
+        Add a run, returning the name and buckets of the runs which have to move
+        to a renderable of their own through split, as the new run landed between
+        them and the earlier runs they shared a renderable with.
+        """
+        key = (depth // self._bucket_size, name)
+        if key in self._runs:
+            return name, []
+        before, after = self._neighbours(key[0])
+
+        self._runs[key] = renderable
+        self._sequence[key] = self._next_sequence
+        self._next_sequence += 1
+        self._order = None
+        self._commands = None
+        self._bind(renderable)
+
+        if before is None or after is None:
+            return name, []
+        shared = self._runs[before]
+        if shared is renderable or self._runs[after] is not shared:
+            return name, []
+        return after[1], sorted(other[0] for other, run in self._runs.items() if run is shared and other[0] > key[0])
+
+    def split(self, name: str, buckets: Iterable[int], renderable: Renderable) -> Renderable | None:
+        # Moves the runs onto a new renderable, returning the one they shared. The caller moves their items.
+        shared = None
+        for bucket in buckets:
+            shared = self._runs[(bucket, name)]
+            self._runs[(bucket, name)] = renderable
+        self._order = None
+        self._bind(renderable)
+        self.invalidate()
+        return shared
+
+    def _bind(self, renderable: Renderable) -> None:
+        # Let the renderable tell us when its draw commands or contents change.
+        renderable.invalidate = self.invalidate
+        renderable.mark_changed = self.mark_changed
+
+    def _neighbours(self, bucket: int) -> tuple[tuple[int, str] | None, tuple[int, str] | None]:
+        # The runs drawn just before and just after a new run in this bucket, new runs draw last within their bucket.
+        before = after = None
+        for key in self._runs:
+            if key[0] <= bucket:
+                if before is None or (key[0], self._sequence[key]) > (before[0], self._sequence[before]):
+                    before = key
+            elif after is None or (key[0], self._sequence[key]) < (after[0], self._sequence[after]):
+                after = key
+        return before, after
+
+    def remove(self, name: str, depth: int) -> Renderable | None:
+        key = (depth // self._bucket_size, name)
+        if key not in self._runs:
+            return None
+        renderable = self._runs.pop(key)
+        del self._sequence[key]
+        self._order = None
+        self.invalidate()
+        return renderable
+
+    def renderables(self) -> Iterable[Renderable]:
+        return {id(renderable): renderable for renderable in self._runs.values()}.values()
+
+    def release(self) -> list[tuple[str, Renderable]]:
+        # Removes every run, returning their names and renderables so they can be reused.
+        released = list({id(renderable): (name, renderable) for (_, name), renderable in self._runs.items()}.values())
+        self._runs.clear()
+        self._sequence.clear()
+        self._order = None
+        self.invalidate()
+        return released
+
+    def clear(self) -> None:
+        for renderable in self.renderables():
+            renderable.clear()
+        self._commands = None
+
+    def invalidate(self) -> None:
+        self._commands = None
+        if self._on_invalidate is not None:
+            self._on_invalidate()
+
+    def mark_changed(self) -> None:
+        # The recorded commands upload the new contents themselves, only a cached layer has to render again.
+        if self._on_invalidate is not None:
+            self._on_invalidate()
+
+    def record(self) -> list[Callable[[], Any]]:
+        if self._order is None:
+            keys = sorted(self._runs, key=lambda key: (key[0], self._sequence[key]))
+            self._order = [self._runs[key] for key in keys]
+
+        commands: list[Callable[[], Any]] = []
+        draw_calls = 0
+        state_changes = 0
+        bound: Renderable | None = None
+        bound_key: Hashable = None
+        previous: Renderable | None = None
+
+        for renderable in self._order:
+            # Runs sharing a renderable are always adjacent, and draw as one.
+            if renderable is previous:
+                continue
+            previous = renderable
+            if renderable.is_empty():
+                continue
+
+            key = renderable.state_key()
+            if bound is None or key != bound_key:
+                if bound is not None:
+                    commands.append(bound.unbind_state)
+                commands.append(renderable.bind_state)
+                bound = renderable
+                bound_key = key
+                state_changes += 1
+
+            commands.extend(renderable.commands())
+            draw_calls += 1
+
+        if bound is not None:
+            commands.append(bound.unbind_state)
+
+        self.draw_calls = draw_calls
+        self.state_changes = state_changes
+        return commands
+
+    def draw(self) -> None:
+        commands = self._commands
+        if commands is None:
+            commands = self._commands = self.record()
+            self.rebuilt_frames += 1
+        else:
+            self.replayed_frames += 1
+
+        tracer = trace.get_tracer()
+        if tracer is not None:
+            self._draw_traced(commands, tracer)
+            return
+
+        uploaded = 0
+        for command in commands:
+            result = command()
+            if type(result) is int:
+                uploaded += result
+        self.uploaded_bytes += uploaded
+
+    def _draw_traced(self, commands: list[Callable[[], Any]], tracer: trace.Tracer) -> None:
+        uploaded = 0
+        for command in commands:
+            start = perf_counter_ns()
+            result = command()
+            tracer.record(_command_name(command), "render", start, perf_counter_ns())
+            if type(result) is int:
+                uploaded += result
+        self.uploaded_bytes += uploaded
+
+
+def _command_name(command: Callable[[], Any]) -> str:
+    if isinstance(command, partial):
+        command = command.func
+    return getattr(command, '__qualname__', type(command).__name__)
+
+
+class OffscreenBackend(Protocol):
+    """
+    Everything a LayerCache needs from the graphics library. Targets are
+    opaque to the cache so a stand-in backend can record how they are used.
+    """
+
+    def create_target(self, width: int, height: int) -> Any: ...
+
+    def release_target(self, target: Any) -> None: ...
+
+    # Draw into the target with the area mapped to the whole target.
+    def render_to_target(self, target: Any, area: LayerArea, draw: Callable[[], None]) -> None: ...
+
+    # Draw the target's contents into the area using the current camera.
+    def draw_target(self, target: Any, area: LayerArea) -> None: ...
+
+
+class LayerCache:
+    """
+    A subtree rendered once to an offscreen target and then drawn as a single
+    quad until something inside it invalidates.
+
+    The cache is a renderable in its parent compositor, and owns its own
+    compositor which the subtree's renderables are created in. Moving the
+    cached element doesn't invalidate it, only resizing or rescaling does.
+    """
+
+    def __init__(self, name: str, depth: int, backend: OffscreenBackend, parent: LayerCompositor, bucket_size: int = 1) -> None:
+        # The run name and depth of the cache within the parent compositor.
+        self.name: str = name
+        self.depth: int = depth
+
+        self._backend: OffscreenBackend = backend
+        self._parent: LayerCompositor = parent
+        self.compositor: LayerCompositor = LayerCompositor(bucket_size, self.mark_dirty)
+
+        self._target: Any = None
+        self._target_size: tuple[int, int] = (0, 0)
+        # Pixels per tree unit, so the target matches the on screen resolution.
+        self._scale: float = 1.0
+        self._area: LayerArea = (0.0, 0.0, 0.0, 0.0)
+        self._dirty: bool = True
+
+        # How many frames re-rendered the subtree, and how many reused the target.
+        self.renders: int = 0
+        self.reuses: int = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+        # Even when already dirty, as a cache which hasn't drawn since (an empty one
+        # the parent skipped when recording) may now need to be recorded. A cache
+        # nested inside another dirties its parent through this too.
+        self._parent.invalidate()
+
+    def set_area(self, left: float, bottom: float, width: float, height: float) -> None:
+        area = (left, bottom, width, height)
+        if area == self._area:
+            return
+        resized = (width, height) != self._area[2:]
+        self._area = area
+        if resized:
+            self.mark_dirty()
+        else:
+            # The target is still valid, but the quad moved.
+            self._parent.invalidate()
+
+    def set_scale(self, scale: float) -> None:
+        if scale == self._scale:
+            return
+        self._scale = scale
+        self.mark_dirty()
+
+    def release(self) -> None:
+        if self._target is not None:
+            self._backend.release_target(self._target)
+        self._target = None
+        self._target_size = (0, 0)
+        self.compositor.clear()
+        self._dirty = True
+
+    # -- RENDERABLE METHODS --
+
+    def add(self, item: Any) -> None: ...
+
+    def remove(self, item: Any) -> None: ...
+
+    def commands(self) -> Iterable[Callable[[], Any]]:
+        return (self.draw,)
+
+    def invalidate(self) -> None: ...
+
+    def mark_changed(self) -> None: ...
+
+    def state_key(self) -> Hashable:
+        return self
+
+    def bind_state(self) -> None: ...
+
+    def unbind_state(self) -> None: ...
+
+    def is_empty(self) -> bool:
+        return self._area[2] <= 0.0 or self._area[3] <= 0.0
+
+    def is_full(self) -> bool:
+        return False
+
+    def clear(self) -> None:
+        self.compositor.clear()
+
+    def draw(self) -> bool | None:
+        size = (max(1, round(self._area[2] * self._scale)), max(1, round(self._area[3] * self._scale)))
+        if size != self._target_size:
+            if self._target is not None:
+                self._backend.release_target(self._target)
+            self._target = self._backend.create_target(*size)
+            self._target_size = size
+            self._dirty = True
+
+        if self._dirty:
+            self._backend.render_to_target(self._target, self._area, self.compositor.draw)
+            self._dirty = False
+            self.renders += 1
+        else:
+            self.reuses += 1
+
+        self._backend.draw_target(self._target, self._area)
@@ -1,9 +1,25 @@
 from __future__ import annotations
 from enum import Enum, StrEnum
 from uuid import uuid4, UUID
-from typing import NamedTuple, Iterable, Protocol, Callable, Any, ClassVar, TypeVar
+from typing import TYPE_CHECKING, NamedTuple, Iterable, Iterator, Protocol, Callable, Any, ClassVar, TypeVar, Hashable
 import dataclasses
 import weakref
+from functools import partial
+from time import perf_counter, perf_counter_ns
+from math import floor, ceil
+from pathlib import Path
+
+from .compositor import LayerCompositor, LayerCache, OffscreenBackend
+from .flat_layout import FlatLayout, LayoutKind, distribute
+from .spatial import SpatialHash
+from .input_queue import InputQueue
+from .scheduler import Scheduler, Job, JobPriority
+from .layout_cache import save_layout, load_layout
+from .stats import TreeStats
+from . import trace
+
+if TYPE_CHECKING:
+    from .animation import Animator
 
 from arcade import Rect, LRBT, XYWH, Vec2, clock, Camera2D
 from arcade.types import RGBA255
@@ -102,6 +118,36 @@ class BuiltInAxis(StrEnum):
     MOUSE_Y = "MOUSE_Y"
 
 
+# The element method and data callback which handle each event. Every custom event shares one pair.
+_CUSTOM_EVENTS = "CustomEvent"
+_EVENT_HANDLERS: dict[str, tuple[str, str]] = {
+    BuiltInEvents.CURSOR_ENTER: ("cursor_enter", "on_cursor_enter"),
+    BuiltInEvents.CURSOR_EXIT: ("cursor_exit", "on_cursor_exit"),
+    BuiltInEvents.CURSOR_MOTION: ("cursor_hover", "on_cursor_motion"),
+    BuiltInEvents.CURSOR_CLICK: ("cursor_click", "on_cursor_click"),
+    BuiltInEvents.CURSOR_DRAG: ("cursor_drag", "on_cursor_drag"),
+    BuiltInEvents.ACTION_INPUT: ("action_input", "on_action_input"),
+    BuiltInEvents.AXIS_CHANGE: ("axis_changed", "on_axis_changed"),
+    _CUSTOM_EVENTS: ("custom_event", "on_custom_event"),
+}
+# The data fields which only change how events are handled, changing these doesn't need a layout.
+_EVENT_FIELDS: frozenset[str] = frozenset(("event_response", *(callback for _, callback in _EVENT_HANDLERS.values())))
+
+
+class LayoutPass(StrEnum):
+    HORIZONTAL = "layout_horizontal"
+    COMPRESS_WIDTH = "compress_width"
+    WRAPPING = "layout_wrapping"
+    VERTICAL = "layout_vertical"
+    COMPRESS_HEIGHT = "compress_height"
+    POSITION = "layout_position"
+    STYLE = "update_style"
+
+
+# The passes which decide rects, an element overriding any of them has a custom layout.
+_LAYOUT_PASSES: frozenset[str] = frozenset(layout_pass.value for layout_pass in LayoutPass if layout_pass != LayoutPass.STYLE)
+
+
 class MintEvent:
 
     def __init__(self, *, time: float, name: str | None = None) -> None:
@@ -121,6 +167,24 @@ class CursorMotionEvent(MintEvent):
         self.dy: float = dy
 
 
+class CursorEnterEvent(CursorMotionEvent):
+
+    def __init__(
+        self, x: float, y: float, dx: float, dy: float, *, time: float
+    ) -> None:
+        CursorMotionEvent.__init__(self, x, y, dx, dy, time=time)
+        self._name = BuiltInEvents.CURSOR_ENTER
+
+
+class CursorExitEvent(CursorMotionEvent):
+
+    def __init__(
+        self, x: float, y: float, dx: float, dy: float, *, time: float
+    ) -> None:
+        CursorMotionEvent.__init__(self, x, y, dx, dy, time=time)
+        self._name = BuiltInEvents.CURSOR_EXIT
+
+
 class CursorClickEvent(MintEvent):
 
     def __init__(self, x: float, y: float, action: str, pressed: bool, *, time: float):
@@ -169,9 +233,22 @@ class Frame:
 class Mint:
     """
     The Mint object acts as the root of an applications GUI.
+
+    Trees added to a Mint are updated and drawn together in one ordered
+    pass, later trees over earlier ones (a menu, then the HUD, then popups).
+    They share one offscreen backend.
+
+    Renderables whose type makes an arena (see Renderable.create_arena) are
+    created in one arena per name, so live trees share its buffers and
+    uploads. Each tree's renderables draw their own range of the arena, and
+    the tree binds its camera before drawing them, so every range draws with
+    its own tree's projection. The renderables of a removed tree, or of a
+    cached layer that is released, are pooled and handed to the next tree
+    which needs one, keeping their range of the arena.
     """
 
     RENDERABLES: ClassVar[dict[str, type[Renderable]]] = {}
+    OFFSCREEN_BACKEND: ClassVar[type[OffscreenBackend] | None] = None
 
     @staticmethod
     def register_renderable(name: str, renderable: type) -> None:
@@ -180,14 +257,109 @@ class Mint:
             return
         Mint.RENDERABLES[name] = renderable
 
+    @staticmethod
+    def register_offscreen_backend(backend: type[OffscreenBackend]) -> None:
+        Mint.OFFSCREEN_BACKEND = backend
+
     def __init__(self) -> None:
-        pass
+        # The trees in draw order, and the order each was added with.
+        self._trees: list[Tree] = []
+        self._orders: dict[Tree, int] = {}
+        # Cleared renderables waiting to be reused, by renderable name.
+        self._pool: dict[str, list[Renderable]] = {}
+        # The arena every renderable of a name draws a range of, None for types that don't share.
+        self._arenas: dict[str, Any] = {}
+        # Shared by every tree's cached layers, created when first needed.
+        self._offscreen: OffscreenBackend | None = None
+
+    @property
+    def trees(self) -> tuple[Tree, ...]:
+        return tuple(self._trees)
+
+    def add_tree(self, tree: Tree, order: int = 0) -> None:
+        # Trees with a higher order draw over (and update after) those with a lower one.
+        if tree._mint is not None:
+            raise ValueError("Tree already belongs to a Mint")
+        tree._mint = self
+        self._orders[tree] = order
+        self._trees.append(tree)
+        self._trees.sort(key=self._orders.__getitem__)
+
+    def remove_tree(self, tree: Tree) -> None:
+        # Clears the tree's root and takes its renderables back into the pool.
+        if tree._mint is not self:
+            return
+        tree.clear_root()
+        tree._release_renderables()
+        tree._mint = None
+        self._trees.remove(tree)
+        del self._orders[tree]
+
+    def create_renderable(self, name: str) -> Renderable:
+        pool = self._pool.get(name)
+        if pool:
+            return pool.pop()
+        if name not in Mint.RENDERABLES:
+            raise ValueError(f"Renderable {name} not registered")
+        renderable = Mint.RENDERABLES[name]
+        if name not in self._arenas:
+            self._arenas[name] = renderable.create_arena()
+        arena = self._arenas[name]
+        return renderable() if arena is None else renderable(arena)
+
+    def release_renderable(self, name: str, renderable: Renderable) -> None:
+        # Only registered renderables can be handed out again, cached layers are just dropped.
+        if name not in Mint.RENDERABLES:
+            return
+        renderable.clear()
+        self._pool.setdefault(name, []).append(renderable)
+
+    def get_offscreen(self) -> OffscreenBackend:
+        if self._offscreen is None:
+            if Mint.OFFSCREEN_BACKEND is None:
+                raise ValueError("No offscreen backend registered")
+            self._offscreen = Mint.OFFSCREEN_BACKEND()
+        return self._offscreen
+
+    def update(self, dt: float) -> None:
+        for tree in self._trees:
+            tree.update(dt)
+
+    def update_viewport(self, width: int, height: int) -> None:
+        for tree in self._trees:
+            tree.update_viewport(width, height)
+
+    def draw(self) -> None:
+        for tree in self._trees:
+            tree.draw()
 
 
 def register_renderable(name: str, renderable: type[Renderable]) -> None:
     Mint.register_renderable(name, renderable)
 
 
+class _PassTimer:
+    # Times the passes of one layout call into the tree's stats and the active tracer.
+
+    def __init__(self, stats: TreeStats | None, tracer: trace.Tracer | None, element: Element) -> None:
+        self._stats: TreeStats | None = stats
+        self._tracer: trace.Tracer | None = tracer
+        self._args: dict[str, Any] = {"element": element.uid, "type": type(element).__name__}
+        self._start: int = perf_counter_ns()
+
+    def lap(self, name: str) -> None:
+        now = perf_counter_ns()
+        if self._stats is not None:
+            self._stats.add(name, (now - self._start) / 1e9)
+        if self._tracer is not None:
+            self._tracer.record(name, "layout", self._start, now, self._args)
+        self._start = now
+
+    def resume(self) -> None:
+        # Starts the next lap from now, so time spent paused between laps isn't counted.
+        self._start = perf_counter_ns()
+
+
 class Tree:
     """
     Tree's are the root of rendering, animations, and events in Mint (mintree!).
@@ -200,9 +372,13 @@ class Tree:
 
     When an event is fired it runs breadth-first through the nodes in the tree.
 
+    While nothing changes the tree replays the draw commands it recorded
+    rather than walking every renderable each frame.
+
     Elements not in a tree won't be drawn.
 
-    # TODO: depth testing, and depth sorting
+    Renderables are created per depth bucket, so elements are drawn from the
+    root outwards and deeper elements always layer over shallower ones.
     """
 
     def __init__(self) -> None:
@@ -216,36 +392,115 @@ class Tree:
         self._root: Element | None = None
         # The current max depth of the tree
         self._current_depth = 0
-        # The layers of the tree from lowest (root) to highest depth
-        self._layers: list[weakref.WeakSet[Element]] = []
+        # How many members are in each layer of the tree from lowest (root) to highest depth
+        self._layers: list[int] = []
         # All member elements of the tree mapped to their currently stored depth.
         self._members: dict[UUID, int] = {}
-        # All created renderables in the Tree.
-        self._renderables: dict[str, Renderable] = {}
+        # The members again but held weakly. Removing an element releases it from both, so
+        # if their lengths differ an element was collected without being removed.
+        self._alive: weakref.WeakValueDictionary[UUID, Element] = weakref.WeakValueDictionary()
+        # All created renderables in the Tree, grouped into depth ordered runs.
+        self._compositor: LayerCompositor = LayerCompositor()
+        # The grouped items of an attach which aren't in their renderables yet, so splitting runs skips them.
+        self._unplaced: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]] = {}
         # Whether the Tree clears empty layers when an element is removed
         self._auto_prune: bool = True
         # The clock used internally by the tree for animations etc.
         self._clock: clock.Clock = clock.Clock()
+        # Made on first use so trees without animations don't need numpy.
+        self._animator: Animator | None = None
         # The cursor position used for cursor enter/exit and motion events
         self._cursor: Vec2 = Vec2()
+        # Window input waiting to be dispatched by the next update
+        self._input: InputQueue = InputQueue()
+        # Whether the cursor is over the tree and should fire events
+        self._cursor_active: bool = True
+        # The elements under the cursor which handle entering and exiting, from the topmost down.
+        self._hovered_enters: tuple[Element, ...] = ()
+        self._hovered_exits: tuple[Element, ...] = ()
+        # The uids of the elements which take part in each event, and the events each element takes part in.
+        self._handlers: dict[str, set[UUID]] = {name: set() for name in _EVENT_HANDLERS}
+        self._handled: dict[UUID, tuple[str, ...]] = {}
+        # The resolved dispatch order of events, cleared whenever members or their handlers change.
+        self._chains: dict[tuple[str, UUID], tuple[Element, ...]] = {}
+        self._broadcasts: dict[str, tuple[Element, ...]] = {}
+        # The laid out rects of every member keyed by uid, used to find the elements under a point.
+        self._hit_index: SpatialHash = SpatialHash()
         # Track that the tree has changed in some way and the root need to layout
         self._tree_stale: bool = False
+        # The layout boundaries with dirty children. Only these subtrees need to
+        # layout again unless the whole tree is stale.
+        self._dirty_layouts: list[Element] = []
+        # How many elements each layout pass visited during the last layout, None unless counting.
+        # With deferred layout they cover the layout jobs run by the last update instead.
+        self._layout_visits: dict[LayoutPass, int] | None = None
+        # Whether visits were asked for directly, stats count them too and either can stop without the other.
+        self._count_visits: bool = False
+        # Whether the visits were counted by scheduled jobs this frame and not added to the stats yet.
+        self._scheduled_visits: bool = False
+        # Whether layout runs through the flat array engine rather than recursive element calls.
+        self._flat_layout: bool = False
+        # Work spread over frames within a time budget, run by update.
+        self._scheduler: Scheduler = Scheduler()
+        # Whether dirty subtrees are laid out by scheduled jobs rather than all at once in draw.
+        self._deferred_layout: bool = False
+        # The scheduled job laying out the whole tree when it went stale while layout is deferred.
+        self._full_layout: Job | None = None
+        # How long resizing has to pause before a live resize relays out, None when live resizing is off.
+        self._live_resize: float | None = None
+        # The viewport size waiting for resizing to settle, and the clock time it last changed.
+        self._pending_viewport: tuple[int, int] | None = None
+        self._resized_at: float = 0.0
+        # How long the last full layout took, to decide whether a resize can afford one.
+        self._layout_duration: float = 0.0
+        # Per frame timings and counters, None unless enabled so frames don't pay for them.
+        self._stats: TreeStats | None = None
+        # The compositors' upload total at the end of the last frame.
+        self._uploaded_bytes: int = 0
+        # The cached layers of elements with cache_layer set, mapped by their element's uid.
+        self._layer_caches: dict[UUID, LayerCache] = {}
+        self._cached_elements: weakref.WeakSet[Element] = weakref.WeakSet()
+        # What cached layers render into, created from the registered backend when first needed.
+        self._offscreen: OffscreenBackend | None = None
+        # The Mint this tree is drawn by, which its renderables and offscreen backend come from.
+        self._mint: Mint | None = None
 
         # -- TEMP DEBUG --
         self._batch = Batch()
         self._context = get_window().ctx
 
     # -- FUNCTIONALITY METHODS --
-    def _finalise_element_uid(self, uid: UUID) -> None:
-        # We need a finaliser which doesn't reference the element
-        # as that would mean the finaliser never fires.
-        if uid not in self._members:
+    def _sweep_members(self) -> None:
+        # Cheap unless something was collected while still a member, which shouldn't
+        # happen unless an element's children were changed without going through it.
+        if len(self._alive) == len(self._members):
             return
 
-        depth = self._members[uid]
-        if not self._layers[depth] and self._auto_prune:
-            self.prune(depth)
-        del self._members[uid]
+        for uid in [uid for uid in self._members if uid not in self._alive]:
+            self._layers[self._members.pop(uid)] -= 1
+            self._hit_index.remove(uid)
+            self._unregister_handlers(uid)
+            if uid in self._layer_caches:
+                self._remove_layer_cache(uid)
+
+        if self._auto_prune:
+            self.prune()
+
+    def set_offscreen_backend(self, backend: OffscreenBackend) -> None:
+        # Must be set before any cached elements are added.
+        self._offscreen = backend
+
+    def _get_offscreen(self) -> OffscreenBackend:
+        if self._offscreen is None and self._mint is not None:
+            self._offscreen = self._mint.get_offscreen()
+        if self._offscreen is None:
+            if Mint.OFFSCREEN_BACKEND is None:
+                raise ValueError("No offscreen backend registered, elements cannot cache their layer")
+            self._offscreen = Mint.OFFSCREEN_BACKEND()
+        return self._offscreen
+
+    def _get_compositor(self, layer: LayerCache | None) -> LayerCompositor:
+        return self._compositor if layer is None else layer.compositor
 
     # -- ELEMENT METHODS --
 
@@ -260,6 +515,7 @@ class Tree:
         # add/remove from the tree so this is easy.
         self._root = root
         self._add_element(root, 0)
+        self._tree_stale = True
 
     def clear_root(self) -> None:
         if self._root is None:
@@ -271,158 +527,751 @@ class Tree:
 
         # We force clear the renderables incase a custom element
         # forgets to remove itself from the renderable
-        for renderable in self._renderables.values():
-            renderable.clear()
+        self._compositor.clear()
 
+        self._root = None
         self._tree_stale = True
 
-    def _add_element(self, element: Element, depth: int):
-        """
-        When a new child is added to an element within the tree we need to add it and all it's children.
+    def _add_element(self, element: Element, depth: int, layer: LayerCache | None = None):
+        self._add_elements((element,), depth, layer)
+
+    def _add_elements(self, elements: Iterable[Element], depth: int, layer: LayerCache | None = None):
         """
-        uid = element.uid
+        When new children are added to an element within the tree we need to add them and all their children.
 
-        if element._tree is not None and element._tree != self:
-            element._tree._remove_element(element)
+        The subtrees are walked once, and the items the elements hand the tree through
+        __renderables__ are grouped so each renderable is only given them in one bulk add.
+        """
+        added: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]] = {}
+        removed: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]] = {}
+        self._unplaced = added
+
+        stack = [(element, depth, layer) for element in reversed(tuple(elements))]
+        while stack:
+            element, depth, layer = stack.pop()
+            uid = element.uid
+
+            if element._tree is not None and element._tree != self:
+                element._tree._remove_element(element)
+
+            old_layer = element._layer
+            element._tree = self
+            element._depth = depth
+
+            # An element caching its layer draws itself and its children into its own cache
+            if element._data.cache_layer:
+                layer = self._add_layer_cache(element, depth, layer)
+            element._layer = layer
+
+            if depth == self._current_depth:
+                self._layers.append(0)
+                self._current_depth = len(self._layers)
+            elif depth > self._current_depth:
+                raise ValueError(f'The tree cannot accept an element with that depth as it would gaps')
+
+            stack.extend((child, depth + 1, layer) for child in reversed(element._children))
+
+            if uid not in self._members:
+                self._layers[depth] += 1
+                self._members[uid] = depth
+                self._alive[uid] = element
+
+                element.__add_to_tree__(self, depth)
+                self._group_renderables(added, element, depth, layer)
+                self._register_handlers(element)
+                continue
+
+            old = self._members[uid]
+            element.__move_in_tree__(depth)
+            self._invalidate_dispatch()
+
+            if old == depth and old_layer is layer:
+                continue
+
+            self._layers[old] -= 1
+            self._layers[depth] += 1
+            self._members[uid] = depth
 
-        element._tree = self
-        element._depth = depth
+            compositor = self._get_compositor(layer)
+            if old_layer is not layer or compositor.bucket(old) != compositor.bucket(depth):
+                self._group_renderables(removed, element, old, old_layer)
+                self._group_renderables(added, element, depth, layer)
+
+        self._remove_renderables(removed)
+        self._add_renderables(added)
+
+    def _add_renderables(self, groups: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]]) -> None:
+        # Shallowest first, so runs sharing a renderable are filled in depth order.
+        for key in sorted(groups, key=lambda key: key[2]):
+            layer, name, _ = key
+            depth, items = groups[key]
+            renderable = self.get_renderable(name, depth, layer)
+            # Items already in the renderable at greater depths would draw beneath these.
+            deeper = self._get_compositor(layer).deeper(name, depth)
+            if deeper:
+                self._split_runs(layer, name, deeper)
+                renderable = self.get_renderable(name, depth, layer)
+            del groups[key]
+            renderable.add_many(items)
+        self._unplaced = {}
+
+    def _group_renderables(self, groups: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]], element: Element, depth: int, layer: LayerCache | None) -> None:
+        bucket = self._get_compositor(layer).bucket(depth)
+        for name, item in element.__renderables__():
+            key = (layer, name, bucket)
+            if key not in groups:
+                groups[key] = (depth, [])
+            groups[key][1].append(item)
+
+    def _remove_renderables(self, groups: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]]) -> None:
+        for (layer, name, _), (depth, items) in groups.items():
+            renderable = self._get_compositor(layer).get(name, depth)
+            if renderable is not None:
+                renderable.remove_many(items)
 
-        self._tree_stale = True
+    def _remove_element(self, element: Element):
+        self._remove_elements((element,))
+
+    def _remove_elements(self, elements: Iterable[Element]):
+        # The mirror of _add_elements, the subtrees are walked once and the renderables emptied in bulk.
+        removed: dict[tuple[LayerCache | None, str, int], tuple[int, list[Any]]] = {}
+        caches: list[UUID] = []
+
+        stack = list(elements)
+        while stack:
+            element = stack.pop()
+            if element._tree != self:
+                continue
+
+            uid = element.uid
+            if uid not in self._members:
+                continue
+            depth = self._members[uid]
+
+            element.__remove_from_tree__()
+            self._group_renderables(removed, element, depth, element._layer)
+            stack.extend(element._children)
+
+            if uid in self._layer_caches:
+                caches.append(uid)
+                self._cached_elements.discard(element)
+            element._layer = None
+
+            self._layers[depth] -= 1
+            del self._members[uid]
+            self._alive.pop(uid, None)
+            self._hit_index.remove(uid)
+            self._unregister_handlers(uid)
+
+            element._tree = None
+
+        # Renderables inside a cached layer have to be emptied before the layer is released.
+        self._remove_renderables(removed)
+        for uid in caches:
+            self._remove_layer_cache(uid)
+
+        if self._auto_prune:
+            self.prune()
+
+    def _add_layer_cache(self, element: Element, depth: int, parent: LayerCache | None) -> LayerCache:
+        if element.uid in self._layer_caches:
+            self._remove_layer_cache(element.uid)
+
+        compositor = self._get_compositor(parent)
+        cache = LayerCache(f"{BuiltInRenderable.LAYER}_{element.uid}", depth, self._get_offscreen(), compositor, compositor.bucket_size)
+        cache.set_scale(self._layer_scale())
+        self._split_runs(parent, *compositor.add(cache.name, depth, cache))
+
+        self._layer_caches[element.uid] = cache
+        self._cached_elements.add(element)
+        return cache
+
+    def _remove_layer_cache(self, uid: UUID) -> None:
+        cache = self._layer_caches.pop(uid)
+        cache._parent.remove(cache.name, cache.depth)
+        cache.release()
+        if self._mint is not None:
+            for name, renderable in cache.compositor.release():
+                self._mint.release_renderable(name, renderable)
+
+    def _layer_scale(self) -> float:
+        # Pixels per tree unit, so cached layers render at screen resolution
+        if self._camera.width <= 0.0:
+            return 1.0
+        return self._camera.viewport_width / self._camera.width
 
-        if depth == self._current_depth:
-            self._layers.append(weakref.WeakSet())
-            self._current_depth = len(self._layers)
-        elif depth > self._current_depth:
-            raise ValueError(f'The tree cannot accept an element with that depth as it would gaps')
+    def prune(self, finish: int = 0) -> None:
+        # Work from the end of the layers and remove all empty layers.
+        # Does not handle floating layers (which should be impossible)
+        while len(self._layers) > finish + 1 and not self._layers[-1]:
+            self._layers.pop()
+        self._current_depth = len(self._layers)
 
-        if uid not in self._members:
-            self._layers[depth].add(element)
-            self._members[uid] = depth
+    # -- RENDERABLE METHODS --
 
-            # This helps insure the Tree discards an element correctly when it is no longer referenced
-            finaliser = weakref.finalize(
-                element, self._finalise_element_uid, uid
-            )
-            finaliser.atexit = False
+    def get_renderable(self, name: str, depth: int = 0, layer: LayerCache | None = None) -> Renderable:
+        compositor = self._get_compositor(layer)
+        renderable = compositor.get(name, depth)
+        if renderable is None:
+            self.add_renderable(name, depth, layer)
+            renderable = compositor.get(name, depth)
 
-            element.__add_to_tree__(self, depth)
+        return renderable  # type: ignore -- add_renderable either adds it or raises
 
-            for child in element._children:
-                self._add_element(child, depth + 1)
+    def add_renderable(self, name: str, depth: int = 0, layer: LayerCache | None = None) -> None:
+        compositor = self._get_compositor(layer)
+        if compositor.get(name, depth) is not None:
             return
 
-        old = self._members[uid]
-        element.__move_in_tree__(depth)
+        renderable = compositor.shared(name, depth)
+        if renderable is None:
+            renderable = self._create_renderable(name)
+        self._split_runs(layer, *compositor.add(name, depth, renderable))
 
-        if old == depth:
-            for child in element._children:
-                self._add_element(child, depth + 1)
-            return
+    def _create_renderable(self, name: str) -> Renderable:
+        if self._mint is not None:
+            return self._mint.create_renderable(name)
 
-        self._layers[old].remove(element)
-        self._layers[depth].add(element)
+        if name not in Mint.RENDERABLES:
+            raise ValueError(f"Renderable {name} not registered")
 
-        for child in element._children:
-            self._add_element(child, depth + 1)
+        return Mint.RENDERABLES[name]()
 
-    def _remove_element(self, element: Element):
-        if element._tree != self:
+    def _split_runs(self, layer: LayerCache | None, name: str, buckets: list[int]) -> None:
+        """
+        Move runs which shared a renderable onto a new one of their own. Only the
+        items elements hand the tree through __renderables__ are moved across, as
+        those are the only ones the tree knows the depth of.
+        """
+        if not buckets:
             return
-
-        uid = element.uid
-
-        if uid not in self._members:
+        compositor = self._get_compositor(layer)
+        renderable = self._create_renderable(name)
+        shared = compositor.split(name, buckets, renderable)
+
+        unplaced = {id(item) for (group_layer, group_name, _), (_, items) in self._unplaced.items() if group_layer is layer and group_name == name for item in items}
+        moving = set(buckets)
+        items = [
+            item
+            for element in self._alive.values()
+            if element._layer is layer and compositor.bucket(element._depth) in moving
+            for item_name, item in element.__renderables__()
+            if item_name == name and id(item) not in unplaced
+        ]
+        if items:
+            shared.remove_many(items)
+            renderable.add_many(items)
+
+    def _release_renderables(self) -> None:
+        # Hands every renderable back to the Mint's pool, they are made again as elements need them.
+        for uid in tuple(self._layer_caches):
+            self._remove_layer_cache(uid)
+        for name, renderable in self._compositor.release():
+            self._mint.release_renderable(name, renderable)
+
+    def _mark_layout_dirty(self, boundary: Element) -> None:
+        if boundary is self._root:
+            self._tree_stale = True
             return
-        depth = self._members[uid]
-
+        self._dirty_layouts.append(boundary)
+
+    def count_layout_visits(self, enabled: bool = True) -> None:
+        # Off by default so normal layouts don't pay for the bookkeeping.
+        self._count_visits = enabled
+        self._layout_visits = {layout_pass: 0 for layout_pass in LayoutPass} if enabled or self._stats is not None else None
+
+    def _reset_layout_visits(self) -> None:
+        if self._layout_visits is not None:
+            self._layout_visits = {layout_pass: 0 for layout_pass in LayoutPass}
+
+    @property
+    def layout_visits(self) -> dict[LayoutPass, int] | None:
+        if self._layout_visits is None:
+            return None
+        return dict(self._layout_visits)
+
+    def _visit(self, layout_pass: LayoutPass, count: int = 1) -> None:
+        if self._layout_visits is not None:
+            self._layout_visits[layout_pass] += count
+
+    def use_flat_layout(self, enabled: bool = True) -> None:
+        # For very large or deep trees. Only the built in layouts are flattened, see FlatLayout.
+        self._flat_layout = enabled
         self._tree_stale = True
 
-        element.__remove_from_tree__()
-        for child in element._children:
-            self._remove_element(child)
-
-        self._layers[depth].remove(element)
-        if not self._layers[depth] and self._auto_prune:
-            self.prune(depth)
-        del self._members[uid]
-
-        element._tree = None
+    def _layout_element(self, element: Element) -> None:
+        if self._flat_layout:
+            timer = self._pass_timer(element)
+            FlatLayout(element).layout()
+            if timer is not None:
+                timer.lap("flat_layout")
+        else:
+            element.layout()
+
+    def enable_stats(self, enabled: bool = True, frames: int = 120) -> None:
+        # Keeps per phase timings, layout visits, draw calls and uploaded bytes for the last frames.
+        self._stats = TreeStats(frames) if enabled else None
+        self._layout_visits = {layout_pass: 0 for layout_pass in LayoutPass} if enabled or self._count_visits else None
+
+    @property
+    def stats(self) -> TreeStats | None:
+        return self._stats
+
+    def _pass_timer(self, element: Element) -> _PassTimer | None:
+        tracer = trace.get_tracer()
+        if self._stats is None and tracer is None:
+            return None
+        return _PassTimer(self._stats, tracer, element)
+
+    def _end_stats_frame(self, stats: TreeStats, laid_out: bool) -> None:
+        laid_out = laid_out or self._scheduled_visits
+        self._scheduled_visits = False
+        if laid_out and self._layout_visits is not None:
+            for layout_pass, visits in self._layout_visits.items():
+                stats.add(f"visits.{layout_pass}", visits)
+
+        uploaded = self._compositor.uploaded_bytes + sum(
+            cache.compositor.uploaded_bytes for cache in self._layer_caches.values()
+        )
+        stats.add("uploaded_bytes", max(0, uploaded - self._uploaded_bytes))
+        self._uploaded_bytes = uploaded
+        stats.add("draw_calls", self._compositor.draw_calls)
+        stats.end_frame()
+
+    def defer_layout(self, enabled: bool = True) -> None:
+        # Dirty subtrees are laid out over the following frames within the scheduler's
+        # budget, on screen ones first. A stale tree is laid out by a job too, a pass
+        # over one of the root's children at a time, and draw keeps showing the last
+        # layout until it finishes.
+        self._deferred_layout = enabled
+
+    def _schedule_full_layout(self) -> None:
+        # Everything already queued is covered by laying out the whole tree.
+        self._dirty_layouts.clear()
+        self._tree_stale = False
+        self._full_layout = self._scheduler.schedule(self._full_layout_job(self._root), JobPriority.VISIBLE, "full_layout")
+
+    def _full_layout_job(self, root: Element) -> Iterator[None]:
+        root.width = self._camera.width
+        root.height = self._camera.height
+        root.left = 0.0
+        root.bottom = 0.0
+
+        # Only the time spent in steps counts, not the frames in between.
+        duration = 0.0
+        start = perf_counter()
+        if self._flat_layout:
+            self._layout_element(root)
+        else:
+            for _ in root.layout_steps():
+                duration += perf_counter() - start
+                yield
+                if self._root is not root:
+                    self._full_layout = None
+                    return
+                start = perf_counter()
+
+        # Boundaries dirtied while the job was paused may have been cleaned by a later
+        # pass without laying out their new data, so flag them again to be scheduled.
+        for element in self._dirty_layouts:
+            element._has_changed_layout = True
+        self._update_layer_caches()
+        self._update_hit_index(None)
+        self._layout_duration = duration + perf_counter() - start
+        self._full_layout = None
+
+    def _schedule_dirty_layouts(self) -> None:
+        dirty = sorted(self._dirty_layouts, key=lambda element: element._depth)
+        self._dirty_layouts.clear()
+
+        width, height = self._camera.width, self._camera.height
+        for element in dirty:
+            visible = (
+                element.left < width and element.left + element.width > 0.0
+                and element.bottom < height and element.bottom + element.height > 0.0
+            )
+            priority = JobPriority.VISIBLE if visible else JobPriority.BACKGROUND
+            self._scheduler.schedule(partial(self._layout_job, element), priority, "layout")
 
-        # This doesn't get rid of the finaliser, but maybe that's okay?
+    def _layout_job(self, element: Element) -> None:
+        # Skipped if an ancestor was relaid or the whole tree laid out first.
+        if element._tree is not self or not element._has_changed_layout:
+            return
+        self._layout_element(element)
+        self._update_layer_caches()
+        self._update_hit_index([element])
 
-    def prune(self, finish: int = 0) -> None:
-        # Work from the end of the layers and remove all empty layers.
-        # Does not handle floating layers (which should be impossible)
-        for layer in self._layers[-1:finish:-1]:
-            if layer:
-                break
-            self._layers.remove(layer)
-        self._current_depth = len(self._layers)
+    @property
+    def animator(self) -> Animator:
+        if self._animator is None:
+            from .animation import Animator
+            self._animator = Animator()
+        return self._animator
 
-    # -- RENDERABLE METHODS --
+    @property
+    def scheduler(self) -> Scheduler:
+        return self._scheduler
 
-    def get_renderable(self, name: str) -> Renderable:
-        if name not in self._renderables:
-            self.add_renderable(name)
+    def schedule(self, work: Iterator[Any] | Callable[[], Any], priority: int = JobPriority.VISIBLE, name: str = "") -> Job:
+        # For work too slow to finish in one frame. A generator is resumed once per step,
+        # a generator function is called for one, and a plain callable runs as a single step.
+        return self._scheduler.schedule(work, priority, name)
 
-        return self._renderables[name]
+    def set_frame_budget(self, seconds: float) -> None:
+        self._scheduler.budget = seconds
 
-    def add_renderable(self, name: str) -> None:
-        if name in self._renderables:
+    def layout(self) -> None:
+        if self._root is None:
             return
 
-        if name not in Mint.RENDERABLES:
-            raise ValueError(f"Renderable {name} not registered")
+        if self._full_layout is not None:
+            # Finish the whole tree now rather than over the coming frames.
+            self._full_layout.cancel()
+            self._full_layout = None
+            self._tree_stale = True
 
-        self._renderables[name] = Mint.RENDERABLES[name]()
+        self._reset_layout_visits()
 
-    def layout(self) -> None:
-        if self._root is None:
+        if not self._tree_stale:
+            self._layout_dirty()
             return
 
+        start = perf_counter()
         self._root.width = self._camera.width
         self._root.height = self._camera.height
         self._root.left = 0.0
         self._root.bottom = 0.0
 
-        self._root.layout()
+        self._layout_element(self._root)
+        self._dirty_layouts.clear()
+        self._update_layer_caches()
+        self._update_hit_index(None)
+
+        self._tree_stale = False
+        self._layout_duration = perf_counter() - start
+
+    def save_layout(self, path: str | Path) -> None:
+        # Lays out first if needed, so the file always holds a finished layout.
+        if self._root is None:
+            return
+        if self._tree_stale or self._dirty_layouts:
+            self.layout()
+        save_layout(path, self._root, self._camera.width, self._camera.height)
+
+    def load_layout(self, path: str | Path) -> bool:
+        """
+        Takes the layout from a file written by save_layout instead of laying
+        out, if the tree has the same structure and frame size as when it was
+        saved. Only styles are updated. Returns whether the file was used.
+        """
+        if self._root is None or not load_layout(path, self._root, self._camera.width, self._camera.height):
+            return False
 
+        self._dirty_layouts.clear()
+        self._update_layer_caches(True)
+        self._update_hit_index(None)
+        self._root.update_style()
         self._tree_stale = False
+        return True
+
+    def _layout_dirty(self) -> None:
+        # Shallowest first, so a boundary inside another dirty boundary is
+        # already clean by the time we reach it.
+        dirty = sorted(self._dirty_layouts, key=lambda element: element._depth)
+        self._dirty_layouts.clear()
+
+        relaid: list[Element] = []
+        for element in dirty:
+            if element._tree is not self or not element._has_changed_layout:
+                continue
+            self._layout_element(element)
+            relaid.append(element)
+
+        if relaid:
+            self._update_layer_caches()
+            self._update_hit_index(relaid)
+
+    def _update_layer_caches(self, rerender: bool = False) -> None:
+        # Caches were already dirtied when layout inside them was marked dirty, so laying
+        # out around a cached element only moves its quad unless it was resized.
+        for element in self._cached_elements:
+            cache = self._layer_caches[element.uid]
+            cache.set_area(element.left, element.bottom, element.width, element.height)
+            if rerender:
+                cache.mark_dirty()
+
+    def _update_hit_index(self, relaid: list[Element] | None) -> None:
+        # Only the relaid subtrees can have moved, when relaid is None the whole tree was laid out.
+        if relaid is None:
+            self._hit_index.clear()
+            relaid = [] if self._root is None else [self._root]
+
+        index = self._hit_index
+        for boundary in relaid:
+            stack = [boundary]
+            while stack:
+                element = stack.pop()
+                index.insert(element.uid, (element.left, element.bottom, element.width, element.height))
+                stack.extend(element._children)
 
     # -- EVENT METHODS --
 
+    def _hits_at(self, x: float, y: float) -> list[Element]:
+        alive = self._alive
+        return [alive[uid] for uid in self._hit_index.query_point(x, y) if uid in alive]
+
+    def elements_at(self, x: float, y: float) -> list[Element]:
+        # Every element whose laid out rect contains the point (in tree units), topmost first.
+        hits = self._hits_at(x, y)
+        hits.sort(key=Element._paint_order, reverse=True)
+        return hits
+
+    def _topmost_at(self, x: float, y: float) -> Element | None:
+        hits = self._hits_at(x, y)
+        if not hits:
+            return None
+
+        # Only elements at the deepest depth can be topmost, so only they need comparing fully.
+        depth = max(hit._depth for hit in hits)
+        top = [hit for hit in hits if hit._depth == depth]
+        return top[0] if len(top) == 1 else max(top, key=Element._paint_order)
+
+    # -- | -- DISPATCH TABLES -- | --
+
+    def _register_handlers(self, element: Element) -> None:
+        handled = tuple(element._handled_events())
+        if handled:
+            self._handled[element.uid] = handled
+            for name in handled:
+                self._handlers[name].add(element.uid)
+        self._invalidate_dispatch()
+
+    def _unregister_handlers(self, uid: UUID) -> None:
+        for name in self._handled.pop(uid, ()):
+            self._handlers[name].discard(uid)
+        self._invalidate_dispatch()
+
+    def _refresh_handlers(self, element: Element) -> None:
+        self._unregister_handlers(element.uid)
+        self._register_handlers(element)
+
+    def _invalidate_dispatch(self) -> None:
+        if self._chains:
+            self._chains.clear()
+        if self._broadcasts:
+            self._broadcasts.clear()
+
+    def _chain(self, name: str, element: Element | None) -> tuple[Element, ...]:
+        # The elements from element up to the root which take part in the event, cached until the tree changes.
+        if element is None or not self._handlers[name]:
+            return ()
+
+        key = (name, element.uid)
+        chain = self._chains.get(key)
+        if chain is None:
+            table = self._handlers[name]
+            found = []
+            while element is not None:
+                if element.uid in table:
+                    found.append(element)
+                element = element.parent
+            chain = self._chains[key] = tuple(found)
+        return chain
+
+    def _broadcast(self, name: str) -> tuple[Element, ...]:
+        # Every element taking part in a non positional event, topmost first like the old waterfall.
+        if self._root is None or not self._handlers[name]:
+            return ()
+
+        order = self._broadcasts.get(name)
+        if order is None:
+            table = self._handlers[name]
+            found = []
+            # Children before their parent, and later children before earlier ones
+            stack: list[tuple[Element, bool]] = [(self._root, False)]
+            while stack:
+                element, visited = stack.pop()
+                if visited:
+                    if element.uid in table:
+                        found.append(element)
+                    continue
+                stack.append((element, True))
+                stack.extend((child, False) for child in element._children)
+            order = self._broadcasts[name] = tuple(found)
+        return order
+
+    def _dispatch(self, elements: Iterable[Element], event: MintEvent) -> bool:
+        # Bubbles the event through the elements in order. Returns whether it was captured.
+        tracer = trace.get_tracer()
+        if tracer is None:
+            return self._bubble(elements, event)
+        with tracer.span(event._name, "dispatch"):
+            return self._bubble(elements, event)
+
+    def _bubble(self, elements: Iterable[Element], event: MintEvent) -> bool:
+        for element in elements:
+            match element._data.event_response:
+                case EventResponse.IGNORE:
+                    continue
+                case EventResponse.BLOCK:
+                    return True
+                case EventResponse.PASS:
+                    element.fire_event(event)
+                case EventResponse.CAPTURE:
+                    element.fire_event(event)
+                    return True
+        return False
+
+    # -- | -- INPUT -- | --
+
+    # Window callbacks queue their input, which update dispatches once per frame.
+
     def mouse_motion(self, x: float, y: float, dx: float, dy: float):
-        self.cursor_motion(x, y, dx, dy)
+        # Window pixels into tree units
+        position = self._camera.unproject((x, y))
+        scale = self._layer_scale()
+        self._input.motion(position.x, position.y, dx / scale, dy / scale)
+
+    def axis_changed(self, action: str, v: float, dv: float):
+        self._input.axis(action, v, dv)
+
+    def action_input(self, action: str, pressed: bool):
+        self._input.action(action, pressed)
+
+    def flush_input(self) -> int:
+        # Called by update. Returns the number of events dispatched after merging.
+        return self._input.flush(self.cursor_motion, self._fire_axis_changed, self._fire_action_input)
+
+    @property
+    def input_counts(self) -> tuple[int, int]:
+        # The (received, dispatched) totals of window input.
+        return self._input.raw_events, self._input.dispatched_events
+
+    # The dispatching side, these fire straight away.
+
+    def custom_event(self, event: MintEvent):
+        self._dispatch(self._broadcast(_CUSTOM_EVENTS), event)
 
-    def custom_event(self, event: MintEvent): ...
     def cursor_motion(self, x: float, y: float, dx: float, dy: float):
         self._cursor = Vec2(x, y)
-        # TODO: fire cursor motion event, then fire enter/exit events
+        if not self._cursor_active:
+            return
+
+        handlers = self._handlers
+        if not (handlers[BuiltInEvents.CURSOR_MOTION] or handlers[BuiltInEvents.CURSOR_ENTER] or handlers[BuiltInEvents.CURSOR_EXIT]):
+            # Nothing listens so there's no need to find what's under the cursor
+            self._update_hovered(None, x, y, dx, dy)
+            return
+
+        top = self._topmost_at(x, y)
+        self._update_hovered(top, x, y, dx, dy)
+        self._dispatch(self._chain(BuiltInEvents.CURSOR_MOTION, top), CursorMotionEvent(x, y, dx, dy, time=self._clock.time))
+
+    def _update_hovered(self, top: Element | None, x: float, y: float, dx: float, dy: float) -> None:
+        # Only the elements which handle entering or exiting need tracking.
+        enters = self._chain(BuiltInEvents.CURSOR_ENTER, top)
+        exits = self._chain(BuiltInEvents.CURSOR_EXIT, top)
+
+        exited = [element for element in self._hovered_exits if element not in exits and element._tree is self]
+        entered = [element for element in enters if element not in self._hovered_enters]
+        self._hovered_enters = enters
+        self._hovered_exits = exits
+
+        time = self._clock.time
+        # Exits fire before enters so handlers never see two elements entered at once.
+        if exited:
+            self._dispatch(exited, CursorExitEvent(x, y, dx, dy, time=time))
+        if entered:
+            self._dispatch(entered, CursorEnterEvent(x, y, dx, dy, time=time))
 
-    def enable_cursor(self): ... # TODO: fire enter events
-    def disable_cursor(self): ... # TODO: fire exit events
-    def axis_changed(self, action: str, v: float, dv: float): ... # TODO: fire axis changed events
-    def action_input(self, action: str, pressed: bool): ... # TODO: fire action event
+    def enable_cursor(self):
+        self._cursor_active = True
+        self._update_hovered(self._topmost_at(self._cursor.x, self._cursor.y), self._cursor.x, self._cursor.y, 0.0, 0.0)
+
+    def disable_cursor(self):
+        self._update_hovered(None, self._cursor.x, self._cursor.y, 0.0, 0.0)
+        self._cursor_active = False
+
+    def _fire_axis_changed(self, action: str, v: float, dv: float):
+        self._dispatch(self._broadcast(BuiltInEvents.AXIS_CHANGE), AxisChangeEvent(action, v, dv, time=self._clock.time))
+
+    def _fire_action_input(self, action: str, pressed: bool):
+        self._dispatch(self._broadcast(BuiltInEvents.ACTION_INPUT), ActionInputEvent(action, pressed, time=self._clock.time))
 
     # -- LOOP METHODS --
 
     def draw(self):
-        if self._tree_stale:
+        tracer = trace.get_tracer()
+        if tracer is None:
+            self._draw()
+            return
+        with tracer.span("frame", "draw"):
+            self._draw()
+
+    def _draw(self) -> None:
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+
+        self._sweep_members()
+        laid_out = not self._deferred_layout and (self._tree_stale or bool(self._dirty_layouts))
+        if laid_out:
             self.layout()
+        if stats is not None:
+            start = stats.lap("layout", start)
 
         with self._camera.activate():
-            for renderable in self._renderables.values():
-                renderable.draw()
+            self._compositor.draw()
+
+        if stats is not None:
+            stats.lap("render", start)
+            self._end_stats_frame(stats, laid_out)
 
     def update(self, dt: float):
         self._clock.tick(dt)
+        self.flush_input()
+
+        if self._deferred_layout and self._layout_visits is not None:
+            # Scheduled layout jobs are counted a frame at a time, rather than adding
+            # up from whenever the tree last laid out.
+            self._reset_layout_visits()
+            self._scheduled_visits = True
+        # While the whole tree is being laid out, changes wait for it to finish.
+        if self._deferred_layout and self._root is not None and self._full_layout is None:
+            if self._tree_stale:
+                self._schedule_full_layout()
+            elif self._dirty_layouts:
+                self._schedule_dirty_layouts()
+        scheduled = self._scheduler.run()
+        if self._stats is not None:
+            self._stats.add("scheduled", scheduled)
         # TODO: if cursor active, and controller active, move cursor
         # TODO: axis changed event
 
-        # TODO: animations
+        if self._animator is not None:
+            self._animator.step(self._clock.delta_time)
+
+        pending = self._pending_viewport
+        if pending is not None and self._clock.time - self._resized_at >= self._live_resize:
+            self._apply_viewport(*pending)
+
+    def use_live_resize(self, enabled: bool = True, settle: float = 0.15) -> None:
+        # While the window is being resized, stretch the last layout over the new viewport
+        # and only relayout once resizing has paused for settle seconds. Trees which
+        # layout within the frame budget keep relaying out every resize.
+        self._live_resize = settle if enabled else None
+        if not enabled and self._pending_viewport is not None:
+            self._apply_viewport(*self._pending_viewport)
 
     def update_viewport(self, width: int, height: int):
+        if self._live_resize is not None and self._root is not None and self._layout_duration > self._scheduler.budget:
+            self._camera.viewport = LRBT(0.0, width, 0.0, height)
+            self._pending_viewport = (width, height)
+            self._resized_at = self._clock.time
+            return
+        self._apply_viewport(width, height)
+
+    def _apply_viewport(self, width: int, height: int) -> None:
+        self._pending_viewport = None
         self._camera.viewport = LRBT(0.0, width, 0.0, height)
 
         aspect = self._frame.aspect
@@ -459,10 +1308,19 @@ class Tree:
                     w = base_w
                     h = base_w / v_aspect
 
+        # The layout only depends on the size of the projection, when just the viewport
+        # (or how far the projection is scaled onto it) changes the camera is enough.
+        resized = (w, h) != (self._camera.width, self._camera.height)
         self._camera.projection = XYWH(0.0, 0.0, w, h)
         self._camera.position = 0.5 * w, 0.5 * h
 
-        self._tree_stale = True
+        scale = self._layer_scale()
+        for cache in self._layer_caches.values():
+            cache.set_scale(scale)
+
+        if resized:
+            self._compositor.invalidate()
+            self._tree_stale = True
 
 
 # |-- RENDERABLES --|
@@ -471,14 +1329,49 @@ class Tree:
 class Renderable(Protocol):
     # a Renderable's __init__ has to have no required arguments.
 
+    # Renderables with buffers worth sharing between trees return an arena for them. A Mint
+    # makes one for each name and passes it to __init__, so its trees draw ranges of one arena.
+    @classmethod
+    def create_arena(cls) -> Any:
+        return None
+
     def add(self, item: Any) -> None:
         pass
 
     def remove(self, item: Any) -> None:
         pass
 
+    # Used by the tree when attaching or detaching whole subtrees.
+    def add_many(self, items: Iterable[Any]) -> None:
+        for item in items:
+            self.add(item)
+
+    def remove_many(self, items: Iterable[Any]) -> None:
+        for item in items:
+            self.remove(item)
+
     def draw(self) -> bool | None: ...
 
+    # The resolved draw calls of the renderable. The tree records these and replays
+    # them each frame until the renderable calls invalidate.
+    def commands(self) -> Iterable[Callable[[], Any]]:
+        return (self.draw,)
+
+    # Replaced by the tree when the renderable is added to it.
+    def invalidate(self) -> None: ...
+
+    # Also replaced by the tree. Call when the contents change but the draw calls
+    # don't (vertex or colour writes), so cached layers holding them render again.
+    def mark_changed(self) -> None: ...
+
+    # Runs drawn back to back which share a state key only bind their state once.
+    def state_key(self) -> Hashable:
+        return type(self)
+
+    def bind_state(self) -> None: ...
+
+    def unbind_state(self) -> None: ...
+
     def is_empty(self) -> bool: ...
 
     def is_full(self) -> bool:
@@ -493,6 +1386,7 @@ class BuiltInRenderable(StrEnum):
     BATCH = "builtin_batch"
     STYLE = "builtin_style"
     MESH = "builtin_mesh"
+    LAYER = "builtin_layer"
 
 
 # |-- ELEMENTS --|
@@ -569,6 +1463,16 @@ class ElementData(Data):
     horizontal_alignmnet: AxisAnchor = AxisAnchor.CENTER
     vertical_alignment: AxisAnchor = AxisAnchor.CENTER
 
+    # -- RENDERING --
+
+    # The fields which only change how the element is drawn, changing just these repaints
+    # the element without a layout. Subclasses add the paint fields they define.
+    paint_fields: ClassVar[frozenset[str]] = frozenset()
+
+    # Render the element and its children once to an offscreen target and reuse it until
+    # something inside invalidates. Best for static panels beside frequently changing ones.
+    cache_layer: bool = False
+
     # -- EVENTS --
 
     # How the element should pass events down to parents.
@@ -605,6 +1509,14 @@ class Content:
     pass
 
 class Element[D: ElementData]: # TODO: make a type var for element data
+    # How the flat layout engine treats the element. Subclasses overriding a layout pass are CUSTOM unless they pick one.
+    _layout_kind: ClassVar[LayoutKind] = LayoutKind.OVERLAY
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if '_layout_kind' not in cls.__dict__ and not _LAYOUT_PASSES.isdisjoint(cls.__dict__):
+            cls._layout_kind = LayoutKind.CUSTOM
+
     def __init__(self, data: D, parent: Element | None = None, uid: UUID | None = None):
         self.uid: UUID = uid if uid is not None else uuid4()
 
@@ -627,20 +1539,33 @@ class Element[D: ElementData]: # TODO: make a type var for element data
         # All children of the element.
         self._children: list[Element[ElementData]] = []
 
-        # Whether data has changed that would cause a layout update.
+        # Whether data has changed that would cause a layout update. Set along the
+        # path from a changed element up to its nearest layout boundary.
         self._has_changed_layout: bool = True
 
+        # The cached layer the element draws into, if it or a parent caches its layer.
+        self._layer: LayerCache | None = None
+
         # A weak reference to the parent as to not cause memory leaks.
-        self._parent = None
+        self._parent: weakref.ref[Element] | None = None
         if parent is not None:
             parent.add_child(self)
 
+    @property
+    def parent(self) -> Element | None:
+        return None if self._parent is None else self._parent()
+
     # -- TREE METHODS --
 
     def __add_to_tree__(self, tree: Tree | None, depth: int): ...
     def __move_in_tree__(self, depth: int): self.__add_to_tree__(self._tree, depth)
     def __remove_from_tree__(self): ...
 
+    # The (renderable name, item) pairs the tree should add to its renderables for this element.
+    # Prefer this over fetching renderables in __add_to_tree__ as the tree adds them in bulk.
+    def __renderables__(self) -> Iterable[tuple[str, Any]]:
+        return ()
+
     def __add_child__(self, child: Element): ...
     def __remove_child__(self, child: Element): ...
     def __move_child__(self, child: Element, idx: int): ...
@@ -650,31 +1575,69 @@ class Element[D: ElementData]: # TODO: make a type var for element data
         if child in self._children or child is self:
             return False
         self._children.append(child)
+        child._parent = weakref.ref(self)
         self.__add_child__(child)
 
         if self._tree is not None:
-            self._tree._add_element(child, self._depth + 1)
+            self._tree._add_element(child, self._depth + 1, self._layer)
 
-        self._has_changed_layout = True
+        self.mark_layout_dirty()
         return True
 
     def add_children(self, children: Iterable[Element]) -> bool:
-        return all(self.add_child(child) for child in children)
+        # Attaches every new child to the tree in one walk rather than one per child.
+        existing = set(self._children)
+        existing.add(self)
+        added = []
+        every = True
+        for child in children:
+            if child in existing:
+                every = False
+                continue
+            existing.add(child)
+            self._children.append(child)
+            child._parent = weakref.ref(self)
+            self.__add_child__(child)
+            added.append(child)
+
+        if not added:
+            return every
+
+        if self._tree is not None:
+            self._tree._add_elements(added, self._depth + 1, self._layer)
+
+        self.mark_layout_dirty()
+        return every
 
     def remove_child(self, child: Element) -> bool:
         if child not in self._children:
             return False
         self._children.remove(child)
+        child._parent = None
         self.__remove_child__(child)
 
         if self._tree is not None:
             self._tree._remove_element(child)
 
-        self._has_changed_layout = True
+        self.mark_layout_dirty()
         return True
 
     def remove_children(self, children: Iterable[Element]) -> bool:
-        return all(self.remove_child(child) for child in children)
+        removing = set(children)
+        removed = [child for child in self._children if child in removing]
+        if not removed:
+            return False
+
+        self._children[:] = [child for child in self._children if child not in removing]
+        for child in removed:
+            child._parent = None
+            self.__remove_child__(child)
+
+        if self._tree is not None:
+            self._tree._remove_elements(removed)
+
+        self.mark_layout_dirty()
+        return len(removed) == len(removing)
 
     def move_child(self, child: Element, idx: int) -> bool:
         if child not in self._children:
@@ -686,7 +1649,7 @@ class Element[D: ElementData]: # TODO: make a type var for element data
                 self._children[idx],
             )
             self.__move_child__(child, idx)
-            self._has_changed_layout = True
+            self.mark_layout_dirty()
             return True
         return False
 
@@ -694,12 +1657,13 @@ class Element[D: ElementData]: # TODO: make a type var for element data
         if child in self._children:
             return False
         self._children.insert(idx, child)
+        child._parent = weakref.ref(self)
         self.__insert_child__(child, idx)
 
         if self._tree is not None:
-            self._tree._add_element(child, self._depth + 1)
+            self._tree._add_element(child, self._depth + 1, self._layer)
 
-        self._has_changed_layout = True
+        self.mark_layout_dirty()
         return True
 
     def get_child_idx(self, child: Element) -> int:
@@ -708,8 +1672,96 @@ class Element[D: ElementData]: # TODO: make a type var for element data
     def has_child(self, child: Element) -> bool:
         return child in self._children
 
+    # -- DATA METHODS --
+
+    def set_data(self, data: D) -> None:
+        self._data = data
+        if self._tree is not None:
+            self._tree._refresh_handlers(self)
+        self.mark_data_dirty()
+
+    def update_data(self, **changes: Any) -> None:
+        # Change data through here (or set_data) so the tree sees new event handlers
+        # and relays out. Changing event handling or paint fields alone doesn't cause a layout.
+        data = self._data
+        for name, value in changes.items():
+            setattr(data, name, value)
+
+        if self._tree is not None and not _EVENT_FIELDS.isdisjoint(changes):
+            self._tree._refresh_handlers(self)
+        if not (_EVENT_FIELDS | data.paint_fields).issuperset(changes):
+            self.mark_data_dirty()
+        elif not data.paint_fields.isdisjoint(changes):
+            self.update_paint()
+
+    # -- RENDERING METHODS --
+
+    def get_renderable(self, name: str) -> Renderable:
+        # Custom elements should get their renderables through this so they land in the right layer.
+        # Items added this way aren't moved when the tree splits runs, so prefer __renderables__.
+        if self._tree is None:
+            raise ValueError("Element is not in a tree")
+        return self._tree.get_renderable(name, self._depth, self._layer)
+
+    def invalidate_layer(self) -> None:
+        # Content changes which don't go through layout need to tell their cached layer.
+        if self._layer is not None:
+            self._layer.mark_dirty()
+
+    def is_descendant_of(self, element: Element) -> bool:
+        # Includes the element itself
+        current = self
+        while current is not None:
+            if current is element:
+                return True
+            current = current.parent
+        return False
+
     # -- LAYOUT METHODS --
 
+    def is_layout_boundary(self) -> bool:
+        # An element whose size can't change with its children. Changes below it
+        # can't affect anything outside of it, so only it needs to layout again.
+        data = self._data
+        return data.minimum_width == data.maximum_width and data.minimum_height == data.maximum_height
+
+    def mark_data_dirty(self) -> None:
+        # Call after changing the element's own layout data. Its parent reads that data
+        # (sizes, priority, alignment) to place it, so the parent relays out even when
+        # this element is a boundary, and whatever the boundary check says of the new data.
+        self._has_changed_layout = True
+        if self._layer is not None:
+            self._layer.mark_dirty()
+        parent = self.parent
+        if parent is not None:
+            parent.mark_layout_dirty()
+        elif self._tree is not None:
+            self._tree._mark_layout_dirty(self)
+
+    def mark_layout_dirty(self) -> None:
+        # Call after changing anything inside the element which affects layout (children, content, etc).
+        # The change stops at the nearest layout boundary, see mark_data_dirty for changes to its data.
+        # While a scheduled job lays out the whole tree every element is still flagged
+        # from before it started, so the walk has to reach the boundary to queue it.
+        stop_on_dirty = self._tree is None or self._tree._full_layout is None
+        element = self
+        while True:
+            if stop_on_dirty and element._has_changed_layout and element is not self:
+                # Already on a dirty path, so its boundary is already known to the tree
+                return
+            element._has_changed_layout = True
+            # Something inside a cached layer is laying out again, so it has to render again.
+            if element._layer is not None:
+                element._layer.mark_dirty()
+
+            parent = element.parent
+            if parent is None or element.is_layout_boundary():
+                break
+            element = parent
+
+        if self._tree is not None:
+            self._tree._mark_layout_dirty(element)
+
     def place(self, left: float, bottom: float, width: float, height: float):
         self.left = left
         self.bottom = bottom
@@ -726,24 +1778,50 @@ class Element[D: ElementData]: # TODO: make a type var for element data
         # Then from the root squish/stretch element's heights untill everything fits.
         # Finally place elements along with anchoring
 
-        # As the element at the top we don't need to find it's width just find the
-        # width of children
-        for child in self._children:
-            child.layout_horizontal()
-        self.compress_width()
-
-        self.layout_wrapping()
-        for child in self._children:
-            child.layout_wrapping()
-            child.layout_vertical()
-
-        self.compress_height()
-
-        self.layout_position()
-
-        self.update_style()
+        # Each pass visits every element below this one exactly once, so a deep
+        # tree costs the same per node as a shallow one.
+
+        for _ in self.layout_steps():
+            pass
+
+    def layout_steps(self) -> Iterator[None]:
+        # The passes of layout, pausing after each pass over one of this element's
+        # children and after each pass started from this element. Nothing smaller
+        # can pause as every pass recurses, but a scheduled job can still spread a
+        # large tree's layout over several frames.
+        children = list(self._children)
+        steps: list[tuple[LayoutPass, Callable[[], Any]]] = [
+            # As the element at the top we don't need to find it's width just find the
+            # width of children
+            *((LayoutPass.HORIZONTAL, child.layout_horizontal) for child in children),
+            (LayoutPass.COMPRESS_WIDTH, self.compress_width),
+            # Wrapping recurses on its own so it only needs starting from the top.
+            (LayoutPass.WRAPPING, self.layout_wrapping),
+            *((LayoutPass.VERTICAL, child.layout_vertical) for child in children),
+            (LayoutPass.COMPRESS_HEIGHT, self.compress_height),
+            (LayoutPass.POSITION, self.layout_position),
+            (LayoutPass.STYLE, self.update_style),
+        ]
+
+        # Each pass is timed when the tree is keeping stats or tracing, leaving out
+        # the time spent paused.
+        timer = None if self._tree is None else self._tree._pass_timer(self)
+        last = len(steps) - 1
+        for index, (layout_pass, step) in enumerate(steps):
+            if timer is not None:
+                timer.resume()
+            step()
+            if timer is not None:
+                timer.lap(layout_pass)
+            if index < last:
+                yield
+
+    def _count_visit(self, layout_pass: LayoutPass) -> None:
+        if self._tree is not None and self._tree._layout_visits is not None:
+            self._tree._visit(layout_pass)
 
     def layout_horizontal(self) -> float:
+        self._count_visit(LayoutPass.HORIZONTAL)
         data = self._data
         padding_width = data.padding.left + data.padding.right
         child_width = data.minimum_width - padding_width
@@ -754,6 +1832,7 @@ class Element[D: ElementData]: # TODO: make a type var for element data
         return self.width
 
     def compress_width(self) -> None:
+        self._count_visit(LayoutPass.COMPRESS_WIDTH)
         data = self._data
         padding_width = data.padding.left + data.padding.right
         child_width = self.width - padding_width
@@ -763,6 +1842,7 @@ class Element[D: ElementData]: # TODO: make a type var for element data
             child.compress_width()
 
     def layout_vertical(self) -> float:
+        self._count_visit(LayoutPass.VERTICAL)
         data = self._data
         padding_height = data.padding.top + data.padding.bottom
         child_height = data.minimum_height - padding_height
@@ -773,6 +1853,7 @@ class Element[D: ElementData]: # TODO: make a type var for element data
         return self.height
 
     def compress_height(self) -> None:
+        self._count_visit(LayoutPass.COMPRESS_HEIGHT)
         data = self._data
         padding_height = data.padding.top + data.padding.bottom
         child_height = self.height - padding_height
@@ -782,6 +1863,10 @@ class Element[D: ElementData]: # TODO: make a type var for element data
             child.compress_height()
 
     def layout_position(self) -> None:
+        # Positioning is the last pass to visit every element, so this is where they become clean.
+        self._has_changed_layout = False
+        self._count_visit(LayoutPass.POSITION)
+
         data = self._data
         padless_width = self.width - data.padding.left - data.padding.right
         padless_height = self.height - data.padding.bottom - data.padding.top
@@ -809,15 +1894,51 @@ class Element[D: ElementData]: # TODO: make a type var for element data
             child.layout_position()
 
     def layout_wrapping(self) -> None:
+        self._count_visit(LayoutPass.WRAPPING)
         for child in self._children:
             child.layout_wrapping()
 
     def update_style(self) -> None:
+        self._count_visit(LayoutPass.STYLE)
         for child in self._children:
             child.update_style()
 
+    def update_paint(self) -> None:
+        # Called instead of a layout when only the data's paint fields changed. Elements which
+        # draw those fields push them to their renderables here (and from update_style).
+        pass
+
     # -- EVENT METHODS --
 
+    def _paint_order(self) -> tuple[int, ...]:
+        # Deeper elements draw over shallower ones, and later siblings over earlier ones.
+        indices = []
+        element = self
+        while (parent := element.parent) is not None:
+            indices.append(parent._children.index(element))
+            element = parent
+        return (self._depth, *reversed(indices))
+
+    def fire_event(self, event: MintEvent) -> None:
+        # Calls both the element's own method and the data's callback for the event.
+        method, callback = _EVENT_HANDLERS.get(event._name, _EVENT_HANDLERS[_CUSTOM_EVENTS])
+        getattr(self, method)(event)
+        getattr(self._data, callback)(self, event)
+
+    def _handled_events(self) -> Iterable[str]:
+        # The events the element takes part in. Blocking and capturing elements take part in
+        # every event as they stop it bubbling, otherwise only handled events count.
+        response = self._data.event_response
+        if response == EventResponse.IGNORE:
+            return
+        for name, (method, callback) in _EVENT_HANDLERS.items():
+            if (
+                response != EventResponse.PASS
+                or getattr(self._data, callback) is not _empty
+                or getattr(type(self), method) is not getattr(Element, method)
+            ):
+                yield name
+
     def custom_event(self, event: MintEvent): ...
     def cursor_enter(self, event: CursorMotionEvent): ...
     def cursor_exit(self, event: CursorMotionEvent): ...
@@ -844,7 +1965,29 @@ class ArrayElement(ElementData):
         return Array(self, parent, uid)
 
 class Array(Element[ArrayElement]):
+    _layout_kind: ClassVar[LayoutKind] = LayoutKind.ARRAY
+    # Arrays with at least this many children distribute and position them with numpy, if it's installed.
+    vectorize_threshold: ClassVar[int] = 256
+
+    def _vectorized(self) -> bool:
+        if len(self._children) < self.vectorize_threshold:
+            return False
+        from . import vector_layout
+        return vector_layout.AVAILABLE
+
+    def _branches(self, layout_pass: LayoutPass) -> list[Element]:
+        # For large arrays, the children a pass has to visit. A plain Element without
+        # children has nothing to do in the compress passes but be counted.
+        children = self._children
+        if len(children) < self.vectorize_threshold:
+            return children
+        branches = [child for child in children if child._children or type(child) is not Element]
+        if self._tree is not None:
+            self._tree._visit(layout_pass, len(children) - len(branches))
+        return branches
+
     def _layout_axis(self, y_axis: bool) -> float:
+        self._count_visit(LayoutPass.VERTICAL if y_axis else LayoutPass.HORIZONTAL)
         data = self._data
 
         list_axis = y_axis == data.vertical
@@ -870,7 +2013,7 @@ class Array(Element[ArrayElement]):
         size = child_size + padding + spacing
 
         if y_axis:
-            self.height = min(data.maximum_height, min(data.minimum_height, size))
+            self.height = min(data.maximum_height, max(data.minimum_height, size))
             return self.height
         self.width = min(data.maximum_width, max(data.minimum_width, size))
         return self.width
@@ -889,107 +2032,65 @@ class Array(Element[ArrayElement]):
                 child.width = min(child._data.maximum_width, max(child._data.minimum_width, free_size))
 
     def _compress_axis(self, y_axis: bool) -> None:
-        active_children = [child for child in self._children if child._data.priority != 0] # Start with all children active. We will be pruning this list
         data = self._data
+        children = self._children
+        if not children:
+            return
 
         if y_axis:
-            remaining_size = self.height - data.padding.top - data.padding.bottom
-            remaining_size = remaining_size - sum(child.height for child in self._children)
+            sizes = [child.height for child in children]
+            minimums = [child._data.minimum_height for child in children]
+            maximums = [child._data.maximum_height for child in children]
+            free = self.height - data.padding.top - data.padding.bottom
         else:
-            remaining_size = self.width - data.padding.left - data.padding.right
-            remaining_size = remaining_size - sum(child.width for child in self._children)
-        remaining_size = remaining_size - (len(self._children) - 1) * data.child_padding
-
-        growing = remaining_size >= 0
+            sizes = [child.width for child in children]
+            minimums = [child._data.minimum_width for child in children]
+            maximums = [child._data.maximum_width for child in children]
+            free = self.width - data.padding.left - data.padding.right
+        free = free - sum(sizes) - (len(children) - 1) * data.child_padding
+        priorities = [child._data.priority for child in children]
+
+        if self._vectorized():
+            from . import vector_layout
+            sizes = vector_layout.distribute(sizes, minimums, maximums, priorities, free)[0].tolist()
+        else:
+            distribute(sizes, minimums, maximums, priorities, free)
 
-        while (abs(remaining_size) > 1e-10 and active_children):
+        for child, size in zip(children, sizes):
             if y_axis:
-                set_size = active_children[0].height
-            else:
-                set_size = active_children[0].width
-
-            if growing:
-                next_size = float('inf')
+                child.height = size
             else:
-                next_size = 0
-            size_to_add = remaining_size
-            priority = 0
-
-            for child in active_children:
-                if y_axis:
-                    size = child.height / child._data.priority
-                else:
-                    size = child.width / child._data.priority
-
-                if growing:
-                    if size < set_size:
-                        next_size = set_size
-                        set_size = size
-                    elif size > set_size:
-                        next_size = min(next_size, size)
-                        size_to_add = next_size - set_size
-                else:
-                    if set_size < size:
-                        next_size = set_size
-                        set_size = size
-                    elif size < set_size:
-                        next_size = max(next_size, size)
-                        size_to_add = next_size - set_size
-
-                priority += child._data.priority
-
-            if growing:
-                size_to_add = min(size_to_add, remaining_size / priority)
-            else:
-                size_to_add = max(size_to_add, remaining_size / priority)
-
-            for child in active_children[:]:
-                prev_size = child.height if y_axis else child.width
-                if (prev_size == set_size * child._data.priority):
-                    if y_axis:
-                        child.height += size_to_add * child._data.priority
-                        if child.height <= child._data.minimum_height:
-                            child.height = child._data.minimum_height
-                            active_children.remove(child)
-                        if child._data.maximum_height <= child.height:
-                            child.height = child._data.maximum_height
-                            active_children.remove(child)
-                        remaining_size -= (child.height - prev_size)
-                    else:
-                        child.width += size_to_add
-                        if child.width <= child._data.minimum_width:
-                            child.width = child._data.minimum_width
-                            active_children.remove(child)
-                        if child._data.maximum_width <= child.width:
-                            child.width = child._data.maximum_width
-                            active_children.remove(child)
-                        remaining_size -= (child.width - prev_size)
+                child.width = size
 
     def layout_horizontal(self) -> float:
         return self._layout_axis(False)
 
     def compress_width(self) -> None:
+        self._count_visit(LayoutPass.COMPRESS_WIDTH)
         if self._data.vertical:
             self._compress_off_axis(False)
         else:
             self._compress_axis(False)
 
-        for child in self._children:
+        for child in self._branches(LayoutPass.COMPRESS_WIDTH):
             child.compress_width()
 
     def layout_vertical(self) -> float:
         return self._layout_axis(True)
 
     def compress_height(self) -> None:
+        self._count_visit(LayoutPass.COMPRESS_HEIGHT)
         if self._data.vertical:
             self._compress_axis(True)
         else:
             self._compress_off_axis(True)
 
-        for child in self._children:
+        for child in self._branches(LayoutPass.COMPRESS_HEIGHT):
             child.compress_height()
 
     def layout_position(self) -> None:
+        self._has_changed_layout = False
+        self._count_visit(LayoutPass.POSITION)
         if not self._children:
             return
 
@@ -1028,8 +2129,12 @@ class Array(Element[ArrayElement]):
                 case AxisAnchor.RIGHT:
                     offset = padded_left + (padless_width - child_size * fraction)
 
+        if self._vectorized():
+            self._position_vectorized(children, offset, padded_left, padded_bottom, padless_width, padless_height)
+            return
+
         position = 0
-        for child in self._children:
+        for child in children:
             if y_axis:
                 excess_width = padless_width - child.width
                 child.bottom = offset + position
@@ -1055,6 +2160,345 @@ class Array(Element[ArrayElement]):
 
             child.layout_position()
 
+    def _position_vectorized(
+            self,
+            children: list[Element],
+            offset: float,
+            padded_left: float,
+            padded_bottom: float,
+            padless_width: float,
+            padless_height: float
+        ) -> None:
+        from . import vector_layout
+        spacing = self._data.child_padding
+        widths = [child.width for child in children]
+        heights = [child.height for child in children]
+
+        if self._data.vertical:
+            bottoms = vector_layout.positions(heights, offset, spacing).tolist()
+            anchors = [child._data.horizontal_alignmnet.value for child in children]
+            lefts = vector_layout.align(anchors, widths, padded_left, padless_width, False).tolist()
+        else:
+            lefts = vector_layout.positions(widths, offset, spacing).tolist()
+            anchors = [child._data.vertical_alignment.value for child in children]
+            bottoms = vector_layout.align(anchors, heights, padded_bottom, padless_height, True).tolist()
+
+        leaves = 0
+        for child, left, bottom in zip(children, lefts, bottoms):
+            child.left = left
+            child.bottom = bottom
+            if child._children or type(child) is not Element:
+                child.layout_position()
+            else:
+                # All Element.layout_position would do for a leaf
+                child._has_changed_layout = False
+                leaves += 1
+        if self._tree is not None:
+            self._tree._visit(LayoutPass.POSITION, leaves)
+
+
+def _plain_item() -> Element:
+    return ElementData().create()
+
+@dataclasses.dataclass
+class VirtualArrayElement(ArrayElement):
+    # How many items the list holds, only those on screen (plus overscan) have elements.
+    item_count: int = 0
+    # Every item's size along the list. A fixed size is what lets the visible
+    # items be found from the scroll without measuring the others.
+    item_size: float = 0.0
+    # Extra items kept either side of the visible ones so small scrolls don't rebind.
+    overscan: int = 2
+    # Makes an item element when there are none to recycle.
+    create_item: Callable[[], Element] = _plain_item
+    # Fills an item element (new or recycled) in for an index. It is called while
+    # the item is out of the tree, so it can update_data freely.
+    bind_item: Callable[[Element, int], Any] = _empty
+
+    def create(self, parent: Element | None = None, uid: UUID | None = None) -> VirtualArray:
+        return VirtualArray(self, parent, uid)
+
+class VirtualArray(Element[VirtualArrayElement]):
+    """
+    An Array over item_count items which only has elements for the items
+    within its bounds and the viewport, plus overscan. Items leaving the view
+    are taken out of the tree and recycled for the items coming in, so a
+    layout (and so a scroll) costs the number of visible items however long
+    the list is.
+
+    Items are placed like Array places its children, except that scroll moves
+    the items towards the beginning anchor when they overflow. Call refresh
+    after the data behind the items changes. This is a custom layout so the
+    flat layout engine leaves its items to it.
+    """
+
+    def __init__(self, data: VirtualArrayElement, parent: Element | None = None, uid: UUID | None = None):
+        super().__init__(data, parent, uid)
+        # The materialized items by index, and the spare items waiting to be bound again.
+        self._items: dict[int, Element] = {}
+        self._spare: list[Element] = []
+
+    @property
+    def content_size(self) -> float:
+        data = self._data
+        if data.item_count <= 0:
+            return 0.0
+        return data.item_count * data.item_size + (data.item_count - 1) * data.child_padding
+
+    @property
+    def visible_items(self) -> tuple[int, ...]:
+        return tuple(self._items)
+
+    def item_at(self, idx: int) -> Element | None:
+        return self._items.get(idx)
+
+    def scroll_to(self, scroll: float) -> None:
+        # Scrolling can't change the list's size, so it doesn't need its parent to relayout
+        # like other data changes do. Lists with a fixed size are boundaries so only they relayout.
+        data = self._data
+        if scroll == data.scroll:
+            return
+        data.scroll = scroll
+        self.mark_layout_dirty()
+
+    def scroll_by(self, delta: float) -> None:
+        self.scroll_to(self._data.scroll + delta)
+
+    def refresh(self) -> None:
+        # Rebinds every item on the next layout.
+        self._release(list(self._items))
+        self.mark_layout_dirty()
+
+    def _release(self, indices: list[int]) -> None:
+        # Takes the items out of the tree without marking the list dirty, as this happens mid layout.
+        released = [self._items.pop(idx) for idx in indices]
+        if not released:
+            return
+        removing = set(released)
+        self._children[:] = [child for child in self._children if child not in removing]
+        for item in released:
+            item._parent = None
+            self.__remove_child__(item)
+        if self._tree is not None:
+            self._tree._remove_elements(released)
+        self._spare.extend(released)
+
+    def _materialize(self, first: int, last: int) -> list[Element]:
+        # Releases the items outside first - last and binds the missing ones, returning the new items.
+        items = self._items
+        self._release([idx for idx in items if not first <= idx <= last])
+
+        data = self._data
+        added = []
+        for idx in range(first, last + 1):
+            if idx in items:
+                continue
+            item = self._spare.pop() if self._spare else data.create_item()
+            data.bind_item(item, idx)
+            items[idx] = item
+            added.append(item)
+
+        if added:
+            self._children[:] = [items[idx] for idx in range(first, last + 1)]
+            reference = weakref.ref(self)
+            for item in added:
+                item._parent = reference
+                self.__add_child__(item)
+            if self._tree is not None:
+                self._tree._add_elements(added, self._depth + 1, self._layer)
+        return added
+
+    def _span(self) -> tuple[float, float]:
+        # Where the list's padded area starts along its axis, and how long it is.
+        data = self._data
+        if data.vertical:
+            return self.bottom + data.padding.bottom, self.height - data.padding.bottom - data.padding.top
+        return self.left + data.padding.left, self.width - data.padding.left - data.padding.right
+
+    def _item_range(self, start: float, extent: float) -> tuple[float, float, int, int]:
+        # For the list's span along its axis returns the clamped scroll, where the run of
+        # items starts and the first and last items which can be seen (last < first if none).
+        data = self._data
+        y_axis = data.vertical
+        content = self.content_size
+        overflow = max(0.0, content - extent)
+        scroll = min(overflow, max(0.0, data.scroll))
+
+        # Where the run of items starts, the beginning of the y axis is the top.
+        if overflow > 0.0:
+            offset = start - scroll if not y_axis else start + extent - content + scroll
+        else:
+            match data.anchor:
+                case AxisAnchor.BEGINNING:
+                    offset = start if not y_axis else start + extent - content
+                case AxisAnchor.MIDDLE:
+                    offset = start + (extent - content) / 2.0
+                case AxisAnchor.END:
+                    offset = start + extent - content if not y_axis else start
+
+        stride = data.item_size + data.child_padding
+        low, high = self._window(start, extent, y_axis)
+        if stride <= 0.0 or data.item_count <= 0 or high <= low:
+            return scroll, offset, 0, -1
+
+        # The visible span measured along the items from the first.
+        if data.flip_fill_order:
+            low, high = offset + content - high, offset + content - low
+        else:
+            low, high = low - offset, high - offset
+        first = max(0, floor((low - data.item_size) / stride) + 1 - data.overscan)
+        last = min(data.item_count - 1, ceil(high / stride) - 1 + data.overscan)
+        return scroll, offset, first, last
+
+    def _materialize_visible(self) -> None:
+        # Binds the items the last layout's rect shows before they're measured, so the size
+        # across the list comes from the items it will show. A list which hasn't been laid
+        # out yet assumes it spans the viewport.
+        start, extent = self._span()
+        if extent <= 0.0:
+            if self._tree is None:
+                return
+            start = 0.0
+            extent = self._tree._camera.height if self._data.vertical else self._tree._camera.width
+        _, _, first, last = self._item_range(start, extent)
+        self._materialize(first, last)
+
+    def _item_length(self, item: Element) -> float:
+        # Items are item_size long along the list, within their own limits. An item whose
+        # minimum is longer than item_size overflows its slot rather than moving the others.
+        item_size = self._data.item_size
+        data = item._data
+        if self._data.vertical:
+            return min(data.maximum_height, max(data.minimum_height, item_size))
+        return min(data.maximum_width, max(data.minimum_width, item_size))
+
+    def _layout_axis(self, y_axis: bool) -> float:
+        self._count_visit(LayoutPass.VERTICAL if y_axis else LayoutPass.HORIZONTAL)
+        data = self._data
+
+        if y_axis:
+            padding = data.padding.bottom + data.padding.top
+        else:
+            padding = data.padding.left + data.padding.right
+
+        child_size = 0.0
+        for child in self._children:
+            size = child.layout_vertical() if y_axis else child.layout_horizontal()
+            child_size = max(child_size, size)
+
+        if y_axis == data.vertical:
+            child_size = self.content_size
+        size = child_size + padding
+
+        if y_axis:
+            self.height = min(data.maximum_height, max(data.minimum_height, size))
+            return self.height
+        self.width = min(data.maximum_width, max(data.minimum_width, size))
+        return self.width
+
+    def _compress(self, y_axis: bool) -> None:
+        data = self._data
+        if y_axis:
+            free_size = self.height - data.padding.top - data.padding.bottom
+        else:
+            free_size = self.width - data.padding.left - data.padding.right
+
+        for child in self._children:
+            if y_axis == data.vertical:
+                size = self._item_length(child)
+            elif y_axis:
+                size = min(child._data.maximum_height, max(child._data.minimum_height, free_size))
+            else:
+                size = min(child._data.maximum_width, max(child._data.minimum_width, free_size))
+
+            if y_axis:
+                child.height = size
+                child.compress_height()
+            else:
+                child.width = size
+                child.compress_width()
+
+    def layout_horizontal(self) -> float:
+        # Measuring starts with the horizontal pass, so the items are bound before it.
+        self._materialize_visible()
+        return self._layout_axis(False)
+
+    def compress_width(self) -> None:
+        self._count_visit(LayoutPass.COMPRESS_WIDTH)
+        self._compress(False)
+
+    def layout_vertical(self) -> float:
+        return self._layout_axis(True)
+
+    def compress_height(self) -> None:
+        self._count_visit(LayoutPass.COMPRESS_HEIGHT)
+        self._compress(True)
+
+    def _window(self, start: float, extent: float, y_axis: bool) -> tuple[float, float]:
+        # The part of the list's span along its axis which can be seen.
+        low, high = start, start + extent
+        if self._tree is not None:
+            camera = self._tree._camera
+            low = max(low, 0.0)
+            high = min(high, camera.height if y_axis else camera.width)
+        return low, high
+
+    def layout_position(self) -> None:
+        self._has_changed_layout = False
+        self._count_visit(LayoutPass.POSITION)
+
+        data = self._data
+        y_axis = data.vertical
+        padless_width = self.width - data.padding.left - data.padding.right
+        padless_height = self.height - data.padding.bottom - data.padding.top
+        padded_left = self.left + data.padding.left
+        padded_bottom = self.bottom + data.padding.bottom
+
+        data.scroll, offset, first, last = self._item_range(*self._span())
+        added = set(self._materialize(first, last))
+        content = self.content_size
+        stride = data.item_size + data.child_padding
+
+        for idx in range(first, last + 1):
+            item = self._items[idx]
+            position = idx * stride
+            if data.flip_fill_order:
+                position = content - position - data.item_size
+            position += offset
+
+            if y_axis:
+                width = item.width if item not in added else min(item._data.maximum_width, max(item._data.minimum_width, padless_width))
+                excess = padless_width - width
+                bottom = position
+                match item._data.horizontal_alignmnet:
+                    case AxisAnchor.LEFT:
+                        left = padded_left
+                    case AxisAnchor.CENTER:
+                        left = padded_left + (excess / 2.0)
+                    case AxisAnchor.RIGHT:
+                        left = padded_left + excess
+                height = self._item_length(item)
+            else:
+                height = item.height if item not in added else min(item._data.maximum_height, max(item._data.minimum_height, padless_height))
+                excess = padless_height - height
+                left = position
+                match item._data.vertical_alignment:
+                    case AxisAnchor.BOTTOM:
+                        bottom = padded_bottom
+                    case AxisAnchor.CENTER:
+                        bottom = padded_bottom + (excess / 2.0)
+                    case AxisAnchor.TOP:
+                        bottom = padded_bottom + excess
+                width = self._item_length(item)
+
+            if item in added:
+                # New items missed the earlier passes so they lay out on their own.
+                item.place(left, bottom, width, height)
+            else:
+                item.left = left
+                item.bottom = bottom
+                item.layout_position()
+
 
 @dataclasses.dataclass
 class GridElement(ElementData):
@@ -1082,83 +2526,83 @@ class AnchorElement(ElementData):
     bottom_offset: float = 0.0
     top_offset: float = 0.0
 
+    def create(self, parent: Element | None = None, uid: UUID | None = None) -> Anchor:
+        return Anchor(self, parent, uid)
+
 class Anchor(Element[AnchorElement]):
-    
-    def layout_horizontal(self) -> float:
+    """
+    Places its children within the region its anchors and offsets mark out
+    of its padded rect. Anchors are fractions of the padded size (see
+    AnchorPresets) and offsets then move each edge in tree units, so equal
+    anchors make a fixed size region around an anchored point. Children are
+    stretched (by priority) and aligned within the region the way Element
+    does within its whole rect. It measures like Element.
+
+    This is a custom layout so the flat layout engine leaves its children to it.
+    """
+
+    def _region_width(self) -> float:
         data = self._data
-        padding_width = data.padding.left + data.padding.right
-        child_width = data.minimum_width - padding_width
-        for child in self._children:
-            child_width = max(child_width, child.layout_horizontal())
-        self.width = min(padding_width + child_width, data.maximum_width)
+        padless_width = self.width - data.padding.left - data.padding.right
+        return max(0.0, (data.right_anchor - data.left_anchor) * padless_width + data.right_offset - data.left_offset)
 
-        return self.width
+    def _region_height(self) -> float:
+        data = self._data
+        padless_height = self.height - data.padding.bottom - data.padding.top
+        return max(0.0, (data.top_anchor - data.bottom_anchor) * padless_height + data.top_offset - data.bottom_offset)
 
     def compress_width(self) -> None:
-        data = self._data
-        padding_width = data.padding.left + data.padding.right
-        child_width = self.width - padding_width
+        self._count_visit(LayoutPass.COMPRESS_WIDTH)
+        region_width = self._region_width()
         for child in self._children:
             if child._data.priority != 0:
-                child.width = max(child._data.minimum_width, min(child._data.maximum_width, child_width))
+                child.width = max(child._data.minimum_width, min(child._data.maximum_width, region_width))
             child.compress_width()
 
-    def layout_vertical(self) -> float:
-        data = self._data
-        padding_height = data.padding.top + data.padding.bottom
-        child_height = data.minimum_height - padding_height
-        for child in self._children:
-            child_height = max(child_height, child.layout_vertical())
-        self.height = min(padding_height + child_height, data.maximum_height)
-
-        return self.height
-
     def compress_height(self) -> None:
-        data = self._data
-        padding_height = data.padding.top + data.padding.bottom
-        child_height = self.height - padding_height
+        self._count_visit(LayoutPass.COMPRESS_HEIGHT)
+        region_height = self._region_height()
         for child in self._children:
             if child._data.priority != 0:
-                child.height = max(child._data.minimum_height, min(child._data.maximum_height, child_height))
+                child.height = max(child._data.minimum_height, min(child._data.maximum_height, region_height))
             child.compress_height()
 
     def layout_position(self) -> None:
+        self._has_changed_layout = False
+        self._count_visit(LayoutPass.POSITION)
+
         data = self._data
         padless_width = self.width - data.padding.left - data.padding.right
         padless_height = self.height - data.padding.bottom - data.padding.top
-        padded_left = self.left + data.padding.left
-        padded_bottom = self.bottom + data.padding.bottom
+        region_left = self.left + data.padding.left + data.left_anchor * padless_width + data.left_offset
+        region_bottom = self.bottom + data.padding.bottom + data.bottom_anchor * padless_height + data.bottom_offset
+        region_width = self._region_width()
+        region_height = self._region_height()
         for child in self._children:
-            excess_width = padless_width - child.width
-            excess_height = padless_height - child.height
+            excess_width = region_width - child.width
+            excess_height = region_height - child.height
             match child._data.horizontal_alignmnet:
                 case AxisAnchor.LEFT:
-                    child.left = padded_left
+                    child.left = region_left
                 case AxisAnchor.CENTER:
-                    child.left = padded_left + (excess_width / 2.0)
+                    child.left = region_left + (excess_width / 2.0)
                 case AxisAnchor.RIGHT:
-                    child.left = padded_left + excess_width
+                    child.left = region_left + excess_width
 
             match child._data.vertical_alignment:
                 case AxisAnchor.BOTTOM:
-                    child.bottom = padded_bottom
+                    child.bottom = region_bottom
                 case AxisAnchor.CENTER:
-                    child.bottom = padded_bottom + (excess_height / 2.0)
+                    child.bottom = region_bottom + (excess_height / 2.0)
                 case AxisAnchor.TOP:
-                    child.bottom = padded_bottom + excess_height
+                    child.bottom = region_bottom + excess_height
 
             child.layout_position()
 
-    def layout_wrapping(self) -> None:
-        for child in self._children:
-            child.layout_wrapping()
-
-    def update_style(self) -> None:
-        for child in self._children:
-            child.update_style()
-
 # -- | -- VISUAL -- | --
 class StyleBoxElement(ElementData):
+    paint_fields: ClassVar[frozenset[str]] = frozenset(("color", "border_color", "gradient"))
+
     corners: tuple[float, float, float, float]
     borders: tuple[float, float, float, float]
     color: RGBA255 = (255, 255, 255, 255)
@@ -1168,6 +2612,8 @@ class StyleBoxElement(ElementData):
     resolution: int = 12
 
 class TextElement(ElementData):
+    paint_fields: ClassVar[frozenset[str]] = frozenset(("color",))
+
     text: str
     font_name: str
     font_size: float
@@ -1175,6 +2621,8 @@ class TextElement(ElementData):
 
 
 class TextureElement(ElementData):
+    paint_fields: ClassVar[frozenset[str]] = frozenset(("color", "angle"))
+
     texture: ImageTexture
     fit: FrameFit
     color: RGBA255 = (255, 255, 255, 255)
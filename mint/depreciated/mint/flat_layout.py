@@ -0,0 +1,338 @@
+from __future__ import annotations
+from array import array
+from enum import IntEnum
+from typing import TYPE_CHECKING, Sequence, MutableSequence
+
+if TYPE_CHECKING:
+    from .core import Element
+
+# Sizes closer than this are treated as equal when levelling children.
+_EPSILON = 1e-9
+
+
+class LayoutKind(IntEnum):
+    # How an element places its children. Elements pick one with their _layout_kind.
+    OVERLAY = 0  # Children are stacked over each other, like Element
+    ARRAY = 1  # Children are placed one after another along an axis, like Array
+    CUSTOM = 2  # The element's own passes lay out its children, like Anchor
+
+
+def distribute(
+        sizes: MutableSequence[float],
+        minimums: Sequence[float],
+        maximums: Sequence[float],
+        priorities: Sequence[float],
+        free: float
+    ) -> float:
+    """
+    Grow (or shrink when free is negative) the sizes in place until the free
+    space is used up or every child has hit its limit. Children are levelled
+    by size / priority, so the smallest (or largest) children change first and
+    children with a priority of 0 (or an infinite one) never change. Returns
+    the space left over.
+
+    Every child's size is min(limit, max(size, level * priority)) for a single
+    level, so rather than raising children a level at a time the level is
+    found in one sweep over the sorted points where each child starts and
+    stops changing. Shrinking is the same as growing the negated sizes.
+    """
+    if abs(free) <= _EPSILON:
+        return free
+    sign = 1.0 if free > 0 else -1.0
+    limits = maximums if free > 0 else minimums
+
+    # (level, change in how fast the total grows with the level)
+    events: list[tuple[float, float]] = []
+    changing: list[int] = []
+    for idx in range(len(sizes)):
+        priority = priorities[idx]
+        if priority <= 0:
+            continue
+        start = sign * sizes[idx] / priority
+        stop = sign * limits[idx] / priority
+        if not stop > start:
+            # Already at its limit, or an infinite priority (whose levels are 0 or nan)
+            continue
+        changing.append(idx)
+        events.append((start, priority))
+        events.append((stop, -priority))
+    if not events:
+        return free
+    events.sort()
+
+    remaining = abs(free)
+    level = events[0][0]
+    rate = 0.0
+    for at, change in events:
+        if rate > 0.0:
+            room = (at - level) * rate
+            if room >= remaining:
+                level += remaining / rate
+                break
+            remaining -= room
+        level = at
+        rate += change
+    else:
+        # Everything reached its limit before the space ran out
+        level = float('inf')
+
+    for idx in changing:
+        size = sizes[idx]
+        target = sign * min(sign * limits[idx], max(sign * size, level * priorities[idx]))
+        free -= target - size
+        sizes[idx] = target
+    return free
+
+
+class FlatLayout:
+    """
+    Lays out an element and everything below it from flat arrays rather than
+    recursive method calls, for trees large enough that the recursion depth
+    or per call overhead matters.
+
+    The tree is flattened breadth first so every element's children sit in a
+    contiguous range after it. Measuring then runs in reverse (children before
+    parents) and compressing and positioning run forwards (parents before
+    children), all as plain loops.
+
+    The top element keeps its rect, like Element.layout. Only the built in
+    layouts (LayoutKind) are flattened. An element with a custom layout is
+    measured, compressed and placed through its own pass methods, which lay
+    out everything below it recursively. Otherwise layout_wrapping and
+    update_style hooks are not called.
+    """
+
+    def __init__(self, root: Element) -> None:
+        # -- STRUCTURE --
+        elements: list[Element] = [root]
+        parent = [-1]
+        first_child = []
+        child_count = []
+
+        # The list doubles as the breadth first queue. Custom layouts keep their children to themselves.
+        idx = 0
+        while idx < len(elements):
+            element = elements[idx]
+            children = () if element._layout_kind == LayoutKind.CUSTOM else element._children
+            first_child.append(len(elements))
+            child_count.append(len(children))
+            elements.extend(children)
+            parent.extend([idx] * len(children))
+            idx += 1
+
+        self._elements: list[Element] = elements
+        self.parent: array[int] = array('q', parent)
+        self.first_child: array[int] = array('q', first_child)
+        self.child_count: array[int] = array('q', child_count)
+
+        # -- INPUTS --
+        # Filled a column at a time as that is far quicker than an element at a time.
+        datas = [element._data for element in elements]
+        arrays = [data if element._layout_kind == LayoutKind.ARRAY else None for element, data in zip(elements, datas)]
+        self.kind: array[int] = array('b', [element._layout_kind for element in elements])
+        self.vertical: array[int] = array('b', [data is not None and data.vertical for data in arrays])
+        self.flipped: array[int] = array('b', [data is not None and data.flip_fill_order for data in arrays])
+        self.contained: array[int] = array('b', [data is not None and data.contained for data in arrays])
+        self.anchor: array[int] = array('b', [0 if data is None else data.anchor.value for data in arrays])
+        self.child_padding: array[float] = array('d', [0.0 if data is None else data.child_padding for data in arrays])
+
+        self.horizontal_alignment: array[int] = array('b', [data.horizontal_alignmnet.value for data in datas])
+        self.vertical_alignment: array[int] = array('b', [data.vertical_alignment.value for data in datas])
+        self.minimum_width: array[float] = array('d', [data.minimum_width for data in datas])
+        self.maximum_width: array[float] = array('d', [data.maximum_width for data in datas])
+        self.minimum_height: array[float] = array('d', [data.minimum_height for data in datas])
+        self.maximum_height: array[float] = array('d', [data.maximum_height for data in datas])
+        paddings = [data.padding for data in datas]
+        self.padding_left: array[float] = array('d', [padding.left for padding in paddings])
+        self.padding_right: array[float] = array('d', [padding.right for padding in paddings])
+        self.padding_bottom: array[float] = array('d', [padding.bottom for padding in paddings])
+        self.padding_top: array[float] = array('d', [padding.top for padding in paddings])
+        self.priority: array[float] = array('d', [data.priority for data in datas])
+
+        # -- OUTPUTS --
+        self.left: array[float] = array('d', [element.left for element in elements])
+        self.bottom: array[float] = array('d', [element.bottom for element in elements])
+        self.width: array[float] = array('d', [element.width for element in elements])
+        self.height: array[float] = array('d', [element.height for element in elements])
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    @property
+    def elements(self) -> tuple[Element, ...]:
+        return tuple(self._elements)
+
+    def rect(self, idx: int) -> tuple[float, float, float, float]:
+        return self.left[idx], self.bottom[idx], self.width[idx], self.height[idx]
+
+    # -- PASSES --
+
+    def layout(self) -> None:
+        if self.kind[0] == LayoutKind.CUSTOM:
+            # Nothing below the top element was flattened.
+            self._elements[0].layout()
+            return
+        self._measure(False)
+        self._compress(False)
+        self._wrap()
+        self._measure(True)
+        self._compress(True)
+        self._position()
+        self._write_back()
+
+    def _measure(self, y_axis: bool) -> None:
+        # Children always come after their parent, so walking backwards measures them first.
+        if y_axis:
+            sizes, minimums, maximums = self.height, self.minimum_height, self.maximum_height
+            pad_a, pad_b = self.padding_bottom, self.padding_top
+        else:
+            sizes, minimums, maximums = self.width, self.minimum_width, self.maximum_width
+            pad_a, pad_b = self.padding_left, self.padding_right
+        first_child, child_count = self.first_child, self.child_count
+        kind, vertical, child_padding = self.kind, self.vertical, self.child_padding
+        elements = self._elements
+
+        # The top element keeps its size so it isn't measured.
+        for idx in range(len(elements) - 1, 0, -1):
+            if kind[idx] == LayoutKind.CUSTOM:
+                sizes[idx] = elements[idx].layout_vertical() if y_axis else elements[idx].layout_horizontal()
+                continue
+
+            start = first_child[idx]
+            stop = start + child_count[idx]
+            padding = pad_a[idx] + pad_b[idx]
+
+            if kind[idx] == LayoutKind.ARRAY:
+                if y_axis == bool(vertical[idx]):
+                    size = sum(sizes[start:stop]) + padding + child_count[idx] * child_padding[idx]
+                else:
+                    size = max(sizes[start:stop], default=0.0) + padding
+                sizes[idx] = min(maximums[idx], max(minimums[idx], size))
+            else:
+                child_size = minimums[idx] - padding
+                if start < stop:
+                    child_size = max(child_size, max(sizes[start:stop]))
+                sizes[idx] = min(padding + child_size, maximums[idx])
+
+    def _compress(self, y_axis: bool) -> None:
+        if y_axis:
+            sizes, minimums, maximums = self.height, self.minimum_height, self.maximum_height
+            pad_a, pad_b = self.padding_bottom, self.padding_top
+        else:
+            sizes, minimums, maximums = self.width, self.minimum_width, self.maximum_width
+            pad_a, pad_b = self.padding_left, self.padding_right
+        first_child, child_count, priority = self.first_child, self.child_count, self.priority
+        kind, vertical, child_padding = self.kind, self.vertical, self.child_padding
+        elements = self._elements
+
+        for idx in range(len(elements)):
+            if kind[idx] == LayoutKind.CUSTOM:
+                # Its parent has sized it by now, which is all it needs to compress its children.
+                element = elements[idx]
+                if y_axis:
+                    element.height = sizes[idx]
+                    element.compress_height()
+                else:
+                    element.width = sizes[idx]
+                    element.compress_width()
+                continue
+
+            count = child_count[idx]
+            if not count:
+                continue
+            start = first_child[idx]
+            stop = start + count
+            free = sizes[idx] - pad_a[idx] - pad_b[idx]
+
+            if kind[idx] != LayoutKind.ARRAY:
+                for child in range(start, stop):
+                    if priority[child] != 0:
+                        sizes[child] = max(minimums[child], min(maximums[child], free))
+            elif y_axis != bool(vertical[idx]):
+                for child in range(start, stop):
+                    sizes[child] = min(maximums[child], max(minimums[child], free))
+            else:
+                child_sizes = sizes[start:stop]
+                free = free - sum(child_sizes) - (count - 1) * child_padding[idx]
+                distribute(child_sizes, minimums[start:stop], maximums[start:stop], priority[start:stop], free)
+                sizes[start:stop] = child_sizes
+
+    def _wrap(self) -> None:
+        for idx in range(len(self._elements)):
+            if self.kind[idx] == LayoutKind.CUSTOM:
+                self._elements[idx].layout_wrapping()
+
+    def _position(self) -> None:
+        left, bottom, width, height = self.left, self.bottom, self.width, self.height
+        first_child, child_count = self.first_child, self.child_count
+        elements = self._elements
+
+        for idx in range(len(elements)):
+            if self.kind[idx] == LayoutKind.CUSTOM:
+                element = elements[idx]
+                element.left = left[idx]
+                element.bottom = bottom[idx]
+                element.width = width[idx]
+                element.height = height[idx]
+                element.layout_position()
+                continue
+
+            count = child_count[idx]
+            if not count:
+                continue
+            start = first_child[idx]
+            stop = start + count
+
+            padless_width = width[idx] - self.padding_left[idx] - self.padding_right[idx]
+            padless_height = height[idx] - self.padding_bottom[idx] - self.padding_top[idx]
+            padded_left = left[idx] + self.padding_left[idx]
+            padded_bottom = bottom[idx] + self.padding_bottom[idx]
+
+            if self.kind[idx] != LayoutKind.ARRAY:
+                for child in range(start, stop):
+                    left[child] = _align(self.horizontal_alignment[child], padded_left, padless_width - width[child], False)
+                    bottom[child] = _align(self.vertical_alignment[child], padded_bottom, padless_height - height[child], True)
+                continue
+
+            y_axis = bool(self.vertical[idx])
+            children = range(stop - 1, start - 1, -1) if self.flipped[idx] else range(start, stop)
+            spacing = self.child_padding[idx]
+            padding = spacing * (count - 1)
+
+            if y_axis:
+                sizes, padless, padded = height, padless_height, padded_bottom
+            else:
+                sizes, padless, padded = width, padless_width, padded_left
+
+            child_size = padding + sum(sizes[start:stop])
+            fraction = padless / child_size if (self.contained[idx] and padless < child_size) else 1.0
+            offset = _align(self.anchor[idx], padded, padless - child_size * fraction, y_axis)
+
+            position = 0.0
+            for child in children:
+                if y_axis:
+                    bottom[child] = offset + position
+                    position += height[child] + spacing
+                    left[child] = _align(self.horizontal_alignment[child], padded_left, padless_width - width[child], False)
+                else:
+                    left[child] = offset + position
+                    position += width[child] + spacing
+                    bottom[child] = _align(self.vertical_alignment[child], padded_bottom, padless_height - height[child], True)
+
+    def _write_back(self) -> None:
+        left, bottom, width, height = self.left, self.bottom, self.width, self.height
+        for idx, element in enumerate(self._elements):
+            element.left = left[idx]
+            element.bottom = bottom[idx]
+            element.width = width[idx]
+            element.height = height[idx]
+            element._has_changed_layout = False
+
+
+def _align(anchor: int, start: float, excess: float, y_axis: bool) -> float:
+    # anchor is an AxisAnchor value. The beginning of the y axis is the top.
+    if anchor == 1:
+        return start + excess / 2.0
+    if (anchor == 0) == y_axis:
+        return start + excess
+    return start
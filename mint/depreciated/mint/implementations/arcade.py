@@ -1,46 +1,234 @@
-from typing import Protocol
-
-from arcade import SpriteList, Sprite, Text
+from __future__ import annotations
+from pathlib import Path
+import weakref
+from typing import Protocol, NamedTuple, ClassVar, Hashable, Iterable, Callable, Any
+
+from arcade import SpriteList, Sprite, Text, load_texture
+from arcade import Texture as ImageTexture
+from arcade.texture_atlas import DefaultTextureAtlas
 from pyglet.graphics import Batch
 
 from charm.lib.mint.core import Renderable, BuiltInRenderable, Mint
-from charm.lib.mint.implementations.arcade_stylebox import StyleBox, StyleBoxRenderer
+from charm.lib.mint.implementations.arcade_stylebox import StyleBox, StyleBoxArena, StyleBoxRenderer
+from charm.lib.mint.implementations.arcade_mesh import Mesh, MeshArena, MeshRenderer
+from charm.lib.mint.implementations.arcade_layer import ArcadeOffscreenBackend, BLEND_SEPARATE_ALPHA
 
 
-class SpriteRenderable(Renderable):
+class AtlasStats(NamedTuple):
+    textures: int
+    used_area: int
+    total_area: int
+    occupancy: float
 
-    def __init__(self) -> None:
-        self._sprite_list: SpriteList[Sprite] = SpriteList(capacity=1024)
+
+class SpriteRenderable(Renderable):
+    """
+    Hands out stable slots in a single SpriteList so that the whole sprite
+    layer draws in one call. Removed sprites are hidden and their slots
+    retired rather than being removed from the SpriteList (which is O(n)).
+
+    A sprite keeps its slot until it is removed, and retired slots are handed
+    to the sprites added after. Slots are only renumbered by an explicit
+    compact. A sprite added elsewhere while still retired here is swapped out
+    of its slot for a hidden placeholder, so it is out of the list and visible
+    again before it moves.
+    """
+    # The size of the atlas shared by every sprite renderable, set through configure_atlas.
+    atlas_size: ClassVar[int] = 2048
+    # The atlas is shared by every sprite renderable so UI textures are only packed once.
+    _atlas: ClassVar[DefaultTextureAtlas | None] = None
+    # The images packed into the atlas, held weakly so the atlas can still discard them.
+    _atlas_images: ClassVar[dict[str, tuple[weakref.ref[ImageTexture], int]]] = {}
+    # The renderable each retired sprite is still hidden in.
+    _retired_in: ClassVar[weakref.WeakKeyDictionary[Sprite, SpriteRenderable]] = weakref.WeakKeyDictionary()
+
+    def __init__(self, reserve: int = 1024) -> None:
+        self._sprite_list: SpriteList[Sprite] = SpriteList(capacity=reserve, atlas=SpriteRenderable._get_atlas())
+
+        # The slot each sprite occupies within the sprite list. These only change when compacting.
+        self._slots: dict[Sprite, int] = {}
+        # Sprites still in the sprite list but no longer drawn, mapped to their visibility before retiring.
+        self._retired: dict[Sprite, bool] = {}
+        # Slots which can be handed out again, holding a retired sprite or a placeholder. A slot
+        # whose sprite was added back before the slot was reused is skipped when popped.
+        self._free: list[int] = []
+
+    @classmethod
+    def configure_atlas(cls, size: int) -> None:
+        # Resizes the shared atlas if sprite renderables already made it.
+        SpriteRenderable.atlas_size = size
+        if SpriteRenderable._atlas is not None:
+            SpriteRenderable._atlas.resize((size, size))
+
+    @staticmethod
+    def _get_atlas() -> DefaultTextureAtlas:
+        if SpriteRenderable._atlas is None:
+            size = SpriteRenderable.atlas_size
+            SpriteRenderable._atlas = DefaultTextureAtlas((size, size))
+        return SpriteRenderable._atlas
 
     def add(self, sprite: Sprite):
-        self._sprite_list.append(sprite)
+        self.add_many((sprite,))
 
     def remove(self, sprite: Sprite):
-        self._sprite_list.remove(sprite)
+        self.remove_many((sprite,))
+
+    def _release_elsewhere(self, sprite: Sprite) -> None:
+        # A sprite moving here from another renderable it was retired in (reparenting between depth
+        # buckets etc) has to leave that list first, else it stays hidden or draws in both.
+        owner = SpriteRenderable._retired_in.get(sprite)
+        if owner is not None and owner is not self:
+            owner._evict(sprite)
+
+    def _evict(self, sprite: Sprite) -> None:
+        # The placeholder shares the sprite's texture so it doesn't take any more of the atlas.
+        idx = self._slots.pop(sprite)
+        sprite.visible = self._retired.pop(sprite)
+        del SpriteRenderable._retired_in[sprite]
+        placeholder = Sprite(sprite.texture)
+        placeholder.visible = False
+        self._sprite_list[idx] = placeholder
+
+    def _take_free(self) -> int:
+        # A retired slot to reuse, dropping the retired sprite still in it. -1 when there are none.
+        while self._free:
+            idx = self._free.pop()
+            occupant = self._sprite_list[idx]
+            if occupant not in self._slots:
+                return idx
+            if occupant in self._retired:
+                occupant.visible = self._retired.pop(occupant)
+                del self._slots[occupant]
+                if SpriteRenderable._retired_in.get(occupant) is self:
+                    del SpriteRenderable._retired_in[occupant]
+                return idx
+        return -1
+
+    def add_many(self, sprites: Iterable[Sprite]) -> None:
+        new = []
+        for sprite in sprites:
+            if sprite in self._retired:
+                sprite.visible = self._retired.pop(sprite)
+                del SpriteRenderable._retired_in[sprite]
+                continue
+            if sprite in self._slots:
+                continue
+            self._release_elsewhere(sprite)
+            self._track_texture(sprite)
+
+            idx = self._take_free()
+            if idx < 0:
+                self._slots[sprite] = len(self._sprite_list) + len(new)
+                new.append(sprite)
+            else:
+                self._slots[sprite] = idx
+                self._sprite_list[idx] = sprite
+        if new:
+            self._sprite_list.extend(new)
+        self.invalidate()
+
+    def remove_many(self, sprites: Iterable[Sprite]) -> None:
+        for sprite in sprites:
+            if sprite in self._slots and sprite not in self._retired:
+                self._retired[sprite] = sprite.visible
+                SpriteRenderable._retired_in[sprite] = self
+                sprite.visible = False
+                self._free.append(self._slots[sprite])
+        self.invalidate()
+
+    def slot(self, sprite: Sprite) -> int:
+        if sprite in self._retired:
+            return -1
+        return self._slots.get(sprite, -1)
+
+    def compact(self) -> None:
+        # Drops the retired slots and placeholders, renumbering the live sprites.
+        live = [sprite for sprite in self._sprite_list if sprite in self._slots and sprite not in self._retired]
+        self._restore_retired()
+
+        self._sprite_list.clear()
+        self._sprite_list.extend(live)
+        self._slots = {sprite: idx for idx, sprite in enumerate(live)}
+        self._free.clear()
+        self.invalidate()
 
     def draw(self) -> bool | None:
-        self._sprite_list.draw()
+        self._sprite_list.draw(blend_function=BLEND_SEPARATE_ALPHA)
 
     def is_empty(self) -> bool:
-        return len(self._sprite_list) == 0
+        return len(self._slots) == len(self._retired)
 
     def is_full(self) -> bool:
         return False
 
     def clear(self) -> None:
+        self._restore_retired()
+        self._slots.clear()
+        self._free.clear()
         self._sprite_list.clear()
+        self.invalidate()
+
+    def _restore_retired(self) -> None:
+        for sprite, visible in self._retired.items():
+            sprite.visible = visible
+            if SpriteRenderable._retired_in.get(sprite) is self:
+                del SpriteRenderable._retired_in[sprite]
+        self._retired.clear()
+
+    def _track_texture(self, sprite: Sprite) -> None:
+        texture = sprite.texture
+        image = texture.image_data
+        if image.hash in SpriteRenderable._atlas_images:
+            return
+        SpriteRenderable._atlas_images[image.hash] = (weakref.ref(texture), image.width * image.height)
+
+    @staticmethod
+    def atlas_stats() -> AtlasStats:
+        atlas = SpriteRenderable._atlas
+        if atlas is None:
+            return AtlasStats(0, 0, 0, 0.0)
+
+        # The atlas drops textures once they are garbage collected so we only count those it still has.
+        used = SpriteRenderable._atlas_images = {
+            name: (ref, area) for name, (ref, area) in SpriteRenderable._atlas_images.items()
+            if (texture := ref()) is not None and atlas.has_texture(texture)
+        }
+        used_area = sum(area for _, area in used.values())
+        total_area = atlas.width * atlas.height
+        return AtlasStats(len(used), used_area, total_area, used_area / total_area)
+
+
+# Held weakly so textures no element uses any more can be collected, and dropped from the atlas.
+_TEXTURE_CACHE: weakref.WeakValueDictionary[str, ImageTexture] = weakref.WeakValueDictionary()
+
+
+def load_ui_texture(path: str | Path) -> ImageTexture:
+    # Texture elements which share an image also share the texture and therefore its atlas region.
+    key = str(path)
+    texture = _TEXTURE_CACHE.get(key)
+    if texture is None:
+        texture = _TEXTURE_CACHE[key] = load_texture(path)
+    return texture
 
 
 class TextRenderbale(Renderable):
+    """
+    Draws every added text in one pyglet batch. Editing a text already in the
+    batch (its string, colour or position) doesn't go through the renderable,
+    so the element making the edit has to call invalidate_layer for a cached
+    layer holding it to render again.
+    """
 
     def __init__(self) -> None:
         self._batch: Batch = Batch()
 
     def add(self, text: Text):
         text.batch = self._batch
+        self.invalidate()
 
     def remove(self, text: Text):
         text.batch = None
+        self.invalidate()
 
     def draw(self) -> bool | None:
         self._batch.draw()
@@ -54,20 +242,24 @@ class TextRenderbale(Renderable):
     def clear(self) -> None:
         # seems leaky????
         self._batch = Batch()
+        self.invalidate()
 
 class Batchable(Protocol):
     batch: Batch | None
 
 class BatchRenderable(Renderable):
+    # Like TextRenderbale, edits to items already in the batch need invalidate_layer.
 
     def __init__(self) -> None:
         self._batch: Batch = Batch()
 
     def add(self, item: Batchable) -> None:
         item.batch = self._batch
+        self.invalidate()
 
     def remove(self, item: Batchable) -> None:
         item.batch = None
+        self.invalidate()
 
     def draw(self) -> bool | None:
         self._batch.draw()
@@ -81,13 +273,32 @@ class BatchRenderable(Renderable):
     def clear(self) -> None:
         # seems leaky????
         self._batch = Batch()
+        self.invalidate()
+
+
+# Style boxes and meshes bind the same blend state, so adjacent runs of either share it.
+_BLEND_DEFAULT_STATE = "blend_separate_alpha"
 
 
 class StyleRenderable(Renderable):
 
-    def __init__(self) -> None:
-        self.renderer = StyleBoxRenderer()
+    def __init__(self, arena: StyleBoxArena | None = None) -> None:
+        self.renderer = StyleBoxRenderer(arena=arena)
         self.renderer.prep_buffers()
+        self.renderer.invalidate = self._invalidate_commands
+        self.renderer.mark_changed = self._mark_contents_changed
+
+    @classmethod
+    def create_arena(cls) -> StyleBoxArena:
+        # Every tree of a Mint draws its style boxes from one arena.
+        return StyleBoxArena()
+
+    def _invalidate_commands(self) -> None:
+        # The tree replaces invalidate after the renderer is made, so look it up each call.
+        self.invalidate()
+
+    def _mark_contents_changed(self) -> None:
+        self.mark_changed()
 
     def add(self, item: StyleBox):
         self.renderer.add(item)
@@ -95,20 +306,92 @@ class StyleRenderable(Renderable):
     def remove(self, item: StyleBox):
         self.renderer.remove(item)
 
+    def add_many(self, items: Iterable[StyleBox]) -> None:
+        self.renderer.add_many(items)
+
+    def remove_many(self, items: Iterable[StyleBox]) -> None:
+        self.renderer.remove_many(items)
+
+    def commands(self) -> Iterable[Callable[[], Any]]:
+        return self.renderer.commands()
+
+    def state_key(self) -> Hashable:
+        return _BLEND_DEFAULT_STATE
+
+    def bind_state(self) -> None:
+        self.renderer.bind_state()
+
+    def unbind_state(self) -> None:
+        self.renderer.unbind_state()
+
     def draw(self) -> bool | None:
-        self.renderer.draw()
+        self.renderer.render()
 
     def is_empty(self) -> bool:
         return self.renderer._max_tri == 0
 
     def is_full(self) -> bool:
-        return self.renderer._max_tri >= self.renderer._slots.qsize()
+        # The renderer grows as it needs to.
+        return False
 
     def clear(self) -> None:
         self.renderer.clear_buffers()
 
 class MeshRenderable(Renderable):
-    pass
+
+    def __init__(self, arena: MeshArena | None = None) -> None:
+        self.renderer = MeshRenderer(arena=arena)
+        self.renderer.prep_buffers()
+        self.renderer.invalidate = self._invalidate_commands
+        self.renderer.mark_changed = self._mark_contents_changed
+
+    @classmethod
+    def create_arena(cls) -> MeshArena:
+        # Every tree of a Mint draws its meshes from one arena.
+        return MeshArena()
+
+    def _invalidate_commands(self) -> None:
+        # The tree replaces invalidate after the renderer is made, so look it up each call.
+        self.invalidate()
+
+    def _mark_contents_changed(self) -> None:
+        self.mark_changed()
+
+    def add(self, item: Mesh):
+        self.renderer.add(item)
+
+    def remove(self, item: Mesh):
+        self.renderer.remove(item)
+
+    def add_many(self, items: Iterable[Mesh]) -> None:
+        self.renderer.add_many(items)
+
+    def remove_many(self, items: Iterable[Mesh]) -> None:
+        self.renderer.remove_many(items)
+
+    def commands(self) -> Iterable[Callable[[], Any]]:
+        return self.renderer.commands()
+
+    def state_key(self) -> Hashable:
+        return _BLEND_DEFAULT_STATE
+
+    def bind_state(self) -> None:
+        self.renderer.bind_state()
+
+    def unbind_state(self) -> None:
+        self.renderer.unbind_state()
+
+    def draw(self) -> bool | None:
+        self.renderer.render()
+
+    def is_empty(self) -> bool:
+        return self.renderer.index_count == 0
+
+    def is_full(self) -> bool:
+        return False
+
+    def clear(self) -> None:
+        self.renderer.clear()
 
 
 def setup_arcade() -> None:
@@ -117,3 +400,4 @@ def setup_arcade() -> None:
     Mint.register_renderable(BuiltInRenderable.BATCH, BatchRenderable)
     Mint.register_renderable(BuiltInRenderable.STYLE, StyleRenderable)
     Mint.register_renderable(BuiltInRenderable.MESH, MeshRenderable)
+    Mint.register_offscreen_backend(ArcadeOffscreenBackend)
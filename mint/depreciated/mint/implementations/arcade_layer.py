@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from arcade import get_window, ArcadeContext, Camera2D, LBWH, XYWH
+from arcade.gl.geometry import quad_2d
+import arcade.gl as gl
+
+from charm.lib.mint.compositor import LayerArea
+
+# Straight alpha blending for colour, but alpha adds up as coverage (ONE, ONE_MINUS_SRC_ALPHA)
+# rather than being multiplied by itself. On screen this looks the same as BLEND_DEFAULT, and
+# drawn into a cleared layer target it leaves the contents truly premultiplied.
+BLEND_SEPARATE_ALPHA = (gl.SRC_ALPHA, gl.ONE_MINUS_SRC_ALPHA, gl.ONE, gl.ONE_MINUS_SRC_ALPHA)
+# Draws premultiplied contents over what is already there. Not the context's
+# BLEND_PREMULTIPLIED_ALPHA, which is (SRC_ALPHA, ONE).
+BLEND_PREMULTIPLIED_OVER = (gl.ONE, gl.ONE_MINUS_SRC_ALPHA)
+
+_LAYER_VS = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+in vec2 in_vert;
+in vec2 in_uv;
+
+out vec2 uv;
+
+void main() {
+    gl_Position = window.projection * window.view * vec4(in_vert, 0.0, 1.0);
+    uv = in_uv;
+}
+"""
+
+_LAYER_FS = """
+#version 330
+
+uniform sampler2D layer;
+
+in vec2 uv;
+
+out vec4 fragColour;
+
+void main() {
+    fragColour = texture(layer, uv);
+}
+"""
+
+
+class LayerTarget:
+
+    def __init__(self, ctx: ArcadeContext, width: int, height: int) -> None:
+        self.texture: gl.Texture2D = ctx.texture((width, height), components=4)
+        self.framebuffer: gl.Framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+        self.camera: Camera2D = Camera2D(viewport=LBWH(0, 0, width, height), render_target=self.framebuffer)
+
+        # The quad the layer was last drawn with, rebuilt when the area moves
+        self.quad: gl.Geometry = None
+        self.quad_area: LayerArea = (0.0, 0.0, 0.0, 0.0)
+
+
+class ArcadeOffscreenBackend:
+    """
+    Renders cached layers into framebuffers and draws them back as textured quads.
+    """
+
+    def __init__(self) -> None:
+        self._ctx: ArcadeContext = get_window().ctx
+        self._program: gl.Program = self._ctx.program(vertex_shader=_LAYER_VS, fragment_shader=_LAYER_FS)
+
+    def create_target(self, width: int, height: int) -> LayerTarget:
+        return LayerTarget(self._ctx, width, height)
+
+    def release_target(self, target: LayerTarget) -> None:
+        target.framebuffer.delete()
+        target.texture.delete()
+
+    def render_to_target(self, target: LayerTarget, area: LayerArea, draw: Callable[[], None]) -> None:
+        left, bottom, width, height = area
+        camera = target.camera
+        camera.projection = XYWH(0.0, 0.0, width, height)
+        camera.position = left + 0.5 * width, bottom + 0.5 * height
+
+        # Renderables bind BLEND_SEPARATE_ALPHA themselves, this covers anything which doesn't set a blend.
+        prev_func = self._ctx.blend_func
+        self._ctx.blend_func = BLEND_SEPARATE_ALPHA
+        with camera.activate():
+            target.framebuffer.clear()
+            draw()
+        self._ctx.blend_func = prev_func
+
+    def draw_target(self, target: LayerTarget, area: LayerArea) -> None:
+        if target.quad is None or target.quad_area != area:
+            left, bottom, width, height = area
+            target.quad = quad_2d((width, height), (left + 0.5 * width, bottom + 0.5 * height))
+            target.quad_area = area
+
+        target.texture.use(0)
+        # The layer was drawn with BLEND_SEPARATE_ALPHA so its contents are premultiplied.
+        prev_func = self._ctx.blend_func
+        self._ctx.blend_func = BLEND_PREMULTIPLIED_OVER
+        with self._ctx.enabled(self._ctx.BLEND):
+            target.quad.render(self._program)
+        self._ctx.blend_func = prev_func
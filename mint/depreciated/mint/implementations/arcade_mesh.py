@@ -0,0 +1,437 @@
+from __future__ import annotations
+
+from array import array
+from functools import partial
+from typing import Sequence, Callable, Any, Iterable
+
+from charm.data import get_shader_path
+from charm.lib.mint.rendering.arena import DirtyArray, RangeAllocator
+from charm.lib.mint.implementations.arcade_layer import BLEND_SEPARATE_ALPHA
+from arcade import get_window, ArcadeContext
+import arcade.gl as gl
+
+
+class Mesh:
+    """
+    Custom element geometry (progress arcs, charts, waveforms, etc). The mesh
+    is a handle into the MeshRenderer's shared arena once added, and updates
+    write straight into the arena.
+
+    Vertices are (x, y, z) triples, colours RGBA bytes per vertex, and the
+    indices are triangles local to the mesh. The arrays are checked against
+    each other whenever they change, so a mesh can never write outside its
+    range of the arena. Changing the vertex count has to go through
+    update_geometry so the colours and indices change with it.
+    """
+
+    def __init__(
+            self,
+            vertices: Sequence[float],
+            colours: Sequence[int],
+            indices: Sequence[int]
+        ) -> None:
+        self.vertex_array: array[float] = array('f', vertices)
+        self.colour_array: array[int] = array('B', colours)
+        self.index_array: array[int] = array('I', indices)
+        _check_mesh(self.vertex_array, self.colour_array, self.index_array)
+
+        self.renderer: MeshRenderer = None
+        self.vertex_start: int = -1
+        self.index_start: int = -1
+        # The sizes of the mesh's ranges in the arena, which are what it frees and writes.
+        self.arena_vertex_count: int = 0
+        self.arena_index_count: int = 0
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.vertex_array) // 3
+
+    @property
+    def index_count(self) -> int:
+        return len(self.index_array)
+
+    def update_vertices(self, vertices: Sequence[float]) -> None:
+        # Moves the vertices in place, see update_geometry to change how many there are.
+        vertex_array = array('f', vertices)
+        if len(vertex_array) != len(self.vertex_array):
+            raise ValueError(f"Mesh has {self.vertex_count} vertices, use update_geometry to change the vertex count")
+        self.vertex_array = vertex_array
+        if self.renderer is not None:
+            self.renderer.update_vertices(self)
+
+    def update_colours(self, colours: Sequence[int]) -> None:
+        colour_array = array('B', colours)
+        _check_mesh(self.vertex_array, colour_array, self.index_array)
+        self.colour_array = colour_array
+        if self.renderer is not None:
+            self.renderer.update_colours(self)
+
+    def update_indices(self, indices: Sequence[int]) -> None:
+        index_array = array('I', indices)
+        _check_mesh(self.vertex_array, self.colour_array, index_array)
+        self.update_geometry(self.vertex_array, self.colour_array, index_array)
+
+    def update_geometry(self, vertices: Sequence[float], colours: Sequence[int], indices: Sequence[int]) -> None:
+        # Replaces the whole mesh, which takes a new range in the arena if it's added.
+        vertex_array = array('f', vertices)
+        colour_array = array('B', colours)
+        index_array = array('I', indices)
+        _check_mesh(vertex_array, colour_array, index_array)
+
+        renderer = self.renderer
+        if renderer is not None:
+            renderer.remove(self)
+        self.vertex_array = vertex_array
+        self.colour_array = colour_array
+        self.index_array = index_array
+        if renderer is not None:
+            renderer.add(self)
+
+
+def _check_mesh(vertices: array[float], colours: array[int], indices: array[int]) -> None:
+    # Raises if the arrays don't describe the same vertices, as the arena trusts them.
+    if len(vertices) % 3:
+        raise ValueError(f"Mesh vertices must be (x, y, z) triples, got {len(vertices)} values")
+    count = len(vertices) // 3
+    if len(colours) != 4 * count:
+        raise ValueError(f"Mesh needs 4 colour bytes for each of its {count} vertices, got {len(colours)}")
+    if len(indices) % 3:
+        raise ValueError(f"Mesh indices must be triangles, got {len(indices)} indices")
+    if indices and max(indices) >= count:
+        raise ValueError(f"Mesh index {max(indices)} is past its {count} vertices")
+
+
+def _detach(mesh: Mesh) -> None:
+    mesh.renderer = None
+    mesh.vertex_start = -1
+    mesh.index_start = -1
+    mesh.arena_vertex_count = 0
+    mesh.arena_index_count = 0
+
+
+class MeshArena:
+    """
+    The growable vertex, colour, and index buffers MeshRenderers draw from.
+    Vertices are allocated in contiguous ranges which can be freed and
+    reused, and each renderer draws its own range of the index buffer, so
+    renderers sharing an arena (one for each tree in a Mint) share the
+    buffers and their uploads while still drawing separately.
+    """
+    _VERTEX_STEP_SIZE = 3
+    _COLOUR_STEP_SIZE = 4
+    _VERTEX_BYTE_SIZE = _VERTEX_STEP_SIZE * 4 # 3 4 byte floats
+    _COLOUR_BYTE_SIZE = _COLOUR_STEP_SIZE * 1 # 4 1 byte ints
+    _INDEX_BYTE_SIZE = 4 # 1 4 byte int
+
+    def __init__(self, reserve: int = 256) -> None:
+        self._vertex: DirtyArray = DirtyArray('f', MeshArena._VERTEX_STEP_SIZE, reserve)
+        self._colour: DirtyArray = DirtyArray('B', MeshArena._COLOUR_STEP_SIZE, reserve)
+        self._index: DirtyArray = DirtyArray('I', 1, reserve)
+
+        self._vertices: RangeAllocator = RangeAllocator(reserve)
+        # The ranges of the index array handed out to renderers.
+        self._indices: RangeAllocator = RangeAllocator(reserve)
+
+        self._vertex_buffer: gl.Buffer = None
+        self._colour_buffer: gl.Buffer = None
+        self._index_buffer: gl.Buffer = None
+
+        self._program: gl.Program = None
+        self._geometry: gl.Geometry = None
+
+        self._ctx: ArcadeContext = None
+
+    def prep_buffers(self):
+        self.stale_buffers()
+
+        if self._index_buffer is not None:
+            return
+
+        self._ctx = ctx = get_window().ctx
+
+        self._vertex_buffer = ctx.buffer(reserve=self._vertex.capacity * MeshArena._VERTEX_BYTE_SIZE)
+        self._colour_buffer = ctx.buffer(reserve=self._colour.capacity * MeshArena._COLOUR_BYTE_SIZE)
+        self._index_buffer = ctx.buffer(reserve=self._index.capacity * MeshArena._INDEX_BYTE_SIZE)
+
+        # Meshes share the style box vertex format so they share its shaders too.
+        self._program = ctx.load_program(
+            vertex_shader=get_shader_path('style_vs'),
+            fragment_shader=get_shader_path('style_fs')
+        )
+
+        self._geometry = ctx.geometry(
+            [
+                gl.BufferDescription(self._vertex_buffer, '3f', ['in_pos']),
+                gl.BufferDescription(self._colour_buffer, '4f1', ['in_colour'])
+            ],
+            self._index_buffer,
+            gl.TRIANGLES,
+            index_element_size=MeshArena._INDEX_BYTE_SIZE
+        )
+
+    def stale_buffers(self):
+        self._vertex.mark_all()
+        self._colour.mark_all()
+        self._index.mark_all()
+
+    def update_buffers(self) -> int:
+        # Returns the number of bytes uploaded, which is nothing if another renderer already uploaded this frame.
+        return (
+            self._index.upload(self._index_buffer)
+            + self._vertex.upload(self._vertex_buffer)
+            + self._colour.upload(self._colour_buffer)
+        )
+
+    def allocate_vertices(self, count: int) -> int:
+        start = self._vertices.allocate(count)
+        self._vertex.grow(self._vertices.capacity)
+        self._colour.grow(self._vertices.capacity)
+        return start
+
+    def free_vertices(self, start: int, count: int):
+        self._vertices.free(start, count)
+
+    def allocate_indices(self, count: int) -> int:
+        start = self._indices.allocate(count)
+        self._index.grow(self._indices.capacity)
+        return start
+
+    def free_indices(self, start: int, count: int):
+        self._indices.free(start, count)
+
+
+class MeshRenderer:
+    """
+    Packs every added mesh into a MeshArena, its own unless one is given, so
+    all of the renderer's custom geometry draws in a single call.
+
+    The meshes' indices are kept contiguous at the start of the renderer's
+    range of the arena's index array so the draw call only covers live
+    triangles.
+    """
+
+    def __init__(self, reserve: int = 256, arena: MeshArena | None = None) -> None:
+        self._arena: MeshArena = arena if arena is not None else MeshArena(reserve)
+        self._vertex: DirtyArray = self._arena._vertex
+        self._colour: DirtyArray = self._arena._colour
+        self._index: DirtyArray = self._arena._index
+        self._vertices: RangeAllocator = self._arena._vertices
+
+        # The renderer's range of the index array. Mesh index_starts are relative to it.
+        self._index_reserve: int = reserve
+        self._index_first: int = self._arena.allocate_indices(reserve)
+        self._index_count: int = 0
+
+        self._meshes: list[Mesh] = []
+
+        self._prev_blend_func: tuple[int, ...] = None
+        self._prev_blend_enabled: bool = False
+
+    @property
+    def _ctx(self) -> ArcadeContext:
+        return self._arena._ctx
+
+    def prep_buffers(self):
+        self._arena.prep_buffers()
+
+    def stale_buffers(self):
+        self._arena.stale_buffers()
+
+    def update_buffers(self) -> int:
+        return self._arena.update_buffers()
+
+    def _reserve_indices(self, count: int):
+        # Moves the indices to a bigger range of the arena once they don't fit. Freeing the
+        # old range first lets the arena extend it in place when nothing follows it.
+        if count <= self._index_reserve:
+            return
+        old_first = self._index_first
+        self._arena.free_indices(old_first, self._index_reserve)
+        self._index_reserve = max(2 * self._index_reserve, count)
+        self._index_first = self._arena.allocate_indices(self._index_reserve)
+        if self._index_first != old_first and self._index_count:
+            data = self._index.data
+            data[self._index_first:self._index_first + self._index_count] = data[old_first:old_first + self._index_count]
+            self._index.mark(self._index_first, self._index_first + self._index_count)
+
+    def add(self, mesh: Mesh):
+        self.add_many((mesh,))
+
+    def add_many(self, meshes: Iterable[Mesh]):
+        # The batch takes one vertex range and one block of indices, so adding it grows the
+        # arrays at most once, marks a single range of each and invalidates once.
+        adding = list({id(mesh): mesh for mesh in meshes if mesh.renderer is not self}.values())
+        if not adding:
+            return
+        for mesh in adding:
+            # The arrays are public, so check them again in case they were changed directly.
+            _check_mesh(mesh.vertex_array, mesh.colour_array, mesh.index_array)
+
+        first = start = self._arena.allocate_vertices(sum(mesh.vertex_count for mesh in adding))
+
+        first_index = index = self._index_count
+        end = first_index + sum(mesh.index_count for mesh in adding)
+        self._reserve_indices(end)
+        base = self._index_first
+
+        vertex_data, colour_data, index_data = self._vertex.data, self._colour.data, self._index.data
+        for mesh in adding:
+            count = mesh.vertex_count
+            size = mesh.index_count
+            mesh.vertex_start = start
+            mesh.index_start = index
+            mesh.arena_vertex_count = count
+            mesh.arena_index_count = size
+            mesh.renderer = self
+
+            vertex_data[3 * start:3 * (start + count)] = mesh.vertex_array
+            colour_data[4 * start:4 * (start + count)] = mesh.colour_array
+            index_data[base + index:base + index + size] = array('I', [start + idx for idx in mesh.index_array])
+            start += count
+            index += size
+
+        self._vertex.mark(3 * first, 3 * start)
+        self._colour.mark(4 * first, 4 * start)
+        self._index.mark(base + first_index, base + end)
+        self._index_count = end
+
+        self._meshes.extend(adding)
+        self.invalidate()
+
+    def remove(self, mesh: Mesh):
+        if mesh.renderer is not self:
+            return
+
+        # Move all indices after the mesh down to keep the draw range contiguous
+        start = mesh.index_start
+        size = mesh.arena_index_count
+        base = self._index_first
+        data = self._index.data
+        data[base + start:base + self._index_count - size] = data[base + start + size:base + self._index_count]
+        self._index.mark(base + start, base + self._index_count - size)
+        self._index_count -= size
+
+        for other in self._meshes:
+            if other.index_start > start:
+                other.index_start -= size
+
+        # The vertices don't need to move, their range is just freed for reuse
+        self._arena.free_vertices(mesh.vertex_start, mesh.arena_vertex_count)
+
+        self._meshes.remove(mesh)
+        _detach(mesh)
+
+        self.invalidate()
+
+    def remove_many(self, meshes: Iterable[Mesh]):
+        # Compacts the indices once rather than once per mesh.
+        removing = {mesh for mesh in meshes if mesh.renderer is self}
+        if not removing:
+            return
+
+        # The meshes are stored in the same order as their indices.
+        data = self._index.data
+        base = self._index_first
+        first = min(mesh.index_start for mesh in removing)
+        kept: list[Mesh] = []
+        count = 0
+        for mesh in self._meshes:
+            if mesh in removing:
+                self._arena.free_vertices(mesh.vertex_start, mesh.arena_vertex_count)
+                _detach(mesh)
+                continue
+
+            size = mesh.arena_index_count
+            if mesh.index_start != count:
+                data[base + count:base + count + size] = data[base + mesh.index_start:base + mesh.index_start + size]
+                mesh.index_start = count
+            count += size
+            kept.append(mesh)
+
+        self._index.mark(base + first, base + count)
+        self._index_count = count
+        self._meshes = kept
+
+        self.invalidate()
+
+    def clear(self):
+        # Only this renderer's vertices are freed, the arena may be drawing other renderers' meshes.
+        for mesh in self._meshes:
+            self._arena.free_vertices(mesh.vertex_start, mesh.arena_vertex_count)
+            _detach(mesh)
+        self._meshes = []
+
+        self._index_count = 0
+
+        self.invalidate()
+
+    def update_vertices(self, mesh: Mesh):
+        if mesh.renderer is not self:
+            return
+        self._write_vertices(mesh)
+        self.mark_changed()
+
+    def update_colours(self, mesh: Mesh):
+        if mesh.renderer is not self:
+            return
+        self._write_colours(mesh)
+        self.mark_changed()
+
+    def _write_vertices(self, mesh: Mesh):
+        # Only ever writes the mesh's own range, so a resized array can't spill into another mesh.
+        start = 3 * mesh.vertex_start
+        end = start + 3 * mesh.arena_vertex_count
+        if len(mesh.vertex_array) != end - start:
+            raise ValueError(f"Mesh has {mesh.arena_vertex_count} vertices in the arena, use update_geometry to change the count")
+        self._vertex.data[start:end] = mesh.vertex_array
+        self._vertex.mark(start, end)
+
+    def _write_colours(self, mesh: Mesh):
+        start = 4 * mesh.vertex_start
+        end = start + 4 * mesh.arena_vertex_count
+        if len(mesh.colour_array) != end - start:
+            raise ValueError(f"Mesh needs {end - start} colour bytes, got {len(mesh.colour_array)}")
+        self._colour.data[start:end] = mesh.colour_array
+        self._colour.mark(start, end)
+
+    @property
+    def index_count(self) -> int:
+        return self._index_count
+
+    def commands(self) -> tuple[Callable[[], Any], ...]:
+        # The resolved draw calls for the current contents, these are only valid until invalidate is called.
+        return (
+            self.update_buffers,
+            partial(self._arena._geometry.render, self._arena._program, first=self._index_first, vertices=self._index_count)
+        )
+
+    def invalidate(self):
+        # Called whenever the draw range changes. Replaced by the owning renderable.
+        pass
+
+    def mark_changed(self):
+        # Called whenever values change within the draw range. Replaced by the owning renderable.
+        pass
+
+    def bind_state(self):
+        self._prev_blend_func = self._ctx.blend_func
+        self._prev_blend_enabled = self._ctx.is_enabled(self._ctx.BLEND)
+        self._ctx.blend_func = BLEND_SEPARATE_ALPHA
+        self._ctx.enable(self._ctx.BLEND)
+
+    def unbind_state(self):
+        if not self._prev_blend_enabled:
+            self._ctx.disable(self._ctx.BLEND)
+        self._ctx.blend_func = self._prev_blend_func
+
+    def render(self):
+        # Assumes the blend state is already bound, see bind_state
+        self.update_buffers()
+        self._arena._geometry.render(self._arena._program, first=self._index_first, vertices=self._index_count)
+
+    def draw(self):
+        prev_func = self._ctx.blend_func
+        self._ctx.blend_func = BLEND_SEPARATE_ALPHA
+        with self._ctx.enabled(self._ctx.BLEND):
+            self.render()
+        self._ctx.blend_func = prev_func
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 from array import array
+from functools import partial
+from typing import Callable, Any, Iterable
 from queue import PriorityQueue
-from heapq import heapify, nsmallest
+from heapq import heapify, heappop, nsmallest
 from uuid import UUID, uuid4
 
 from charm.data import get_shader_path
 from charm.lib.mint.rendering.style_box import gen_stylebox, generate_vertex_positions, find_corner_positions
+from charm.lib.mint.rendering.arena import DirtyArray, RangeAllocator
+from charm.lib.mint import trace
+from charm.lib.mint.implementations.arcade_layer import BLEND_SEPARATE_ALPHA
 from arcade import load_texture, Text, Rect, XYWH, Vec2, get_window, ArcadeContext
 import arcade.gl as gl
 from arcade.types import RGBA255
@@ -42,6 +47,8 @@ class StyleBox:
         self.tri_count = self._resolution * (4 + 8 * self._has_border) - 2
 
         self.slots: tuple[int, ...] = None
+        # The half open range spanned by the slots, used to mark what needs uploading
+        self.slot_range: tuple[int, int] = (0, 0)
         self.renderer: StyleBoxRenderer = None
         self.idx_start: int  = -1
 
@@ -86,7 +93,9 @@ class StyleBox:
             target_array[3 * target + 1] = source_array[3 * source + 1]
             target_array[3 * target + 2] = source_array[3 * source + 2]
 
-        self.renderer._vertex_stale = True
+        lo, hi = self.slot_range
+        self.renderer._vertex.mark(3 * lo, 3 * hi)
+        self.renderer.mark_changed()
 
     def _update_colour(self):
         if self.renderer is None or self.idx_start < 0:
@@ -107,7 +116,9 @@ class StyleBox:
             target_array[4 * target + 2] = source_array[4 * source + 2]
             target_array[4 * target + 3] = source_array[4 * source + 3]
 
-        self.renderer._colour_stale = True
+        lo, hi = self.slot_range
+        self.renderer._colour.mark(4 * lo, 4 * hi)
+        self.renderer.mark_changed()
 
     def _update(self):
         if self.renderer is None or self.idx_start < 0:
@@ -120,7 +131,7 @@ class StyleBox:
         source_colour = self.colour_array
 
         target_vertex = self.renderer._vertex_array
-        source_vertex = self.renderer._colour_array
+        source_vertex = self.vertex_array
 
         for idx in range(3 * self.tri_count):
             source = indices[idx]
@@ -135,8 +146,10 @@ class StyleBox:
             target_colour[4 * target + 2] = source_colour[4 * source + 2]
             target_colour[4 * target + 3] = source_colour[4 * source + 3]
 
-        self.renderer._vertex_stale = True
-        self.renderer._colour_stale = True
+        lo, hi = self.slot_range
+        self.renderer._vertex.mark(3 * lo, 3 * hi)
+        self.renderer._colour.mark(4 * lo, 4 * hi)
+        self.renderer.mark_changed()
 
     def update_position(self, new_position: Vec2) -> None:
         if new_position == self._rect.center:
@@ -294,7 +307,13 @@ class StyleBox:
         # TODO: update vertices
         pass
 
-class StyleBoxRenderer:
+class StyleBoxArena:
+    """
+    The buffers StyleBoxRenderers draw from. Each renderer takes vertex slots
+    from the arena as boxes are added and draws its own range of the index
+    buffer, so renderers sharing an arena (one for each tree in a Mint) share
+    the buffers and their uploads while still drawing separately.
+    """
     _INDEX_STEP_SIZE = 3
     _VERTEX_STEP_SIZE = 3
     _COLOUR_STEP_SIZE = 4
@@ -302,23 +321,21 @@ class StyleBoxRenderer:
     _VERTEX_BYTE_SIZE = _VERTEX_STEP_SIZE * 4 # 3 4 byte floats
     _COLOUR_BYTE_SIZE = _COLOUR_STEP_SIZE * 1 # 4 1 byte floats
 
-
-    def __init__(self, reserve: int = 32768) -> None:
-        self._initialised: bool = False
+    def __init__(self, reserve: int = 256) -> None:
         self._reserve: int = reserve
 
-        self._index_array: array = array('I', [0] * 3 * reserve)
-        self._vertex_array: array = array('f', [.0] * 3 * reserve)
-        self._colour_array: array = array('B', [0] * 4 * reserve)
+        # The CPU side copies of the buffers. These only upload the range written since the last draw.
+        self._index: DirtyArray = DirtyArray('I', StyleBoxArena._INDEX_STEP_SIZE, reserve)
+        self._vertex: DirtyArray = DirtyArray('f', StyleBoxArena._VERTEX_STEP_SIZE, reserve)
+        self._colour: DirtyArray = DirtyArray('B', StyleBoxArena._COLOUR_STEP_SIZE, reserve)
+
+        # The ranges of the index array handed out to renderers, in triangles.
+        self._triangles: RangeAllocator = RangeAllocator(reserve)
 
         self._index_buffer: gl.Buffer = None
         self._vertex_buffer: gl.Buffer = None
         self._colour_buffer: gl.Buffer = None
 
-        self._index_stale: bool = False
-        self._vertex_stale: bool = False
-        self._colour_stale: bool = False
-
         self._style_box_program: gl.Program = None
         self._style_box_geometry: gl.Geometry = None
 
@@ -326,10 +343,6 @@ class StyleBoxRenderer:
         self._slots.queue = list(range(reserve))
         heapify(self._slots.queue)
 
-        self._max_tri: int = 0
-
-        self._style_boxes: list[StyleBox] = []
-
         self._ctx: ArcadeContext = None
 
     def prep_buffers(self):
@@ -340,9 +353,9 @@ class StyleBoxRenderer:
 
         self._ctx = ctx = get_window().ctx
 
-        self._index_buffer = ctx.buffer(reserve=self._reserve * StyleBoxRenderer._INDEX_BYTE_SIZE)
-        self._vertex_buffer = ctx.buffer(reserve=self._reserve * StyleBoxRenderer._VERTEX_BYTE_SIZE)
-        self._colour_buffer = ctx.buffer(reserve=self._reserve * StyleBoxRenderer._COLOUR_BYTE_SIZE)
+        self._index_buffer = ctx.buffer(reserve=self._index.capacity * StyleBoxArena._INDEX_BYTE_SIZE)
+        self._vertex_buffer = ctx.buffer(reserve=self._reserve * StyleBoxArena._VERTEX_BYTE_SIZE)
+        self._colour_buffer = ctx.buffer(reserve=self._reserve * StyleBoxArena._COLOUR_BYTE_SIZE)
 
         self._style_box_program = ctx.load_program(
             vertex_shader=get_shader_path('style_vs'),
@@ -358,103 +371,257 @@ class StyleBoxRenderer:
             gl.TRIANGLES
         )
 
+    def stale_buffers(self):
+        self._index.mark_all()
+        self._vertex.mark_all()
+        self._colour.mark_all()
+
+    def update_buffers(self) -> int:
+        # Returns the number of bytes uploaded, which is nothing if another renderer already uploaded this frame.
+        tracer = trace.get_tracer()
+        if tracer is None:
+            return self._upload()
+        with tracer.span("StyleBoxRenderer.update_buffers", "upload"):
+            return self._upload()
+
+    def _upload(self) -> int:
+        return (
+            self._index.upload(self._index_buffer)
+            + self._vertex.upload(self._vertex_buffer)
+            + self._colour.upload(self._colour_buffer)
+        )
+
+    def grow(self, reserve: int):
+        # The GPU buffers are reallocated by the next upload once they are too small.
+        self._vertex.grow(reserve)
+        self._colour.grow(reserve)
+
+        for slot in range(self._reserve, reserve):
+            self._slots.put_nowait(slot)
+        self._reserve = reserve
+
+    def allocate_triangles(self, count: int) -> int:
+        start = self._triangles.allocate(count)
+        self._index.grow(self._triangles.capacity)
+        return start
+
+    def free_triangles(self, start: int, count: int):
+        self._triangles.free(start, count)
+
+
+class StyleBoxRenderer:
+    """
+    Draws style boxes from a StyleBoxArena, its own unless one is given. The
+    boxes' indices are packed at the start of the renderer's range of the
+    arena's index array so they draw in one call.
+    """
+
+    def __init__(self, reserve: int = 256, arena: StyleBoxArena | None = None) -> None:
+        self._initialised: bool = False
+        self._arena: StyleBoxArena = arena if arena is not None else StyleBoxArena(reserve)
+
+        # The arena's arrays grow in place so these references stay valid.
+        self._index: DirtyArray = self._arena._index
+        self._vertex: DirtyArray = self._arena._vertex
+        self._colour: DirtyArray = self._arena._colour
+        self._index_array: array = self._index.data
+        self._vertex_array: array = self._vertex.data
+        self._colour_array: array = self._colour.data
+        self._slots: PriorityQueue[int] = self._arena._slots
+
+        # The renderer's range of the index array, in triangles. Box idx_starts are relative to it.
+        self._tri_reserve: int = reserve
+        self._first_tri: int = self._arena.allocate_triangles(reserve)
+        self._max_tri: int = 0
+
+        self._style_boxes: list[StyleBox] = []
+
+        self._prev_blend_func: tuple[int, ...] = None
+        self._prev_blend_enabled: bool = False
+
+    @property
+    def _reserve(self) -> int:
+        return self._arena._reserve
+
+    @property
+    def _ctx(self) -> ArcadeContext:
+        return self._arena._ctx
+
+    def prep_buffers(self):
+        self._arena.prep_buffers()
 
     def stale_buffers(self):
-        self._index_stale = True
-        self._vertex_stale = True
-        self._colour_stale = True
+        self._arena.stale_buffers()
 
-    def update_buffers(self):
-        if self._index_stale:
-            self._index_buffer.write(self._index_array.tobytes())
-            self._index_stale = False
+    def update_buffers(self) -> int:
+        return self._arena.update_buffers()
 
-        if self._vertex_stale:
-            self._vertex_buffer.write(self._vertex_array.tobytes())
-            self._vertex_stale = False
+    def _grow(self, reserve: int):
+        self._arena.grow(reserve)
 
-        if self._colour_stale:
-            self._colour_buffer.write(self._colour_array.tobytes())
-            self._colour_stale = False
+    def _reserve_triangles(self, count: int):
+        # Moves the indices to a bigger range of the arena once they don't fit. Freeing the
+        # old range first lets the arena extend it in place when nothing follows it.
+        if count <= self._tri_reserve:
+            return
+        old_first, old_reserve = self._first_tri, self._tri_reserve
+        self._arena.free_triangles(old_first, old_reserve)
+        self._tri_reserve = max(2 * old_reserve, count)
+        self._first_tri = self._arena.allocate_triangles(self._tri_reserve)
+        if self._first_tri != old_first and self._max_tri:
+            data = self._index_array
+            data[3 * self._first_tri:3 * (self._first_tri + self._max_tri)] = data[3 * old_first:3 * (old_first + self._max_tri)]
+            self._index.mark(3 * self._first_tri, 3 * (self._first_tri + self._max_tri))
 
     def clear_buffers(self):
+        # Only this renderer's slots go back, the arena may be drawing other renderers' boxes.
+        queue = self._slots.queue
         for box in self._style_boxes:
+            queue.extend(box.slots)
             box.idx_start = -1
             box.slots = ()
+            box.slot_range = (0, 0)
             box.renderer = None
+        heapify(queue)
         self._style_boxes = []
 
         self._max_tri = 0
 
-        self._slots.queue = list(range(self._reserve))
-        heapify(self._slots.queue)
+        self.invalidate()
 
     def add(self, item: StyleBox):
-        if item.index_array is None:
-            item.regenerate_vertices()
-
-        if item in self._style_boxes:
+        self.add_many((item,))
+
+    def add_many(self, items: Iterable[StyleBox]):
+        # Takes every box's slots at once and writes their indices as one block, so a
+        # batch only grows the arrays once, marks one range of each and invalidates once.
+        adding: list[StyleBox] = []
+        for item in items:
+            if item.index_array is None:
+                item.regenerate_vertices()
+            if item.renderer is self:
+                continue
+            item.renderer = self
+            adding.append(item)
+        if not adding:
             return
 
-        size = item.tri_count
-
-        if size > self._slots.qsize():
-            raise NotImplementedError(f'StyleBoxRenderer does not currently support resizing when out of slots.')
-
-        item.idx_start = self._max_tri
-        indices = item.slots = tuple(self._slots.get_nowait() for _ in range(item.value_count))
-        targets = array('I', [0] * 3 * size)
-
-        for idx in range(3 * size):
-            source = item.index_array[idx]
-            target = targets[idx] = indices[source]
-            self._vertex_array[3 * target] = item.vertex_array[3 * source]
-            self._vertex_array[3 * target + 1] = item.vertex_array[3 * source + 1]
-            self._vertex_array[3 * target + 2] = item.vertex_array[3 * source + 2]
-
-            self._colour_array[4 * target] = item.colour_array[4 * source]
-            self._colour_array[4 * target + 1] = item.colour_array[4 * source + 1]
-            self._colour_array[4 * target + 2] = item.colour_array[4 * source + 2]
-            self._colour_array[4 * target + 3] = item.colour_array[4 * source + 3]
+        needed = sum(item.value_count for item in adding)
+        free = self._slots.qsize()
+        if needed > free:
+            self._grow(max(2 * self._reserve, self._reserve + needed - free))
+        self._reserve_triangles(self._max_tri + sum(item.tri_count for item in adding))
+
+        queue = self._slots.queue
+        vertex_array, colour_array = self._vertex_array, self._colour_array
+        first_tri = tri = self._max_tri
+        lo, hi = self._reserve, 0
+        targets = array('I')
+        for item in adding:
+            count = item.value_count
+            # Popped in ascending order, so the box's slots are often one contiguous block.
+            indices = item.slots = tuple(heappop(queue) for _ in range(count))
+            start, stop = item.slot_range = (indices[0], indices[-1] + 1)
+            lo = min(lo, start)
+            hi = max(hi, stop)
+
+            if stop - start == count and len(item.vertex_array) == 3 * count and len(item.colour_array) == 4 * count:
+                vertex_array[3 * start:3 * stop] = item.vertex_array
+                colour_array[4 * start:4 * stop] = item.colour_array
+                targets.extend([start + source for source in item.index_array])
+            else:
+                for source in item.index_array:
+                    target = indices[source]
+                    targets.append(target)
+                    vertex_array[3 * target:3 * target + 3] = item.vertex_array[3 * source:3 * source + 3]
+                    colour_array[4 * target:4 * target + 4] = item.colour_array[4 * source:4 * source + 4]
 
-        self._index_array[3 * self._max_tri : 3 * (self._max_tri + size)] =  targets
-        self._max_tri = self._max_tri + size
+            item.idx_start = tri
+            tri += item.tri_count
 
-        self._style_boxes.append(item)
-        item.renderer = self
+        base = self._first_tri
+        self._index_array[3 * (base + first_tri):3 * (base + tri)] = targets
+        self._index.mark(3 * (base + first_tri), 3 * (base + tri))
+        self._vertex.mark(3 * lo, 3 * hi)
+        self._colour.mark(4 * lo, 4 * hi)
+        self._max_tri = tri
+        self._style_boxes.extend(adding)
 
-        self.stale_buffers()
+        self.invalidate()
 
     def remove(self, item: StyleBox):
-        if item not in self._style_boxes or item.idx_start < 0:
+        if item.renderer is not self or item.idx_start < 0:
             return
 
-        start_box = 3 * item.idx_start
+        base = 3 * self._first_tri
+        start_box = base + 3 * item.idx_start
         length_box = item.tri_count * 3
         end_box = start_box + length_box
 
         start_data = end_box
-        end_data = self._max_tri * 3
+        end_data = base + self._max_tri * 3
 
         end_range = end_data - length_box
 
         # Move all data after indices being removed to keep data contiguous
         self._index_array[start_box:end_range] = self._index_array[start_data:end_data]
+        self._index.mark(start_box, end_range)
         self._max_tri -= item.tri_count
 
+        # The boxes after the removed one have moved down
+        for box in self._style_boxes:
+            if box.idx_start > item.idx_start:
+                box.idx_start -= item.tri_count
+
         # Free the boxes used data slots. This doesn't need to be contiguous (thanks idx array!)
         for slot in item.slots:
             self._slots.put_nowait(slot)
         item.idx_start = -1
         item.slots = ()
+        item.slot_range = (0, 0)
 
         self._style_boxes.remove(item)
         item.renderer = None
 
-        self.stale_buffers()
+        self.invalidate()
+
+    def remove_many(self, items: Iterable[StyleBox]):
+        # Removing one at a time moves the indices after each box, so instead compact them once.
+        removing = {item for item in items if item.renderer is self and item.idx_start >= 0}
+        if not removing:
+            return
+
+        # The boxes are stored in the same order as their indices.
+        data = self._index_array
+        base = 3 * self._first_tri
+        first = min(item.idx_start for item in removing)
+        kept: list[StyleBox] = []
+        tri = 0
+        for box in self._style_boxes:
+            if box in removing:
+                for slot in box.slots:
+                    self._slots.put_nowait(slot)
+                box.idx_start = -1
+                box.slots = ()
+                box.slot_range = (0, 0)
+                box.renderer = None
+                continue
+
+            if box.idx_start != tri:
+                start = base + 3 * box.idx_start
+                data[base + 3 * tri:base + 3 * (tri + box.tri_count)] = data[start:start + 3 * box.tri_count]
+                box.idx_start = tri
+            tri += box.tri_count
+            kept.append(box)
+
+        self._index.mark(base + 3 * first, base + 3 * tri)
+        self._max_tri = tri
+        self._style_boxes = kept
+
+        self.invalidate()
 
     def update_colours(self, box: StyleBox):
-        if box.slots:
+        if not box.slots:
             return
 
         for idx in range(3 * box.tri_count):
@@ -466,10 +633,12 @@ class StyleBoxRenderer:
             self._colour_array[4 * target + 2] = box.colour_array[4 * source + 2]
             self._colour_array[4 * target + 3] = box.colour_array[4 * source + 3]
 
-        self._colour_stale = True
+        lo, hi = box.slot_range
+        self._colour.mark(4 * lo, 4 * hi)
+        self.mark_changed()
 
     def update_vertices(self, box: StyleBox):
-        if box.slots:
+        if not box.slots:
             return
 
         for idx in range(3 * box.tri_count):
@@ -480,10 +649,12 @@ class StyleBoxRenderer:
             self._vertex_array[3 * target + 1] = box.vertex_array[3 * source + 1]
             self._vertex_array[3 * target + 2] = box.vertex_array[3 * source + 2]
 
-        self._vertex_stale = True
+        lo, hi = box.slot_range
+        self._vertex.mark(3 * lo, 3 * hi)
+        self.mark_changed()
 
     def update_values(self, box: StyleBox):
-        if box.slots:
+        if not box.slots:
             return
 
         for idx in range(3 * box.tri_count):
@@ -499,15 +670,50 @@ class StyleBoxRenderer:
             self._vertex_array[3 * target + 1] = box.vertex_array[3 * source + 1]
             self._vertex_array[3 * target + 2] = box.vertex_array[3 * source + 2]
 
-        self._colour_stale = True
-        self._vertex_stale = True
+        lo, hi = box.slot_range
+        self._colour.mark(4 * lo, 4 * hi)
+        self._vertex.mark(3 * lo, 3 * hi)
+        self.mark_changed()
+
+    def commands(self) -> tuple[Callable[[], Any], ...]:
+        # The resolved draw calls for the current contents, these are only valid until invalidate is called.
+        return (
+            self.update_buffers,
+            partial(
+                self._arena._style_box_geometry.render, self._arena._style_box_program,
+                first=self._first_tri * 3, vertices=self._max_tri * 3
+            )
+        )
 
-    def draw(self):
+    def invalidate(self):
+        # Called whenever the draw range changes. Replaced by the owning renderable.
+        pass
+
+    def mark_changed(self):
+        # Called whenever values change within the draw range. Replaced by the owning renderable.
+        pass
+
+    def bind_state(self):
+        self._prev_blend_func = self._ctx.blend_func
+        self._prev_blend_enabled = self._ctx.is_enabled(self._ctx.BLEND)
+        self._ctx.blend_func = BLEND_SEPARATE_ALPHA
+        self._ctx.enable(self._ctx.BLEND)
+
+    def unbind_state(self):
+        if not self._prev_blend_enabled:
+            self._ctx.disable(self._ctx.BLEND)
+        self._ctx.blend_func = self._prev_blend_func
+
+    def render(self):
+        # Assumes the blend state is already bound, see bind_state
         self.update_buffers()
+        self._arena._style_box_geometry.render(self._arena._style_box_program, first=self._first_tri * 3, vertices=self._max_tri * 3)
+
+    def draw(self):
         prev_func = self._ctx.blend_func
-        self._ctx.blend_func = self._ctx.BLEND_DEFAULT
+        self._ctx.blend_func = BLEND_SEPARATE_ALPHA
         with self._ctx.enabled(self._ctx.BLEND):
-            self._style_box_geometry.render(self._style_box_program, vertices=self._max_tri * 3)
+            self.render()
         self._ctx.blend_func = prev_func
 
 
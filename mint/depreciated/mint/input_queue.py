@@ -0,0 +1,84 @@
+from __future__ import annotations
+from typing import Any, Callable
+
+_MOTION = 0
+_AXIS = 1
+_ACTION = 2
+
+
+class InputQueue:
+    """
+    Collects a frame's input so it can be dispatched in one batch.
+
+    Motion and axis events arriving between two actions are merged (the
+    deltas summed and the last position or value kept), while actions keep
+    their order. So a press, the motion after it, and the release still
+    dispatch in that order however many raw events arrived in between.
+    """
+
+    def __init__(self) -> None:
+        # Queued events as [kind, *args] lists so merging can write into them.
+        self._events: list[list[Any]] = []
+        # The events still open for merging, closed by the next action.
+        self._motion: list[Any] | None = None
+        self._axes: dict[str, list[Any]] = {}
+
+        # Running totals of the events received and the events actually dispatched.
+        self.raw_events: int = 0
+        self.dispatched_events: int = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def motion(self, x: float, y: float, dx: float, dy: float) -> None:
+        self.raw_events += 1
+        event = self._motion
+        if event is None:
+            self._motion = event = [_MOTION, x, y, dx, dy]
+            self._events.append(event)
+            return
+        event[1] = x
+        event[2] = y
+        event[3] += dx
+        event[4] += dy
+
+    def axis(self, axis: str, v: float, dv: float) -> None:
+        self.raw_events += 1
+        event = self._axes.get(axis)
+        if event is None:
+            self._axes[axis] = event = [_AXIS, axis, v, dv]
+            self._events.append(event)
+            return
+        event[2] = v
+        event[3] += dv
+
+    def action(self, action: str, pressed: bool) -> None:
+        self.raw_events += 1
+        self._events.append([_ACTION, action, pressed])
+        self._motion = None
+        self._axes.clear()
+
+    def clear(self) -> None:
+        self._events = []
+        self._motion = None
+        self._axes.clear()
+
+    def flush(
+            self,
+            on_motion: Callable[[float, float, float, float], Any],
+            on_axis: Callable[[str, float, float], Any],
+            on_action: Callable[[str, bool], Any]
+        ) -> int:
+        # Events queued by the callbacks wait for the next flush. Returns how many were dispatched.
+        events = self._events
+        self.clear()
+
+        for kind, *args in events:
+            if kind == _MOTION:
+                on_motion(*args)
+            elif kind == _AXIS:
+                on_axis(*args)
+            else:
+                on_action(*args)
+        self.dispatched_events += len(events)
+        return len(events)
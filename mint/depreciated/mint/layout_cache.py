@@ -0,0 +1,111 @@
+from __future__ import annotations
+from array import array
+from hashlib import blake2b
+from mmap import mmap, ACCESS_READ
+from pathlib import Path
+import os
+import struct
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import Element
+
+# magic, structure hash, frame width, frame height, element count
+_HEADER = struct.Struct('<8s16sddI')
+_MAGIC = b'MINTLAY1'
+_MISSING = object()
+
+
+def _walk(root: Element) -> list[Element]:
+    # Depth first, children in order, so the same tree always flattens the same way.
+    elements = []
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        elements.append(element)
+        stack.extend(reversed(element._children))
+    return elements
+
+
+def structure_hash(root: Element) -> bytes:
+    """
+    Hashes the shape of the tree, the element types and their data. Data is
+    hashed by repr with callables skipped, so event handlers don't matter but
+    anything without a stable repr (textures etc) just never hits the cache.
+
+    Only fields which differ from their class default are hashed per element,
+    the defaults themselves are hashed once per data type.
+    """
+    types: dict[type, str] = {}
+    parts = []
+    for element in _walk(root):
+        data = element._data
+        data_type = type(data)
+        if data_type not in types:
+            types[data_type] = repr([
+                (name, getattr(data_type, name)) for name in vars(data)
+                if hasattr(data_type, name) and not callable(getattr(data_type, name))
+            ])
+        parts.append(
+            f"{type(element).__qualname__}:{data_type.__qualname__}:{len(element._children)}:"
+            f"{[(name, value) for name, value in vars(data).items() if not callable(value) and value != getattr(data_type, name, _MISSING)]!r}"
+        )
+    parts.extend(types.values())
+    return blake2b(';'.join(parts).encode(), digest_size=16).digest()
+
+
+def save_layout(path: str | Path, root: Element, width: float, height: float) -> None:
+    # The root should already be laid out at the given frame size.
+    elements = _walk(root)
+    rects = array('d')
+    for element in elements:
+        rects.extend((element.left, element.bottom, element.width, element.height))
+
+    path = Path(path)
+    temp = path.with_suffix(path.suffix + '.tmp')
+    with open(temp, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, structure_hash(root), width, height, len(elements)))
+        file.write(rects.tobytes())
+    # Replaced in one go so a crash mid write never leaves a half written cache.
+    os.replace(temp, path)
+
+
+def load_layout(path: str | Path, root: Element, width: float, height: float) -> bool:
+    """
+    Writes the cached rects onto the tree if the file was saved from the same
+    structure at the same frame size. Returns whether it was a hit.
+    """
+    try:
+        file = open(path, 'rb')
+    except OSError:
+        return False
+
+    with file:
+        # Empty files can't be mapped, and anything shorter than the header is a miss anyway.
+        try:
+            if os.fstat(file.fileno()).st_size < _HEADER.size:
+                return False
+            data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        with data:
+            # The header and length are checked before any rects are read.
+            magic, digest, cached_width, cached_height, count = _HEADER.unpack_from(data)
+            if magic != _MAGIC or (cached_width, cached_height) != (width, height):
+                return False
+            if len(data) != _HEADER.size + count * 4 * 8:
+                return False
+
+            elements = _walk(root)
+            if len(elements) != count or digest != structure_hash(root):
+                return False
+
+            rects = array('d')
+            rects.frombytes(data[_HEADER.size:])
+
+    for idx, element in enumerate(elements):
+        offset = idx * 4
+        element.left, element.bottom, element.width, element.height = rects[offset:offset + 4]
+        element._has_changed_layout = False
+    return True
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Protocol
+
+
+class UploadTarget(Protocol):
+    # Matches the parts of arcade.gl.Buffer the arena needs.
+    @property
+    def size(self) -> int: ...
+
+    def orphan(self, size: int = -1, double: bool = False) -> None: ...
+
+    def write(self, data: bytes | memoryview, offset: int = 0) -> None: ...
+
+
+class DirtyArray:
+    """
+    A growable typed array that tracks the range of values written since the
+    last upload, so only that range is written to the GPU buffer.
+
+    Ranges are in values, not strides. A stride is the number of values in
+    one item (3 for a vertex position, 4 for an RGBA colour, etc).
+    """
+
+    def __init__(self, typecode: str, stride: int, reserve: int) -> None:
+        self.data: array = array(typecode, bytes(array(typecode).itemsize * stride * reserve))
+        self._stride: int = stride
+
+        # The half open range of values written since the last upload
+        self._lo: int = 0
+        self._hi: int = 0
+
+    @property
+    def stride(self) -> int:
+        return self._stride
+
+    @property
+    def capacity(self) -> int:
+        return len(self.data) // self._stride
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) * self.data.itemsize
+
+    def is_dirty(self) -> bool:
+        return self._lo < self._hi
+
+    def grow(self, capacity: int) -> None:
+        # Extending in place means anyone holding self.data keeps a valid reference.
+        if capacity <= self.capacity:
+            return
+        extra = (capacity - self.capacity) * self._stride
+        self.data.extend(array(self.data.typecode, bytes(self.data.itemsize * extra)))
+
+    def mark(self, start: int, stop: int) -> None:
+        if start >= stop:
+            return
+        if self._lo >= self._hi:
+            self._lo = start
+            self._hi = stop
+            return
+        self._lo = min(self._lo, start)
+        self._hi = max(self._hi, stop)
+
+    def mark_all(self) -> None:
+        self._lo = 0
+        self._hi = len(self.data)
+
+    def upload(self, buffer: UploadTarget) -> int:
+        """
+        Write the dirty range to the buffer, reallocating it if the array has
+        outgrown it. Returns the number of bytes written.
+        """
+        if buffer.size < self.nbytes:
+            buffer.orphan(size=self.nbytes)
+            self.mark_all()
+
+        if self._lo >= self._hi:
+            return 0
+
+        itemsize = self.data.itemsize
+        view = memoryview(self.data)[self._lo:self._hi]
+        buffer.write(view, offset=self._lo * itemsize)
+        written = view.nbytes
+
+        self._lo = self._hi = 0
+        return written
+
+
+class RangeAllocator:
+    """
+    First fit allocator of contiguous ranges in [0, capacity). When no free
+    range is large enough the capacity grows, the owner is expected to grow
+    its arrays to match.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity: int = capacity
+        # Free ranges as sorted, non-touching (start, length) pairs.
+        self._free: list[tuple[int, int]] = [(0, capacity)] if capacity > 0 else []
+        self._used: int = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    def allocate(self, count: int) -> int:
+        if count <= 0:
+            return 0
+
+        for idx, (start, length) in enumerate(self._free):
+            if length < count:
+                continue
+            if length == count:
+                del self._free[idx]
+            else:
+                self._free[idx] = (start + count, length - count)
+            self._used += count
+            return start
+
+        # Nothing fits so grow, reusing the trailing free range if there is one.
+        if self._free and self._free[-1][0] + self._free[-1][1] == self._capacity:
+            start = self._free.pop()[0]
+        else:
+            start = self._capacity
+        self._capacity = max(2 * self._capacity, start + count)
+        if start + count < self._capacity:
+            self._free.append((start + count, self._capacity - start - count))
+        self._used += count
+        return start
+
+    def free(self, start: int, count: int) -> None:
+        if count <= 0:
+            return
+        self._used -= count
+
+        idx = bisect_left(self._free, (start, 0))
+        end = start + count
+
+        # Merge with the following range if they touch
+        if idx < len(self._free) and self._free[idx][0] == end:
+            end = end + self._free[idx][1]
+            del self._free[idx]
+
+        # Merge with the preceding range if they touch
+        if idx > 0 and self._free[idx - 1][0] + self._free[idx - 1][1] == start:
+            start = self._free[idx - 1][0]
+            del self._free[idx - 1]
+            idx -= 1
+
+        self._free.insert(idx, (start, end - start))
+
+    def clear(self) -> None:
+        self._free = [(0, self._capacity)] if self._capacity > 0 else []
+        self._used = 0
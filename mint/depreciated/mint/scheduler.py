@@ -0,0 +1,126 @@
+from __future__ import annotations
+from enum import IntEnum
+from heapq import heappush, heappop
+from inspect import isgeneratorfunction
+from time import perf_counter
+from typing import Any, Callable, Iterator
+
+
+class JobPriority(IntEnum):
+    # Lower runs first
+    VISIBLE = 0  # Work the player will see this frame
+    NEAR = 1  # Work the player is likely to see soon (just off screen, next page, etc)
+    BACKGROUND = 2  # Everything else
+
+
+class Job:
+    """
+    A resumable piece of work. The work is an iterator which does a slice
+    of the job each step (usually a generator yielding between slices).
+    """
+
+    def __init__(self, work: Iterator[Any], priority: int, name: str = "") -> None:
+        self.name: str = name
+        self.priority: int = priority
+        self._work: Iterator[Any] = work
+        self.cancelled: bool = False
+        self.done: bool = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def step(self) -> bool:
+        # Returns whether the job has more work left.
+        try:
+            next(self._work)
+        except StopIteration:
+            self.done = True
+            return False
+        return True
+
+
+def _once(work: Callable[[], Any]) -> Iterator[None]:
+    # Finishes on its first step rather than needing a second to find it's done.
+    work()
+    return
+    yield
+
+
+class Scheduler:
+    """
+    Runs queued jobs a step at a time until the frame's time budget is spent,
+    highest priority first and in the order they were queued within a priority.
+
+    A step only starts if the last one would still fit, but at least one step
+    runs every frame so work always progresses. A step taking longer than
+    expected overruns the budget, which is counted and passed to on_overrun.
+    """
+
+    def __init__(self, budget: float = 0.004, on_overrun: Callable[[float, float], Any] | None = None) -> None:
+        # Seconds of work allowed per frame.
+        self.budget: float = budget
+        # Called with (elapsed, budget) whenever a frame's work runs over.
+        self.on_overrun: Callable[[float, float], Any] | None = on_overrun
+
+        self._queue: list[tuple[int, int, Job]] = []
+        self._sequence: int = 0
+
+        # Counters for the last frame and running totals.
+        self.last_elapsed: float = 0.0
+        self.last_steps: int = 0
+        self.overruns: int = 0
+        self.completed: int = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, work: Iterator[Any] | Callable[[], Any], priority: int = JobPriority.VISIBLE, name: str = "") -> Job:
+        # A generator function is called for its generator, any other callable
+        # is treated as a job with a single step.
+        if isgeneratorfunction(work):
+            work = work()
+        elif callable(work) and not hasattr(work, '__next__'):
+            work = _once(work)
+        job = Job(work, priority, name)
+        heappush(self._queue, (priority, self._sequence, job))
+        self._sequence += 1
+        return job
+
+    def clear(self) -> None:
+        for _, _, job in self._queue:
+            job.cancel()
+        self._queue.clear()
+
+    def run(self, budget: float | None = None) -> float:
+        # Returns the seconds spent.
+        budget = self.budget if budget is None else budget
+        queue = self._queue
+        start = perf_counter()
+        deadline = start + budget
+        steps = 0
+        # Used to guess whether the next step still fits in the budget.
+        step_time = 0.0
+
+        while queue:
+            job = queue[0][2]
+            if job.cancelled:
+                heappop(queue)
+                continue
+
+            now = perf_counter()
+            if steps and now + step_time > deadline:
+                break
+
+            steps += 1
+            if not job.step():
+                heappop(queue)
+                self.completed += 1
+            step_time = perf_counter() - now
+
+        elapsed = self.last_elapsed = perf_counter() - start
+        self.last_steps = steps
+        if elapsed > budget:
+            self.overruns += 1
+            if self.on_overrun is not None:
+                self.on_overrun(elapsed, budget)
+        return elapsed
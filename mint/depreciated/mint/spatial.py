@@ -0,0 +1,113 @@
+from __future__ import annotations
+from math import isfinite
+from typing import Hashable, Iterator
+
+# Rects are (left, bottom, width, height) in tree units
+type SpatialRect = tuple[float, float, float, float]
+
+
+class SpatialHash:
+    """
+    A uniform grid of cells over rects, so finding the rects under a point
+    only has to test the few rects sharing that point's cell rather than
+    every rect.
+
+    Rects spanning more than large_cells cells (panels, backgrounds, the
+    root) are kept in a separate list which every query checks, so they
+    don't fill the grid.
+    """
+
+    def __init__(self, cell_size: float = 32.0, large_cells: int = 256) -> None:
+        self._cell_size: float = cell_size
+        self._large_cells: int = large_cells
+        # The keys overlapping each occupied cell with their rects, so queries don't have to look them up.
+        self._cells: dict[tuple[int, int], dict[Hashable, SpatialRect]] = {}
+        # The rect of every key in the hash.
+        self._rects: dict[Hashable, SpatialRect] = {}
+        # The keys too large to store per cell.
+        self._large: dict[Hashable, SpatialRect] = {}
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._rects
+
+    @property
+    def cell_size(self) -> float:
+        return self._cell_size
+
+    def rect(self, key: Hashable) -> SpatialRect | None:
+        return self._rects.get(key)
+
+    def _cells_of(self, rect: SpatialRect) -> tuple[int, int, int, int]:
+        left, bottom, width, height = rect
+        size = self._cell_size
+        return (
+            int(left // size), int((left + width) // size),
+            int(bottom // size), int((bottom + height) // size)
+        )
+
+    def insert(self, key: Hashable, rect: SpatialRect) -> None:
+        # Also used to move a key, which is skipped if the rect hasn't changed.
+        old = self._rects.get(key)
+        if old == rect:
+            return
+        if old is not None:
+            self.remove(key)
+
+        left, bottom, width, height = rect
+        self._rects[key] = rect
+        if width <= 0.0 or height <= 0.0:
+            # Can't contain a point so it isn't put in any cell
+            return
+
+        if not (isfinite(left) and isfinite(bottom) and isfinite(left + width) and isfinite(bottom + height)):
+            self._large[key] = rect
+            return
+
+        x_lo, x_hi, y_lo, y_hi = self._cells_of(rect)
+        if (x_hi - x_lo + 1) * (y_hi - y_lo + 1) > self._large_cells:
+            self._large[key] = rect
+            return
+
+        cells = self._cells
+        for x in range(x_lo, x_hi + 1):
+            for y in range(y_lo, y_hi + 1):
+                if (x, y) in cells:
+                    cells[x, y][key] = rect
+                else:
+                    cells[x, y] = {key: rect}
+
+    def remove(self, key: Hashable) -> None:
+        rect = self._rects.pop(key, None)
+        if rect is None:
+            return
+        if key in self._large:
+            del self._large[key]
+            return
+        if rect[2] <= 0.0 or rect[3] <= 0.0:
+            return
+
+        x_lo, x_hi, y_lo, y_hi = self._cells_of(rect)
+        cells = self._cells
+        for x in range(x_lo, x_hi + 1):
+            for y in range(y_lo, y_hi + 1):
+                cell = cells[x, y]
+                del cell[key]
+                if not cell:
+                    del cells[x, y]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._rects.clear()
+        self._large.clear()
+
+    def query_point(self, x: float, y: float) -> Iterator[Hashable]:
+        # Every key whose rect contains the point, in no particular order.
+        size = self._cell_size
+        cell = self._cells.get((int(x // size), int(y // size)))
+        for rects in (self._large, cell) if cell else (self._large,):
+            for key, (left, bottom, width, height) in rects.items():
+                if left <= x < left + width and bottom <= y < bottom + height:
+                    yield key
@@ -0,0 +1,64 @@
+from __future__ import annotations
+from collections import deque
+from math import ceil
+from time import perf_counter
+
+
+class TreeStats:
+    """
+    Per frame timings and counters kept over the last few frames.
+
+    Values added during a frame are summed, and end_frame pushes them into
+    each metric's history. A metric which saw nothing that frame records 0
+    so the percentiles are always per frame. Timings are in seconds.
+    """
+
+    def __init__(self, frames: int = 120) -> None:
+        self._frames: int = frames
+        self._history: dict[str, deque[float]] = {}
+        self._current: dict[str, float] = {}
+        self.frame_count: int = 0
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(self._history)
+
+    def add(self, name: str, value: float) -> None:
+        self._current[name] = self._current.get(name, 0.0) + value
+
+    def lap(self, name: str, start: float) -> float:
+        # Adds the time since start and returns now, so timing a run of phases is one call each.
+        now = perf_counter()
+        self._current[name] = self._current.get(name, 0.0) + (now - start)
+        return now
+
+    def end_frame(self) -> None:
+        current = self._current
+        for name, history in self._history.items():
+            history.append(current.pop(name, 0.0))
+        for name, value in current.items():
+            self._history[name] = history = deque(maxlen=self._frames)
+            history.append(value)
+        current.clear()
+        self.frame_count += 1
+
+    def clear(self) -> None:
+        self._history.clear()
+        self._current.clear()
+        self.frame_count = 0
+
+    def last(self, name: str) -> float:
+        history = self._history.get(name)
+        return history[-1] if history else 0.0
+
+    def percentile(self, name: str, percent: float) -> float:
+        # Nearest rank over the kept frames.
+        history = self._history.get(name)
+        if not history:
+            return 0.0
+        ordered = sorted(history)
+        rank = max(0, min(len(ordered) - 1, ceil(percent / 100.0 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def summary(self, percents: tuple[float, ...] = (50.0, 95.0, 99.0)) -> dict[str, tuple[float, ...]]:
+        return {name: tuple(self.percentile(name, percent) for percent in percents) for name in self._history}
@@ -0,0 +1,35 @@
+import os
+
+# Has to be set before arcade is imported anywhere.
+os.environ.setdefault('ARCADE_HEADLESS', '1')
+
+import arcade
+import pytest
+
+from charm.lib.mint.core import Tree
+
+
+@pytest.fixture(scope='session', autouse=True)
+def window():
+    # Trees need a window for their camera and context.
+    window = arcade.Window(1280, 720, visible=False)
+    yield window
+    window.close()
+
+
+@pytest.fixture
+def tree() -> Tree:
+    tree = Tree()
+    tree.update_viewport(1280, 720)
+    return tree
+
+
+def rects(root) -> list[tuple[float, float, float, float]]:
+    # Every element's rect, depth first.
+    out = []
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        out.append((element.left, element.bottom, element.width, element.height))
+        stack.extend(reversed(element._children))
+    return out
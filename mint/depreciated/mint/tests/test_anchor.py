@@ -0,0 +1,65 @@
+import pytest
+
+from charm.lib.mint.core import AnchorElement, AnchorPresets, AxisAnchor, ElementData, Offsets
+
+
+def _anchor(anchors=AnchorPresets.FULL, offsets: Offsets = Offsets(), padding: Offsets = Offsets()) -> AnchorElement:
+    return AnchorElement(
+        left_anchor=anchors.left, right_anchor=anchors.right, bottom_anchor=anchors.bottom, top_anchor=anchors.top,
+        left_offset=offsets.left, right_offset=offsets.right, bottom_offset=offsets.bottom, top_offset=offsets.top,
+        padding=padding
+    )
+
+
+def _laid_out(tree, anchor: AnchorElement, *children: ElementData, flat: bool = False):
+    # The anchor is the root, so it fills the 1280x720 tree.
+    root = anchor.create()
+    placed = [child.create(root) for child in children]
+    tree.set_root(root)
+    tree.use_flat_layout(flat)
+    tree.layout()
+    return [(child.left, child.bottom, child.width, child.height) for child in placed]
+
+
+@pytest.mark.parametrize('flat', (False, True))
+def test_anchors_are_fractions_of_the_padded_rect(tree, flat):
+    # The padded rect is 1240x660 from (10, 20), the region is the middle half of it
+    # horizontally and a 20 unit band through its vertical centre.
+    anchors = AnchorPresets.HORIZONTAL._replace(left=0.25, right=0.75)
+    anchor = _anchor(anchors, Offsets(bottom=-10.0, top=10.0), padding=Offsets(10.0, 30.0, 20.0, 40.0))
+    placed, = _laid_out(tree, anchor, ElementData(), flat=flat)
+    assert placed == pytest.approx((320.0, 340.0, 620.0, 20.0))
+
+
+@pytest.mark.parametrize('flat', (False, True))
+def test_equal_anchors_make_a_fixed_size_region(tree, flat):
+    anchor = _anchor(AnchorPresets.TOP_RIGHT, Offsets(-100.0, -20.0, -50.0, -10.0))
+    fills, overflows = _laid_out(
+        tree, anchor, ElementData(), ElementData(minimum_width=120.0, minimum_height=60.0), flat=flat
+    )
+    assert fills == pytest.approx((1180.0, 670.0, 80.0, 40.0))
+    # A child bigger than the region keeps its minimum size and is centred on the region.
+    assert overflows == pytest.approx((1160.0, 660.0, 120.0, 60.0))
+
+
+@pytest.mark.parametrize('horizontal, vertical, expected', [
+    (AxisAnchor.LEFT, AxisAnchor.BOTTOM, (590.0, 335.0)),
+    (AxisAnchor.CENTER, AxisAnchor.CENTER, (630.0, 355.0)),
+    (AxisAnchor.RIGHT, AxisAnchor.TOP, (670.0, 375.0)),
+])
+def test_fixed_children_align_within_the_region(tree, horizontal, vertical, expected):
+    anchor = _anchor(AnchorPresets.CENTER, Offsets(-50.0, 50.0, -25.0, 25.0))
+    child = ElementData(
+        minimum_width=20.0, minimum_height=10.0, priority=0,
+        horizontal_alignmnet=horizontal, vertical_alignment=vertical
+    )
+    placed, = _laid_out(tree, anchor, child)
+    assert placed == pytest.approx((*expected, 20.0, 10.0))
+
+
+def test_crossed_anchors_collapse_the_region(tree):
+    # The right edge is left of the left edge, so the region has no width rather than a negative one.
+    anchors = AnchorPresets.FULL._replace(left=0.75, right=0.25)
+    placed, = _laid_out(tree, _anchor(anchors), ElementData())
+    assert placed[2] == 0.0
+    assert placed[3] == pytest.approx(720.0)
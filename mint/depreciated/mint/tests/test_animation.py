@@ -0,0 +1,43 @@
+import gc
+
+from charm.lib.mint.animation import Animator, Easing
+from charm.lib.mint.core import ElementData, StyleBoxElement
+
+
+def test_paint_only_tween_does_not_relayout(tree):
+    root = ElementData().create()
+    box = StyleBoxElement().create()
+    root.add_child(box)
+    tree.set_root(root)
+    tree.layout()
+
+    tree.animator.tween(box, 'color', (0, 0, 0, 0), 1.0, Easing.LINEAR)
+    tree.animator.step(0.5)
+    assert box._data.color == (128, 128, 128, 128)
+    assert not tree._tree_stale and not tree._dirty_layouts
+
+
+def test_layout_tween_relays_out(tree):
+    root = ElementData().create()
+    box = StyleBoxElement(priority=0).create()
+    root.add_child(box)
+    tree.set_root(root)
+    tree.layout()
+
+    tree.animator.tween(box, 'minimum_width', 100.0, 1.0, Easing.LINEAR)
+    tree.animator.step(1.0)
+    tree.layout()
+    assert box.width == 100.0
+
+
+def test_collected_elements_are_dropped():
+    animator = Animator()
+    element = ElementData().create()
+    animator.tween(element, 'minimum_width', 100.0, 1.0)
+    animator.step(0.1)
+    assert len(animator) == 1
+
+    del element
+    gc.collect()
+    animator.step(0.1)
+    assert len(animator) == 0
@@ -0,0 +1,151 @@
+from typing import Any, Callable
+
+from charm.lib.mint.compositor import LayerArea, LayerCache, LayerCompositor
+from charm.lib.mint.core import ArrayElement, Element, ElementData, Mint, Renderable
+
+
+class _Backend:
+    # Stands in for the graphics library, recording what the caches ask of it.
+
+    def __init__(self) -> None:
+        self.created: list[tuple[int, int]] = []
+        self.released: list[Any] = []
+        self.rendered: list[tuple[Any, LayerArea]] = []
+        self.drawn: list[tuple[Any, LayerArea]] = []
+
+    def create_target(self, width: int, height: int) -> Any:
+        self.created.append((width, height))
+        return len(self.created), width, height
+
+    def release_target(self, target: Any) -> None:
+        self.released.append(target)
+
+    def render_to_target(self, target: Any, area: LayerArea, draw: Callable[[], None]) -> None:
+        self.rendered.append((target, area))
+        draw()
+
+    def draw_target(self, target: Any, area: LayerArea) -> None:
+        self.drawn.append((target, area))
+
+
+class _Items(Renderable):
+
+    def __init__(self) -> None:
+        self.items: list[Any] = []
+
+    def add(self, item: Any) -> None:
+        self.items.append(item)
+        self.invalidate()
+
+    def remove(self, item: Any) -> None:
+        if item in self.items:
+            self.items.remove(item)
+            self.invalidate()
+
+    def is_empty(self) -> bool:
+        return not self.items
+
+    def clear(self) -> None:
+        self.items.clear()
+
+
+Mint.register_renderable('test_cached_layers', _Items)
+
+
+class _Drawn(Element[ElementData]):
+
+    def __init__(self, data: ElementData | None = None) -> None:
+        super().__init__(data or ElementData(minimum_width=10.0, minimum_height=10.0))
+
+    def __renderables__(self):
+        return (('test_cached_layers', self),)
+
+
+def _cached_tree(tree):
+    # A fixed size cached panel after a sibling in a row, so the sibling can push it along.
+    backend = _Backend()
+    tree._offscreen = backend
+    root = ElementData().create()
+    row = ArrayElement(priority=0).create(root)
+    sibling = ElementData(minimum_width=20.0, minimum_height=20.0, priority=0).create(row)
+    panel = ElementData(cache_layer=True, minimum_width=100.0, maximum_width=100.0, minimum_height=50.0, maximum_height=50.0).create(row)
+    panel.add_child(_Drawn())
+    tree.set_root(root)
+    tree.draw()
+    return backend, sibling, panel, tree._layer_caches[panel.uid]
+
+
+def test_unchanged_frames_reuse_the_target(tree):
+    backend, _, panel, cache = _cached_tree(tree)
+    assert cache.renders == 1
+    tree.draw()
+    tree.draw()
+    assert cache.renders == 1
+    assert cache.reuses == 2
+    assert len(backend.created) == 1
+    assert len(backend.drawn) == 3
+
+
+def test_content_change_renders_again(tree):
+    _, _, panel, cache = _cached_tree(tree)
+    panel.add_child(_Drawn())
+    tree.draw()
+    assert cache.renders == 2
+
+    # Layout changes inside the cache render it again too.
+    panel._children[0].update_data(minimum_width=30.0)
+    tree.draw()
+    assert cache.renders == 3
+
+
+def test_moving_only_moves_the_quad(tree):
+    backend, sibling, panel, cache = _cached_tree(tree)
+    left = panel.left
+    sibling.update_data(minimum_width=60.0)
+    tree.draw()
+
+    assert panel.left != left
+    assert cache.renders == 1
+    assert backend.drawn[-1][1][0] == panel.left
+    assert len(backend.created) == 1
+
+
+def test_resizing_and_rescaling_render_again(tree):
+    backend, _, panel, cache = _cached_tree(tree)
+    panel.update_data(minimum_width=120.0, maximum_width=120.0)
+    tree.draw()
+    assert cache.renders == 2
+    assert backend.created[-1] == (120, 50)
+    assert backend.released
+
+    cache.set_scale(2.0)
+    tree.draw()
+    assert cache.renders == 3
+    assert backend.created[-1] == (240, 100)
+
+
+def test_nested_cache_dirties_its_parent():
+    backend = _Backend()
+    compositor = LayerCompositor()
+    outer = LayerCache('outer', 0, backend, compositor)
+    compositor.add(outer.name, 0, outer)
+    inner = LayerCache('inner', 1, backend, outer.compositor)
+    outer.compositor.add(inner.name, 1, inner)
+    outer.set_area(0.0, 0.0, 100.0, 100.0)
+    inner.set_area(10.0, 10.0, 20.0, 20.0)
+
+    compositor.draw()
+    assert (outer.renders, inner.renders) == (1, 1)
+    compositor.draw()
+    assert (outer.renders, inner.renders) == (1, 1)
+
+    inner.mark_dirty()
+    compositor.draw()
+    assert (outer.renders, inner.renders) == (2, 2)
+
+
+def test_release_frees_the_target(tree):
+    backend, _, panel, cache = _cached_tree(tree)
+    target = cache._target
+    panel.parent.remove_child(panel)
+    assert backend.released == [target]
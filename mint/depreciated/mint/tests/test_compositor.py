@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import Any
+
+from charm.lib.mint.core import Element, ElementData, Mint, Renderable
+
+
+class _Recording(Renderable):
+    # Keeps its items in the order they would draw.
+
+    def __init__(self) -> None:
+        self.items: list[Any] = []
+
+    def add(self, item: Any) -> None:
+        self.items.append(item)
+
+    def remove(self, item: Any) -> None:
+        if item in self.items:
+            self.items.remove(item)
+
+    def is_empty(self) -> bool:
+        return not self.items
+
+    def clear(self) -> None:
+        self.items.clear()
+
+
+class _Ranged(_Recording):
+    # Records the arena it was made with.
+
+    def __init__(self, arena: list[_Ranged] | None = None) -> None:
+        super().__init__()
+        self.arena = arena
+        if arena is not None:
+            arena.append(self)
+
+    @classmethod
+    def create_arena(cls) -> list[_Ranged]:
+        return []
+
+
+Mint.register_renderable('test_compositor_a', _Recording)
+Mint.register_renderable('test_compositor_b', _Recording)
+Mint.register_renderable('test_compositor_ranged', _Ranged)
+
+
+class _Drawn(Element[ElementData]):
+    # Hands the tree one item for the named renderable, the item records the element's depth.
+
+    def __init__(self, name: str) -> None:
+        super().__init__(ElementData())
+        self.name = name
+        self.item = self
+
+    def __renderables__(self):
+        return ((self.name, self.item),)
+
+
+def _chain(length: int, name: str = 'test_compositor_a') -> list[_Drawn]:
+    elements = [_Drawn(name) for _ in range(length)]
+    for parent, child in zip(elements, elements[1:]):
+        parent.add_child(child)
+    return elements
+
+
+def _drawn(tree) -> list[list[int]]:
+    # The depths of the items in each draw, in draw order.
+    compositor = tree._compositor
+    compositor.record()
+    draws: list[list[int]] = []
+    previous = None
+    for renderable in compositor._order:
+        if renderable is previous or renderable.is_empty():
+            continue
+        previous = renderable
+        draws.append([item._depth for item in renderable.items])
+    return draws
+
+
+def test_one_renderable_at_every_depth_draws_once(tree):
+    chain = _chain(30)
+    tree.set_root(chain[0])
+
+    assert _drawn(tree) == [list(range(30))]
+    assert tree._compositor.draw_calls == 1
+    assert len(tree._compositor.renderables()) == 1
+
+
+def test_another_renderable_between_splits_the_run(tree):
+    chain = _chain(10)
+    tree.set_root(chain[0])
+    chain[4].add_child(_Drawn('test_compositor_b'))
+
+    assert _drawn(tree) == [list(range(6)), [5], list(range(6, 10))]
+    assert tree._compositor.draw_calls == 3
+
+
+def test_shallower_items_still_draw_beneath_deeper_ones(tree):
+    chain = _chain(5)
+    tree.set_root(chain[0])
+    chain[0].add_child(_Drawn('test_compositor_a'))
+
+    draws = _drawn(tree)
+    depths = [depth for draw in draws for depth in draw]
+    assert depths == sorted(depths)
+    assert len(draws) == 2
+
+
+def test_release_hands_back_shared_renderables_once(tree):
+    chain = _chain(10)
+    tree.set_root(chain[0])
+    chain[4].add_child(_Drawn('test_compositor_b'))
+
+    released = tree._compositor.release()
+    assert len(released) == 3
+    assert len({id(renderable) for _, renderable in released}) == 3
+
+
+def test_mint_trees_share_one_arena(tree):
+    mint = Mint()
+    other = type(tree)()
+    other.update_viewport(1280, 720)
+    mint.add_tree(tree)
+    mint.add_tree(other, 1)
+    tree.set_root(_Drawn('test_compositor_ranged'))
+    other.set_root(_Drawn('test_compositor_ranged'))
+
+    first, = tree._compositor.renderables()
+    second, = other._compositor.renderables()
+    assert first is not second
+    assert first.arena is second.arena == [first, second]
+
+    # Types without an arena are made as before.
+    tree._root.add_child(_Drawn('test_compositor_a'))
+    assert mint._arenas['test_compositor_a'] is None
+
+    # A removed tree's renderable is pooled and keeps its place in the arena.
+    mint.remove_tree(other)
+    third = type(tree)()
+    mint.add_tree(third)
+    third.set_root(_Drawn('test_compositor_ranged'))
+    assert list(third._compositor.renderables()) == [second]
+    assert len(first.arena) == 2
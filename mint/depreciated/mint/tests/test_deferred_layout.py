@@ -0,0 +1,101 @@
+import random
+
+from charm.lib.mint.core import ElementData
+from charm.lib.mint.scheduler import Scheduler
+
+from conftest import rects
+from test_incremental_layout import _random_tree
+
+
+def test_generator_function_runs_as_steps():
+    steps = []
+
+    def work():
+        for index in range(3):
+            steps.append(index)
+            yield
+
+    scheduler = Scheduler()
+    job = scheduler.schedule(work)
+    while len(scheduler):
+        scheduler.run(budget=0.0)
+    assert steps == [0, 1, 2]
+    assert job.done
+
+
+def test_plain_callable_runs_once():
+    calls = []
+    scheduler = Scheduler()
+    scheduler.schedule(lambda: calls.append(1))
+    scheduler.run()
+    assert calls == [1]
+    assert not len(scheduler)
+
+
+def test_stale_tree_lays_out_over_frames(tree):
+    root, _ = _random_tree(random.Random(3), 200)
+    tree.set_root(root)
+    tree.defer_layout()
+    tree.set_frame_budget(0.0)
+
+    tree.draw()
+    # Draw doesn't lay out a stale tree when layout is deferred.
+    assert all(rect == (0.0, 0.0, 0.0, 0.0) for rect in rects(root)[1:])
+
+    frames = 0
+    tree.update(0.0)
+    while tree._full_layout is not None:
+        tree.update(0.0)
+        frames += 1
+    # A zero budget still runs one step a frame, so a big tree takes several.
+    assert frames > 1
+    laid_out = rects(root)
+
+    tree._tree_stale = True
+    tree.layout()
+    assert laid_out == rects(root)
+
+
+def test_changes_during_full_layout_are_laid_out(tree):
+    root = ElementData().create()
+    for _ in range(3):
+        root.add_child(ElementData(minimum_width=50.0, minimum_height=50.0).create())
+    # A fixed size element is a layout boundary, so the change below only queues it.
+    boundary = ElementData(minimum_width=200.0, maximum_width=200.0, minimum_height=200.0, maximum_height=200.0).create()
+    leaf = ElementData(minimum_width=10.0, minimum_height=10.0, priority=0).create()
+    boundary.add_child(leaf)
+    root.add_child(boundary)
+    tree.set_root(root)
+    tree.defer_layout()
+    tree.set_frame_budget(0.0)
+
+    # Both measure passes are done but the tree isn't placed yet.
+    for _ in range(2 * len(root._children) + 3):
+        tree.update(0.0)
+    assert tree._full_layout is not None
+    leaf.update_data(minimum_width=40.0, minimum_height=40.0)
+    for _ in range(100):
+        tree.update(0.0)
+    assert leaf.width == 40.0
+    laid_out = rects(root)
+
+    tree._tree_stale = True
+    tree.layout()
+    assert laid_out == rects(root)
+
+
+def test_layout_finishes_running_job(tree):
+    root, _ = _random_tree(random.Random(7), 100)
+    tree.set_root(root)
+    tree.defer_layout()
+    tree.set_frame_budget(0.0)
+    tree.update(0.0)
+    assert tree._full_layout is not None
+
+    tree.layout()
+    assert tree._full_layout is None
+    laid_out = rects(root)
+
+    tree._tree_stale = True
+    tree.layout()
+    assert laid_out == rects(root)
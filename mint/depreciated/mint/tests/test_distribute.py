@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from charm.lib.mint import vector_layout
+from charm.lib.mint.flat_layout import _EPSILON, distribute
+
+_INF = float('inf')
+
+
+def _reference_distribute(sizes, minimums, maximums, priorities, free):
+    # The solver distribute replaced, raising the lowest levelled children a level at a time.
+    # It never finishes growing a child with an infinite priority, so it's only given finite ones.
+    active = [idx for idx in range(len(sizes)) if priorities[idx] > 0]
+    growing = free > 0
+
+    while active and abs(free) > _EPSILON:
+        levels = [sizes[idx] / priorities[idx] for idx in active]
+        level = min(levels) if growing else max(levels)
+
+        at_level = []
+        next_level = _INF if growing else -_INF
+        for idx, child_level in zip(active, levels):
+            if abs(child_level - level) <= _EPSILON * max(1.0, abs(level)):
+                at_level.append(idx)
+            elif growing:
+                next_level = min(next_level, child_level)
+            else:
+                next_level = max(next_level, child_level)
+
+        step = free / sum(priorities[idx] for idx in at_level)
+        step = min(step, next_level - level) if growing else max(step, next_level - level)
+
+        for idx in at_level:
+            size = sizes[idx]
+            target = min(maximums[idx], max(minimums[idx], size + step * priorities[idx]))
+            free -= target - size
+            sizes[idx] = target
+            if (growing and target >= maximums[idx]) or (not growing and target <= minimums[idx]):
+                active.remove(idx)
+
+    return free
+
+
+def _random_case(rng: random.Random, priorities: tuple[float, ...]):
+    count = rng.randint(1, 40)
+    minimums = [rng.choice((0.0, rng.uniform(0.0, 50.0))) for _ in range(count)]
+    maximums = [rng.choice((_INF, minimum + rng.uniform(0.0, 100.0))) for minimum in minimums]
+    sizes = [rng.uniform(minimum, min(maximum, minimum + 60.0)) for minimum, maximum in zip(minimums, maximums)]
+    return sizes, minimums, maximums, [rng.choice(priorities) for _ in range(count)], rng.uniform(-400.0, 400.0)
+
+
+def _close(a: float, b: float) -> bool:
+    return a == b or abs(a - b) <= 1e-9 * max(1.0, abs(a), abs(b))
+
+
+def test_matches_reference_solver():
+    rng = random.Random(48)
+    for _ in range(2000):
+        sizes, minimums, maximums, priorities, free = _random_case(rng, (0.0, 0.5, 1.0, 2.0, 3.0))
+        expected = list(sizes)
+        expected_free = _reference_distribute(expected, minimums, maximums, priorities, free)
+        left = distribute(sizes, minimums, maximums, priorities, free)
+        assert _close(left, expected_free)
+        assert all(_close(size, other) for size, other in zip(sizes, expected))
+
+
+@pytest.mark.skipif(not vector_layout.AVAILABLE, reason="numpy is not installed")
+def test_scalar_and_vectorized_agree():
+    rng = random.Random(49)
+    for _ in range(2000):
+        sizes, minimums, maximums, priorities, free = _random_case(rng, (0.0, 0.5, 1.0, 2.0, _INF))
+        vectorized, vectorized_free = vector_layout.distribute(sizes, minimums, maximums, priorities, free)
+        left = distribute(sizes, minimums, maximums, priorities, free)
+        assert _close(left, vectorized_free)
+        assert all(_close(size, other) for size, other in zip(sizes, vectorized.tolist()))
+
+
+def test_infinite_priority_and_maximum_stays_finite():
+    sizes = [10.0, 10.0]
+    left = distribute(sizes, [0.0, 0.0], [_INF, _INF], [_INF, 1.0], 100.0)
+    assert sizes == [10.0, 110.0]
+    assert left == 0.0
+
+    if vector_layout.AVAILABLE:
+        vectorized, vectorized_free = vector_layout.distribute([10.0, 10.0], [0.0, 0.0], [_INF, _INF], [_INF, 1.0], 100.0)
+        assert vectorized.tolist() == sizes
+        assert vectorized_free == left
@@ -0,0 +1,99 @@
+import random
+import sys
+
+import pytest
+
+from charm.lib.mint.core import AnchorElement, ElementData, Offsets, VirtualArrayElement
+from charm.lib.mint.flat_layout import LayoutKind
+
+from conftest import rects
+from test_incremental_layout import _random_data
+
+
+def _custom_data(rng: random.Random) -> ElementData:
+    if rng.random() < 0.5:
+        lo, hi = sorted(rng.random() for _ in range(2))
+        return AnchorElement(
+            left_anchor=lo, right_anchor=hi, bottom_anchor=lo, top_anchor=hi,
+            left_offset=rng.uniform(-5.0, 5.0), right_offset=rng.uniform(-5.0, 5.0),
+            bottom_offset=rng.uniform(-5.0, 5.0), top_offset=rng.uniform(-5.0, 5.0),
+            priority=rng.choice((0, 1, 2)), padding=Offsets(*(rng.uniform(0.0, 5.0) for _ in range(4)))
+        )
+    return VirtualArrayElement(
+        vertical=True, item_count=rng.randrange(0, 50), item_size=rng.uniform(5.0, 30.0),
+        child_padding=rng.uniform(0.0, 4.0), maximum_height=rng.uniform(50.0, 300.0),
+        priority=rng.choice((0, 1, 2))
+    )
+
+
+def _mixed_tree(rng: random.Random, count: int):
+    # The incremental layout test's trees with some custom layouts mixed in.
+    root = ElementData().create()
+    nodes = [root]
+    for _ in range(count):
+        data = _custom_data(rng) if rng.random() < 0.15 else _random_data(rng)
+        child = data.create()
+        # Virtual arrays make their own children.
+        rng.choice([node for node in nodes if not isinstance(node._data, VirtualArrayElement)]).add_child(child)
+        nodes.append(child)
+    return root
+
+
+def _values(root) -> list[float]:
+    return [value for rect in rects(root) for value in rect]
+
+
+def test_custom_layouts_are_detected():
+    assert AnchorElement().create()._layout_kind == LayoutKind.CUSTOM
+    assert VirtualArrayElement().create()._layout_kind == LayoutKind.CUSTOM
+    assert ElementData().create()._layout_kind == LayoutKind.OVERLAY
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_flat_layout_matches_recursive_layout(tree, seed):
+    root = _mixed_tree(random.Random(seed), 200)
+    tree.set_root(root)
+    tree.use_flat_layout()
+    tree.layout()
+    flat = _values(root)
+
+    tree.use_flat_layout(False)
+    tree.layout()
+    assert _values(root) == pytest.approx(flat)
+
+
+def test_custom_top_element_lays_itself_out(tree):
+    items = VirtualArrayElement(vertical=True, item_count=100, item_size=20.0).create()
+    tree.set_root(items)
+    tree.use_flat_layout()
+    tree.layout()
+    assert items.visible_items
+    flat = _values(items)
+
+    tree.use_flat_layout(False)
+    tree.layout()
+    assert _values(items) == pytest.approx(flat)
+
+
+def test_chain_deeper_than_the_recursion_limit(tree):
+    depth = sys.getrecursionlimit() + 100
+    padding = Offsets(0.25, 0.25, 0.25, 0.25)
+    root = ElementData(padding=padding).create()
+    element = root
+    for _ in range(depth):
+        element = ElementData(padding=padding).create(element)
+    # A custom layout at the bottom still lays out its own children.
+    anchor = AnchorElement(left_anchor=0.5, right_anchor=0.5, bottom_anchor=0.5, top_anchor=0.5, left_offset=-5.0, right_offset=5.0, bottom_offset=-5.0, top_offset=5.0).create(element)
+    leaf = ElementData().create(anchor)
+
+    tree.set_root(root)
+    tree.use_flat_layout()
+    tree.layout()
+
+    assert element.left == pytest.approx(0.25 * depth)
+    assert element.width == pytest.approx(1280.0 - 0.5 * depth)
+    assert element.height == pytest.approx(720.0 - 0.5 * depth)
+    # The anchor fills the last link, and its leaf fills the 10x10 region at its centre.
+    assert (anchor.left, anchor.bottom) == pytest.approx((0.25 * (depth + 1), 0.25 * (depth + 1)))
+    centre = (anchor.left + anchor.width / 2.0, anchor.bottom + anchor.height / 2.0)
+    assert (leaf.left, leaf.bottom, leaf.width, leaf.height) == pytest.approx((centre[0] - 5.0, centre[1] - 5.0, 10.0, 10.0))
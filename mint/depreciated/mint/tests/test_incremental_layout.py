@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from charm.lib.mint.core import AxisAnchor, ArrayElement, ElementData, Offsets
+
+from conftest import rects
+
+
+def _random_data(rng: random.Random) -> ElementData:
+    kind = rng.random()
+    padding = Offsets(*(rng.uniform(0.0, 5.0) for _ in range(4)))
+    if kind < 0.2:
+        # A fixed size element, which is a layout boundary.
+        width = rng.uniform(50.0, 200.0)
+        height = rng.uniform(50.0, 200.0)
+        return ElementData(minimum_width=width, maximum_width=width, minimum_height=height, maximum_height=height, padding=padding)
+    data_type = ArrayElement if kind < 0.5 else ElementData
+    data = data_type(
+        minimum_width=rng.uniform(0.0, 50.0),
+        minimum_height=rng.uniform(0.0, 50.0),
+        priority=rng.choice((0, 1, 2)),
+        horizontal_alignmnet=rng.choice(list(AxisAnchor)),
+        vertical_alignment=rng.choice(list(AxisAnchor)),
+        padding=padding
+    )
+    if data_type is ArrayElement:
+        data.vertical = rng.random() < 0.5
+        data.child_padding = rng.uniform(0.0, 4.0)
+    return data
+
+
+def _random_tree(rng: random.Random, count: int):
+    root = ElementData().create()
+    nodes = [root]
+    for _ in range(count):
+        child = _random_data(rng).create()
+        rng.choice(nodes).add_child(child)
+        nodes.append(child)
+    return root, nodes
+
+
+def _random_edit(rng: random.Random, element) -> dict:
+    match rng.randrange(5):
+        case 0:
+            size = rng.uniform(0.0, 250.0)
+            return {'minimum_width': size, 'maximum_width': size if rng.random() < 0.5 else float('inf')}
+        case 1:
+            size = rng.uniform(0.0, 250.0)
+            return {'minimum_height': size, 'maximum_height': size if rng.random() < 0.5 else float('inf')}
+        case 2:
+            return {'priority': rng.choice((0, 1, 2, 5))}
+        case 3:
+            return {
+                'horizontal_alignmnet': rng.choice(list(AxisAnchor)),
+                'vertical_alignment': rng.choice(list(AxisAnchor))
+            }
+        case _:
+            return {'padding': Offsets(*(rng.uniform(0.0, 8.0) for _ in range(4)))}
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_incremental_layout_matches_full_layout(tree, seed):
+    rng = random.Random(seed)
+    root, nodes = _random_tree(rng, 200)
+    tree.set_root(root)
+    tree.layout()
+
+    for _ in range(30):
+        element = rng.choice(nodes[1:])
+        element.update_data(**_random_edit(rng, element))
+        if rng.random() < 0.2:
+            child = _random_data(rng).create()
+            element.add_child(child)
+            nodes.append(child)
+
+        tree.layout()
+        incremental = rects(root)
+
+        tree._tree_stale = True
+        tree.layout()
+        assert incremental == rects(root)
+
+
+def test_resizing_a_boundary_relays_out_its_parent(tree):
+    root = ElementData().create()
+    panel = ElementData(minimum_width=100, maximum_width=100, minimum_height=100, maximum_height=100).create(root)
+    tree.set_root(root)
+    tree.layout()
+
+    panel.update_data(minimum_width=200, maximum_width=200)
+    tree.layout()
+    assert panel.width == 200
+
+
+def test_content_changes_stop_at_a_boundary(tree):
+    root = ElementData().create()
+    panel = ElementData(minimum_width=100, maximum_width=100, minimum_height=100, maximum_height=100).create(root)
+    leaf = ElementData().create(panel)
+    tree.set_root(root)
+    tree.layout()
+
+    ElementData(minimum_width=10).create(leaf)
+    assert panel._has_changed_layout
+    assert not root._has_changed_layout
+    assert tree._dirty_layouts == [panel]
@@ -0,0 +1,46 @@
+import random
+
+from charm.lib.mint.layout_cache import load_layout, save_layout
+
+from conftest import rects
+from test_incremental_layout import _random_tree
+
+
+def _laid_out(tree):
+    root, _ = _random_tree(random.Random(11), 50)
+    tree.set_root(root)
+    tree.layout()
+    return root
+
+
+def test_round_trip(tree, tmp_path):
+    root = _laid_out(tree)
+    path = tmp_path / 'layout.bin'
+    save_layout(path, root, 1280, 720)
+    expected = rects(root)
+
+    fresh, _ = _random_tree(random.Random(11), 50)
+    assert load_layout(path, fresh, 1280, 720)
+    assert rects(fresh) == expected
+
+
+def test_missing_and_empty_files_miss(tree, tmp_path):
+    root = _laid_out(tree)
+    assert not load_layout(tmp_path / 'missing.bin', root, 1280, 720)
+    empty = tmp_path / 'empty.bin'
+    empty.write_bytes(b'')
+    assert not load_layout(empty, root, 1280, 720)
+
+
+def test_truncated_and_corrupt_files_miss(tree, tmp_path):
+    root = _laid_out(tree)
+    path = tmp_path / 'layout.bin'
+    save_layout(path, root, 1280, 720)
+    contents = path.read_bytes()
+
+    for broken in (contents[:10], contents[:-8], contents + b'\0', b'NOTMINT!' + contents[8:]):
+        path.write_bytes(broken)
+        assert not load_layout(path, root, 1280, 720)
+    # A different frame size misses too.
+    path.write_bytes(contents)
+    assert not load_layout(path, root, 1920, 1080)
@@ -0,0 +1,105 @@
+from charm.lib.mint.core import AnchorElement, AnchorPresets, ArrayElement, AxisAnchor, ElementData, LayoutPass
+
+# The top element keeps its rect, so the measure passes don't visit it.
+_MEASURE_PASSES = (LayoutPass.HORIZONTAL, LayoutPass.VERTICAL)
+
+
+def _deep_tree(depth: int):
+    # A chain of mixed layouts, each with a leaf beside the next link.
+    data_types = (ElementData, ArrayElement, AnchorElement)
+    root = ElementData().create()
+    element = root
+    count = 1
+    for level in range(depth):
+        ElementData(minimum_width=10, minimum_height=10).create(element)
+        element = data_types[level % len(data_types)](priority=1).create(element)
+        count += 2
+    return root, count
+
+
+def _expected(count: int) -> dict[LayoutPass, int]:
+    return {layout_pass: count - 1 if layout_pass in _MEASURE_PASSES else count for layout_pass in LayoutPass}
+
+
+def test_each_pass_visits_each_element_once(tree):
+    root, count = _deep_tree(30)
+    tree.set_root(root)
+    tree.count_layout_visits()
+    tree.layout()
+    assert tree.layout_visits == _expected(count)
+
+
+def test_large_arrays_count_skipped_leaves(tree):
+    root = ElementData().create()
+    array = ArrayElement(priority=1).create(root)
+    for idx in range(array.vectorize_threshold * 2):
+        data = ArrayElement if idx % 10 == 0 else ElementData
+        data(minimum_width=1).create(array)
+    tree.set_root(root)
+    tree.count_layout_visits()
+    tree.layout()
+    assert tree.layout_visits == _expected(array.vectorize_threshold * 2 + 2)
+
+
+def test_anchor_centers_children_on_its_anchor(tree):
+    root = ElementData().create()
+    anchor = AnchorElement(priority=1, left_anchor=0.5, right_anchor=0.5, bottom_anchor=0.5, top_anchor=0.5).create(root)
+    child = ElementData(
+        minimum_width=100, minimum_height=50,
+        horizontal_alignmnet=AxisAnchor.CENTER, vertical_alignment=AxisAnchor.CENTER
+    ).create(anchor)
+    tree.set_root(root)
+    tree.layout()
+    assert (child.left, child.bottom, child.width, child.height) == (590.0, 335.0, 100.0, 50.0)
+
+
+def test_anchor_stretches_children_over_its_region(tree):
+    root = ElementData().create()
+    preset = AnchorPresets.TOP
+    anchor = AnchorElement(
+        priority=1, left_anchor=preset.left, right_anchor=preset.right, bottom_anchor=preset.bottom, top_anchor=preset.top,
+        left_offset=10, right_offset=-10, bottom_offset=-40
+    ).create(root)
+    child = ElementData(priority=1, vertical_alignment=AxisAnchor.BOTTOM).create(anchor)
+    tree.set_root(root)
+    tree.layout()
+    assert (child.left, child.bottom, child.width, child.height) == (10.0, 680.0, 1260.0, 40.0)
+
+
+def test_stats_and_visit_counting_are_separate(tree):
+    root, count = _deep_tree(5)
+    tree.set_root(root)
+    tree.count_layout_visits()
+    tree.enable_stats()
+    tree.enable_stats(False)
+    tree.layout()
+    assert tree.layout_visits == _expected(count)
+
+    tree.count_layout_visits(False)
+    tree.enable_stats()
+    assert tree.layout_visits is not None
+    tree.enable_stats(False)
+    assert tree.layout_visits is None
+
+
+def test_scheduled_layouts_are_counted_per_frame(tree):
+    root = ElementData().create()
+    # A fixed size element is a layout boundary, so edits inside it lay out only its subtree.
+    boundary = ElementData(minimum_width=200, maximum_width=200, minimum_height=200, maximum_height=200).create(root)
+    leaves = [ElementData(minimum_width=10, minimum_height=10).create(boundary) for _ in range(4)]
+    tree.set_root(root)
+    tree.layout()
+    tree.defer_layout()
+    tree.count_layout_visits()
+    tree.enable_stats()
+
+    for width in (20, 30):
+        leaves[0].update_data(minimum_width=width)
+        tree.update(0.0)
+        assert tree.layout_visits == _expected(len(leaves) + 1)
+        tree.draw()
+        assert tree.stats.last(f"visits.{LayoutPass.POSITION}") == len(leaves) + 1
+
+    # Nothing to lay out, so nothing is counted.
+    tree.update(0.0)
+    assert tree.layout_visits == {layout_pass: 0 for layout_pass in LayoutPass}
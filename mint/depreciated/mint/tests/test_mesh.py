@@ -0,0 +1,102 @@
+from array import array
+
+import pytest
+
+from charm.lib.mint.implementations.arcade_mesh import Mesh, MeshArena, MeshRenderer
+
+
+def _triangle(colour: int) -> Mesh:
+    return Mesh([0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0], [colour] * 12, [0, 1, 2])
+
+
+def _colours(renderer: MeshRenderer, mesh: Mesh) -> list[int]:
+    start = 4 * mesh.vertex_start
+    return renderer._colour.data[start:start + 4 * mesh.arena_vertex_count].tolist()
+
+
+@pytest.mark.parametrize('vertices, colours, indices', [
+    ([0.0, 0.0], [], []),  # Not a whole vertex
+    ([0.0] * 9, [255] * 8, [0, 1, 2]),  # Too few colours
+    ([0.0] * 9, [255] * 12, [0, 1, 3]),  # Index past the vertices
+    ([0.0] * 9, [255] * 12, [0, 1]),  # Not a whole triangle
+])
+def test_mismatched_arrays_are_rejected(vertices, colours, indices):
+    with pytest.raises(ValueError):
+        Mesh(vertices, colours, indices)
+
+
+def test_updates_are_checked():
+    mesh = _triangle(10)
+    with pytest.raises(ValueError):
+        mesh.update_colours([255] * 8)
+    with pytest.raises(ValueError):
+        mesh.update_indices([0, 1, 5])
+    with pytest.raises(ValueError):
+        mesh.update_vertices([0.0] * 3)
+    assert mesh.vertex_count == 3 and len(mesh.colour_array) == 12
+
+
+def test_shrunk_mesh_cannot_write_over_another():
+    renderer = MeshRenderer(reserve=4)
+    a = _triangle(10)
+    b = _triangle(20)
+    renderer.add(a)
+    renderer.add(b)
+
+    # Shrinking a takes its colours and indices with it, freeing the rest of its range.
+    a.update_geometry([0.0, 0.0, 0.0], [30] * 4, [])
+    c = Mesh([0.0] * 6, [40] * 8, [])
+    renderer.add(c)
+
+    with pytest.raises(ValueError):
+        a.update_colours([50] * 12)
+    # Writing arrays changed behind the mesh's back is refused too.
+    a.colour_array = array('B', [50] * 12)
+    with pytest.raises(ValueError):
+        renderer.update_colours(a)
+
+    assert _colours(renderer, c) == [40] * 8
+    assert _colours(renderer, b) == [20] * 12
+    assert _colours(renderer, a) == [30] * 4
+
+
+def test_add_many_writes_one_block():
+    renderer = MeshRenderer(reserve=4)
+    invalidated = []
+    renderer.invalidate = lambda: invalidated.append(True)
+    meshes = [_triangle(colour) for colour in range(5)]
+    renderer.add_many(meshes + meshes[:2])
+
+    # One range for the batch, grown once to fit it, and one invalidate.
+    assert [mesh.vertex_start for mesh in meshes] == [0, 3, 6, 9, 12]
+    assert [mesh.index_start for mesh in meshes] == [0, 3, 6, 9, 12]
+    assert renderer._index.data[:15].tolist() == list(range(15))
+    assert renderer._vertices.used == 15
+    assert len(invalidated) == 1
+    for colour, mesh in enumerate(meshes):
+        assert _colours(renderer, mesh) == [colour] * 12
+
+    renderer.remove(meshes[1])
+    assert meshes[2].index_start == 3
+    assert renderer.index_count == 12
+
+
+def test_renderers_share_an_arena():
+    arena = MeshArena(reserve=4)
+    first = MeshRenderer(reserve=3, arena=arena)
+    second = MeshRenderer(reserve=3, arena=arena)
+    first.add(_triangle(10))
+    second.add(_triangle(20))
+    # Growing the first range past the second moves its indices, the second's stay put.
+    grown = _triangle(30)
+    first.add(grown)
+
+    data = arena._index.data
+    assert data[second._index_first:second._index_first + 3].tolist() == [3, 4, 5]
+    assert data[first._index_first:first._index_first + 6].tolist() == [0, 1, 2, 6, 7, 8]
+    assert _colours(first, grown) == [30] * 12
+
+    # Clearing one renderer only frees its own vertices.
+    first.clear()
+    assert arena._vertices.used == 3
+    assert second.index_count == 3
@@ -0,0 +1,77 @@
+import gc
+
+from arcade import Sprite
+
+from charm.lib.mint.implementations import arcade as arcade_impl
+from charm.lib.mint.implementations.arcade import SpriteRenderable, load_ui_texture
+
+
+def _sprites(count: int) -> list[Sprite]:
+    return [Sprite() for _ in range(count)]
+
+
+def test_retired_slots_are_reused_and_others_keep_theirs():
+    renderable = SpriteRenderable()
+    sprites = _sprites(5)
+    renderable.add_many(sprites)
+    renderable.remove_many(sprites[1:3])
+    assert not sprites[1].visible
+
+    added = _sprites(3)
+    renderable.add_many(added)
+    assert [renderable.slot(sprite) for sprite in sprites] == [0, -1, -1, 3, 4]
+    assert sorted(renderable.slot(sprite) for sprite in added) == [1, 2, 5]
+    assert len(renderable._sprite_list) == 6
+    # The retired sprites left the list and got their visibility back.
+    assert sprites[1].visible and sprites[1] not in renderable._sprite_list
+
+
+def test_slots_only_change_when_compacting():
+    renderable = SpriteRenderable()
+    sprites = _sprites(10)
+    renderable.add_many(sprites)
+    renderable.remove_many(sprites[:8])
+    renderable.draw()
+    assert [renderable.slot(sprite) for sprite in sprites[8:]] == [8, 9]
+
+    renderable.compact()
+    assert [renderable.slot(sprite) for sprite in sprites[8:]] == [0, 1]
+    assert len(renderable._sprite_list) == 2
+
+
+def test_sprite_retired_elsewhere_moves_out_of_its_slot():
+    first = SpriteRenderable()
+    second = SpriteRenderable()
+    sprites = _sprites(3)
+    first.add_many(sprites)
+    first.remove(sprites[1])
+
+    second.add(sprites[1])
+    assert sprites[1].visible
+    assert sprites[1] not in first._sprite_list
+    assert first.slot(sprites[2]) == 2
+
+    # The placeholder left behind is the next slot handed out.
+    other = Sprite()
+    first.add(other)
+    assert first.slot(other) == 1
+
+
+def test_atlas_is_configured_rather_than_passed():
+    size = SpriteRenderable.atlas_size
+    try:
+        SpriteRenderable()
+        SpriteRenderable.configure_atlas(1024)
+        assert SpriteRenderable._atlas.width == 1024
+    finally:
+        SpriteRenderable.configure_atlas(size)
+
+
+def test_ui_textures_are_held_weakly():
+    path = ':resources:images/items/coinGold.png'
+    texture = load_ui_texture(path)
+    assert load_ui_texture(path) is texture
+
+    del texture
+    gc.collect()
+    assert path not in arcade_impl._TEXTURE_CACHE
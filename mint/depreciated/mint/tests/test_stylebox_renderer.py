@@ -0,0 +1,77 @@
+from arcade import XYWH
+
+from charm.lib.mint.implementations.arcade_stylebox import StyleBox, StyleBoxArena, StyleBoxRenderer
+
+
+def _box(x: float) -> StyleBox:
+    return StyleBox(XYWH(x, 0.0, 10.0, 10.0), resolution=2)
+
+
+def _drawn_vertices(renderer: StyleBoxRenderer) -> list[tuple[float, float]]:
+    # The vertices in draw order, as the indices reference them.
+    vertices = renderer._vertex_array
+    first = renderer._first_tri
+    indices = renderer._index_array[3 * first:3 * (first + renderer._max_tri)]
+    return [(vertices[3 * idx], vertices[3 * idx + 1]) for idx in indices]
+
+
+def _expected(boxes: list[StyleBox]) -> list[tuple[float, float]]:
+    return [
+        (box.vertex_array[3 * idx], box.vertex_array[3 * idx + 1])
+        for box in boxes for idx in box.index_array
+    ]
+
+
+def test_add_many_matches_adding_one_at_a_time():
+    one_at_a_time = StyleBoxRenderer(reserve=4)
+    for x in range(6):
+        one_at_a_time.add(_box(x * 20.0))
+
+    batched = StyleBoxRenderer(reserve=4)
+    invalidated = []
+    batched.invalidate = lambda: invalidated.append(True)
+    boxes = [_box(x * 20.0) for x in range(6)]
+    batched.add_many(boxes + boxes[:2])
+
+    assert len(invalidated) == 1
+    assert batched._max_tri == one_at_a_time._max_tri
+    assert _drawn_vertices(batched) == _drawn_vertices(one_at_a_time) == _expected(boxes)
+    # A fresh renderer hands the batch one contiguous block of slots.
+    assert [box.slot_range for box in boxes] == [(8 * idx, 8 * idx + 8) for idx in range(6)]
+
+
+def test_add_many_fills_freed_slots():
+    renderer = StyleBoxRenderer(reserve=64)
+    boxes = [_box(x * 20.0) for x in range(4)]
+    renderer.add_many(boxes)
+    renderer.remove_many(boxes[1:3])
+
+    added = [_box(100.0 + x * 20.0) for x in range(3)]
+    renderer.add_many(added)
+    assert _drawn_vertices(renderer) == _expected([boxes[0], boxes[3], *added])
+    assert renderer._reserve == 64
+
+
+def test_renderers_draw_their_own_range_of_a_shared_arena():
+    arena = StyleBoxArena(reserve=8)
+    first = StyleBoxRenderer(reserve=4, arena=arena)
+    second = StyleBoxRenderer(reserve=4, arena=arena)
+    first_boxes = [_box(0.0)]
+    second_boxes = [_box(20.0), _box(40.0)]
+    first.add_many(first_boxes)
+    second.add_many(second_boxes)
+
+    # The first range is followed by the second, so growing it moves its indices elsewhere.
+    first_boxes.append(_box(60.0))
+    first.add(first_boxes[-1])
+    assert _drawn_vertices(first) == _expected(first_boxes)
+    assert _drawn_vertices(second) == _expected(second_boxes)
+    assert first._first_tri + first._tri_reserve <= second._first_tri or second._first_tri + second._tri_reserve <= first._first_tri
+
+    # Clearing one renderer only frees its own slots.
+    first.clear_buffers()
+    added = [_box(80.0)]
+    first.add_many(added)
+    assert _drawn_vertices(first) == _expected(added)
+    assert _drawn_vertices(second) == _expected(second_boxes)
+
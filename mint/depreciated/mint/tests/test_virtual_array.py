@@ -0,0 +1,69 @@
+from charm.lib.mint.core import ElementData, VirtualArrayElement
+
+from conftest import rects
+
+
+def _list(root, **kwargs):
+    def bind(item, idx):
+        item.update_data(minimum_width=100.0 + idx % 3)
+
+    data = dict(vertical=True, item_count=1000, item_size=40.0, child_padding=2.0, bind_item=bind)
+    data.update(kwargs)
+    return VirtualArrayElement(**data).create(root)
+
+
+def test_first_layout_measures_across_from_items(tree):
+    root = ElementData().create()
+    items = _list(root, priority=0, maximum_height=400.0)
+    tree.set_root(root)
+    tree.layout()
+    assert items.visible_items
+    assert items.width == 102.0
+    laid_out = rects(root)
+
+    # Laying out again changes nothing.
+    tree._tree_stale = True
+    tree.layout()
+    assert rects(root) == laid_out
+
+
+def test_scroll_matches_full_layout(tree):
+    root = ElementData().create()
+    # Not fixed size, so the list isn't a layout boundary and scrolling walks up from it.
+    holder = ElementData(minimum_width=300.0, minimum_height=400.0).create(root)
+    items = _list(holder, minimum_height=400.0, maximum_height=400.0)
+    tree.set_root(root)
+    tree.layout()
+
+    items.scroll_by(130.0)
+    assert holder._has_changed_layout
+    tree.layout()
+    scrolled = rects(root)
+    visible = items.visible_items
+
+    tree._tree_stale = True
+    tree.layout()
+    assert items.visible_items == visible
+    assert rects(root) == scrolled
+
+
+def test_items_keep_their_limits(tree):
+    root = ElementData().create()
+
+    def bind(item, idx):
+        # Items are recycled, so binding sets both limits.
+        if idx % 2:
+            item.update_data(minimum_height=0.0, maximum_height=30.0)
+        else:
+            item.update_data(minimum_height=10.0, maximum_height=float('inf'))
+
+    items = _list(root, minimum_height=400.0, maximum_height=400.0, bind_item=bind)
+    tree.set_root(root)
+    tree.layout()
+    for idx in items.visible_items:
+        assert items.item_at(idx).height == (30.0 if idx % 2 else 40.0)
+
+    items.scroll_by(300.0)
+    tree.layout()
+    for idx in items.visible_items:
+        assert items.item_at(idx).height == (30.0 if idx % 2 else 40.0)
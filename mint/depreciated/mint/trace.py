@@ -0,0 +1,84 @@
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from threading import get_ident
+from time import perf_counter_ns
+from typing import Any, Generator
+import json
+import os
+
+# (name, category, start ns, duration ns, thread, args)
+type _Span = tuple[str, str, int, int, int, dict[str, Any] | None]
+
+
+class Tracer:
+    """
+    Records timed spans into a ring buffer, so only the last capacity spans
+    are kept and a stutter can be dumped after it happened.
+
+    Spans are written as Chrome trace complete events, which the Chrome
+    trace viewer and Perfetto nest by time, so nested spans need no
+    bookkeeping here.
+    """
+
+    def __init__(self, capacity: int = 65536) -> None:
+        self._spans: deque[_Span] = deque(maxlen=capacity)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def record(self, name: str, category: str, start: int, end: int, args: dict[str, Any] | None = None) -> None:
+        # start and end are perf_counter_ns values, for hot paths which time themselves.
+        self._spans.append((name, category, start, end - start, get_ident(), args))
+
+    @contextmanager
+    def span(self, name: str, category: str = "", **args: Any) -> Generator[None, None, None]:
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._spans.append((name, category, start, perf_counter_ns() - start, get_ident(), args or None))
+
+    def to_chrome(self) -> dict[str, Any]:
+        pid = os.getpid()
+        events = []
+        for name, category, start, duration, thread, args in self._spans:
+            event = {
+                "name": name, "cat": category, "ph": "X",
+                "ts": start / 1000.0, "dur": duration / 1000.0,
+                "pid": pid, "tid": thread
+            }
+            if args:
+                event["args"] = {key: str(value) for key, value in args.items()}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str | Path) -> None:
+        # Open the file in chrome://tracing or ui.perfetto.dev
+        with open(path, 'w') as file:
+            json.dump(self.to_chrome(), file)
+
+
+# The tracer every instrumented part of mint records into, None when not tracing.
+_active: Tracer | None = None
+
+
+def start_tracing(capacity: int = 65536) -> Tracer:
+    global _active
+    _active = Tracer(capacity)
+    return _active
+
+
+def stop_tracing() -> Tracer | None:
+    # Returns the tracer so its spans can still be dumped.
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _active
@@ -0,0 +1,85 @@
+from __future__ import annotations
+from typing import Sequence
+
+# numpy is optional, without it large arrays just use the plain per child layout.
+try:
+    import numpy as np
+    from numpy.typing import NDArray
+except ImportError:
+    np = None
+
+from .flat_layout import _EPSILON
+
+AVAILABLE: bool = np is not None
+
+
+def distribute(
+        sizes: Sequence[float],
+        minimums: Sequence[float],
+        maximums: Sequence[float],
+        priorities: Sequence[float],
+        free: float
+    ) -> tuple[NDArray[np.float64], float]:
+    """
+    The same as flat_layout.distribute but as array operations, returning
+    the new sizes and the space left over. The sweep over the sorted start
+    and stop levels becomes a cumulative sum of how much space each span
+    between levels holds, searched for the free space.
+    """
+    sizes = np.asarray(sizes, dtype=np.float64)
+    if abs(free) <= _EPSILON:
+        return sizes, free
+    sign = 1.0 if free > 0 else -1.0
+    limits = np.asarray(maximums if free > 0 else minimums, dtype=np.float64)
+    priorities = np.asarray(priorities, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        start = sign * sizes / priorities
+        stop = sign * limits / priorities
+    changing = (priorities > 0) & (stop > start)
+    if not changing.any():
+        return sizes, free
+
+    priority = priorities[changing]
+    levels = np.concatenate((start[changing], stop[changing]))
+    changes = np.concatenate((priority, -priority))
+    order = np.argsort(levels, kind='stable')
+    levels = levels[order]
+    rates = np.cumsum(changes[order])
+
+    with np.errstate(invalid='ignore'):
+        rooms = np.diff(levels) * rates[:-1]
+    # Spans past an infinite level are never reached.
+    rooms[np.isnan(rooms)] = np.inf
+    filled = np.cumsum(rooms)
+
+    remaining = abs(free)
+    span = int(np.searchsorted(filled, remaining))
+    if span == len(filled):
+        # Everything reached its limit before the space ran out
+        level = np.inf
+    else:
+        before = filled[span - 1] if span else 0.0
+        level = levels[span] + (remaining - before) / rates[span]
+
+    with np.errstate(invalid='ignore'):
+        grown = sign * np.minimum(sign * limits, np.maximum(sign * sizes, level * priorities))
+    result = np.where(changing, grown, sizes)
+    return result, free - float((result - sizes).sum())
+
+
+def positions(sizes: Sequence[float], offset: float, spacing: float) -> NDArray[np.float64]:
+    # Where each child starts along the array when placed one after another.
+    sizes = np.asarray(sizes, dtype=np.float64)
+    starts = np.empty(len(sizes))
+    starts[0] = 0.0
+    np.cumsum(sizes[:-1] + spacing, out=starts[1:])
+    return starts + offset
+
+
+def align(anchors: Sequence[int], sizes: Sequence[float], start: float, space: float, y_axis: bool) -> NDArray[np.float64]:
+    # anchors are AxisAnchor values. The beginning of the y axis is the top, see flat_layout._align.
+    anchors = np.asarray(anchors, dtype=np.float64)
+    excess = space - np.asarray(sizes, dtype=np.float64)
+    fraction = (2.0 - anchors) / 2.0 if y_axis else anchors / 2.0
+    return start + excess * fraction